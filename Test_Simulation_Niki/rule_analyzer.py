@@ -0,0 +1,210 @@
+from datetime import time as dtime
+from simulator import MINUTES_PER_DAY, _minutes
+
+
+# Analyse von Zeitregeln: Überschneidungen + Widersprüche pro Gerät finden und
+# daraus einen konfliktfreien Tagesplan bauen, den DaySimulator.run(schedule=...)
+# direkt abspielen kann. Auflösung wie beim Polling: die zuletzt hinzugefügte
+# Regel gewinnt.
+
+
+class IntervalTree:
+    """
+    Statischer Intervallbaum über halboffenen Intervallen [start, end).
+    Intern ein nach start sortiertes Array als balancierter Baum (Mitte =
+    Wurzel), jeder Knoten kennt das größte end in seinem Teilbaum.
+    Aufbau O(n log n), Abfrage O(log n + Treffer).
+    """
+
+    def __init__(self, intervals):
+        # intervals: [(start, end, payload), ...]
+        self.items = sorted(intervals, key=lambda item: item[0])
+        self.max_end = [0] * len(self.items)
+        self._build(0, len(self.items))
+
+    def _build(self, lo, hi):
+        if lo >= hi:
+            return 0
+        mid = (lo + hi) // 2
+        self.max_end[mid] = max(self.items[mid][1], self._build(lo, mid), self._build(mid + 1, hi))
+        return self.max_end[mid]
+
+    def overlapping(self, start, end):
+        # alle Intervalle, die sich mit [start, end) überschneiden
+        found = []
+        stack = [(0, len(self.items))]
+        while stack:
+            lo, hi = stack.pop()
+            if lo >= hi:
+                continue
+            mid = (lo + hi) // 2
+            if self.max_end[mid] <= start:
+                continue                        # ganzer Teilbaum endet vorher
+            stack.append((lo, mid))
+            item = self.items[mid]
+            if item[0] < end:
+                if item[1] > start:
+                    found.append(item)
+                stack.append((mid + 1, hi))     # rechts liegen nur spätere Starts
+        return found
+
+    def at(self, minute):
+        return self.overlapping(minute, minute + 1)
+
+
+class Finding:
+    def __init__(self, device, first, second, kind):
+        self.device = device
+        self.first = first          # (Index, Rule) der früheren Regel
+        self.second = second        # (Index, Rule) der späteren Regel (gewinnt)
+        self.kind = kind            # "conflict" (on vs. off) oder "overlap" (gleiche Aktion)
+        self.ranges = []            # [(start, end), ...] in Minuten
+
+    def describe(self) -> str:
+        windows = ", ".join(f"{_hhmm(a)}–{_hhmm(b)}" for a, b in self.ranges)
+        label = "KONFLIKT " if self.kind == "conflict" else "Überlappung"
+        return (f"{label} {self.device.name}: Regel {self.first[0]} ({self.first[1].action}) "
+                f"und Regel {self.second[0]} ({self.second[1].action}) in {windows} "
+                f"→ Regel {self.second[0]} gewinnt")
+
+
+def _hhmm(minute: int) -> str:
+    return f"{minute // 60:02d}:{minute % 60:02d}"
+
+
+class Schedule:
+    """
+    Konfliktfreier Plan: pro Gerät nicht überlappende Segmente
+    [(start, end, action), ...]. transitions() liefert dasselbe Format wie
+    TransitionScheduler und kann direkt in DaySimulator.run(schedule=...).
+    """
+
+    def __init__(self, segments):
+        self.segments = segments    # Gerät -> [(start, end, action), ...]
+
+    def transitions(self):
+        by_minute = {}
+        for device, segments in self.segments.items():
+            previous = None
+            for start, end, action in segments:
+                if action != previous:
+                    by_minute.setdefault(start, []).append((device, action))
+                previous = action
+        for minute in sorted(by_minute):
+            yield minute, by_minute[minute]
+
+
+class RuleAnalyzer:
+    def __init__(self, rules, step: int = 15):
+        self.rules = list(rules)
+        self.step = step
+        self._trees = None
+
+    def _intervals(self, rule):
+        # Fenster auf dem Schritt-Raster, über Mitternacht in zwei Teile zerlegt
+        start = -(-_minutes(rule.condition.start) // self.step) * self.step
+        stop = _minutes(rule.condition.end) // self.step * self.step + self.step
+        if rule.condition.start <= rule.condition.end:
+            return [(start, min(stop, MINUTES_PER_DAY))] if start < stop else []
+        parts = [(0, min(stop, MINUTES_PER_DAY))]
+        if start < MINUTES_PER_DAY:
+            parts.append((start, MINUTES_PER_DAY))
+        return parts
+
+    def trees(self):
+        # ein Intervallbaum pro Gerät
+        if self._trees is None:
+            intervals = {}
+            for index, rule in enumerate(self.rules):
+                for start, end in self._intervals(rule):
+                    intervals.setdefault(rule.device, []).append((start, end, index))
+            self._trees = {device: IntervalTree(items) for device, items in intervals.items()}
+        return self._trees
+
+    def findings(self):
+        """
+        Alle Paare von Regeln desselben Geräts, deren Fenster sich überschneiden.
+        O(n log n + Anzahl Überschneidungen).
+        """
+        result = {}
+        for device, tree in self.trees().items():
+            for start, end, index in tree.items:
+                for other_start, other_end, other in tree.overlapping(start, end):
+                    if other <= index:
+                        continue        # jedes Paar nur einmal
+                    key = (index, other)
+                    finding = result.get(key)
+                    if finding is None:
+                        kind = "conflict" if self.rules[index].action != self.rules[other].action else "overlap"
+                        finding = Finding(device, (index, self.rules[index]), (other, self.rules[other]), kind)
+                        result[key] = finding
+                    finding.ranges.append((max(start, other_start), min(end, other_end)))
+        for finding in result.values():
+            finding.ranges.sort()
+        return sorted(result.values(), key=lambda f: (f.first[0], f.second[0]))
+
+    def resolve(self) -> Schedule:
+        # Segmente zwischen allen Grenzen eines Geräts, Gewinner = höchster Regel-Index
+        segments = {}
+        for device, tree in self.trees().items():
+            bounds = sorted({b for start, end, _ in tree.items for b in (start, end)})
+            resolved = []
+            for start, end in zip(bounds, bounds[1:]):
+                active = tree.at(start)
+                if not active:
+                    continue
+                action = self.rules[max(item[2] for item in active)].action
+                if resolved and resolved[-1][1] == start and resolved[-1][2] == action:
+                    resolved[-1] = (resolved[-1][0], end, action)     # gleiche Aktion zusammenfassen
+                else:
+                    resolved.append((start, end, action))
+            segments[device] = resolved
+        return Schedule(segments)
+
+    def print_report(self):
+        findings = self.findings()
+        conflicts = sum(1 for f in findings if f.kind == "conflict")
+        print(f"{len(self.rules)} Regeln, {conflicts} Konflikte, {len(findings) - conflicts} Überlappungen")
+        for finding in findings:
+            print("  " + finding.describe())
+        print("\nAufgelöster Plan:")
+        for device, segments in self.resolve().segments.items():
+            plan = ", ".join(f"{_hhmm(a)}–{_hhmm(b)} {action}" for a, b, action in segments)
+            print(f"  {device.name}: {plan}")
+
+
+if __name__ == "__main__":
+    # Benchmark mit vielen Regeln + Gegenprobe gegen den TransitionScheduler
+    import random
+    import sys
+    import time
+    from sim_devices import Device
+    from simulator import Rule, TimeCondition, TransitionScheduler
+
+    n_rules = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    rng = random.Random(3)
+    devices = [Device(f"Gerät {i}") for i in range(max(1, n_rules // 50))]
+    rules = [
+        Rule(TimeCondition(dtime(rng.randrange(24), rng.randrange(60)), dtime(rng.randrange(24), rng.randrange(60))),
+             rng.choice(devices), rng.choice(["on", "off"]))
+        for _ in range(n_rules)
+    ]
+
+    analyzer = RuleAnalyzer(rules)
+    started = time.perf_counter()
+    findings = analyzer.findings()
+    analyze = time.perf_counter() - started
+    started = time.perf_counter()
+    schedule = analyzer.resolve()
+    resolve = time.perf_counter() - started
+
+    # Reihenfolge innerhalb einer Minute ist egal, nur die Inhalte vergleichen
+    def by_minute(transitions):
+        return {minute: sorted((d.name, a) for d, a in actions) for minute, actions in transitions}
+    same = by_minute(schedule.transitions()) == by_minute(TransitionScheduler(rules).transitions())
+
+    conflicts = sum(1 for f in findings if f.kind == "conflict")
+    print(f"{n_rules} rules, {len(devices)} devices")
+    print(f"  findings : {analyze * 1000:8.1f} ms  ({conflicts} conflicts, {len(findings) - conflicts} overlaps)")
+    print(f"  resolve  : {resolve * 1000:8.1f} ms  ({sum(len(s) for s in schedule.segments.values())} segments)")
+    print(f"  schedule matches TransitionScheduler: {same}")
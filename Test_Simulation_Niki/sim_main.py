@@ -1,5 +1,6 @@
-from Niki_Test.devices import Device, SmartHomeHub       # Imprtieren aus devices (Vorher Main)
-from Niki_Test.simulator import TimeCondition, Rule, DaySimulator  # importieren aus simulator
+from sim_devices import Device, SmartHomeHub       # Imprtieren aus sim_devices (Vorher Main)
+from simulator import TimeCondition, Rule, DaySimulator  # importieren aus simulator
+from rule_analyzer import RuleAnalyzer
 from datetime import time as dtime
 
 # 1. Geräte erstellen
@@ -38,12 +39,16 @@ regeln = [
     Rule(TimeCondition(dtime(18, 0), dtime(6, 0)),  heater, "off"),
 ]
 
-# 4. Simulator starten
+# 4. Regeln prüfen: Überschneidungen/Widersprüche melden, Plan vorab auflösen
+analyzer = RuleAnalyzer(regeln)
+analyzer.print_report()
+
+# 5. Simulator starten (spielt den aufgelösten Plan ab)
 sim = DaySimulator(speed=1.5)
 for regel in regeln:
     sim.add_rule(regel)
 
-sim.run()
+sim.run(schedule=analyzer.resolve())
 
 
 
@@ -1,6 +1,10 @@
+import heapq
 import time
 from datetime import datetime, timedelta, time as dtime
-from Niki_Test.devices import Device, SmartHomeHub   # nimmt die Klassen aus devices (Main)
+from sim_devices import Device, SmartHomeHub   # nimmt die Klassen aus sim_devices (Main)
+
+
+MINUTES_PER_DAY = 24 * 60
 
 
 class TimeCondition:
@@ -20,7 +24,7 @@ class Rule: # Rollen erstellen mit Zeitstempel, Gerätname und An oder Aus
         self.device = device
         self.action = action
 
-    def evaluate(self, current_time): # Nur an oder ausschalten, wenn das gegenteil aktiv ist 
+    def evaluate(self, current_time): # Nur an oder ausschalten, wenn das gegenteil aktiv ist
         if self.condition.check(current_time):
             if self.action == "on" and not self.device.is_on:
                 self.device.turn_on()
@@ -28,22 +32,157 @@ class Rule: # Rollen erstellen mit Zeitstempel, Gerätname und An oder Aus
                 self.device.turn_off()
 
 
+def _minutes(t: dtime) -> int:
+    return t.hour * 60 + t.minute
+
+
+class TransitionScheduler:
+    """
+    Berechnet die Schaltzeitpunkte aller Regeln vorab, statt jede Regel bei
+    jedem Schritt zu prüfen.
+
+    Eine Regel wird beim ersten Schritt >= start aktiv und nach dem letzten
+    Schritt <= end wieder inaktiv (step = Raster in Minuten, wie beim
+    Polling mit 15 Minuten). Über Mitternacht (start > end) ist die Regel ab
+    00:00 aktiv, endet nach end und beginnt wieder bei start.
+    Alle Grenzen liegen in einem Heap; pro Gerät gewinnt wie beim Polling die
+    zuletzt hinzugefügte aktive Regel. Kosten pro Tag:
+    O((Regeln + Übergänge) · log Regeln) statt O(Schritte · Regeln).
+    """
+
+    def __init__(self, rules, step: int = 15):
+        self.rules = list(rules)
+        self.step = step
+
+    def _on_grid(self, minute: int, round_up: bool) -> int:
+        if round_up:
+            return -(-minute // self.step) * self.step
+        return minute // self.step * self.step
+
+    def _boundaries(self):
+        # Heap aus (Minute, Regel-Index, aktiv?) plus die um 00:00 schon aktiven Regeln
+        heap, active_at_midnight = [], []
+        for index, rule in enumerate(self.rules):
+            start = self._on_grid(_minutes(rule.condition.start), round_up=True)
+            stop = self._on_grid(_minutes(rule.condition.end), round_up=False) + self.step
+            if rule.condition.start <= rule.condition.end:
+                if start < stop:
+                    heap.append((start, index, True))
+                    if stop < MINUTES_PER_DAY:
+                        heap.append((stop, index, False))
+            else:
+                active_at_midnight.append(index)
+                if stop < MINUTES_PER_DAY:
+                    heap.append((stop, index, False))
+                if start < MINUTES_PER_DAY:
+                    heap.append((start, index, True))
+        heapq.heapify(heap)
+        return heap, active_at_midnight
+
+    def transitions(self):
+        """
+        Liefert (Minute, [(device, action), ...]) nur für Zeitpunkte, an denen
+        sich der gewünschte Zustand eines Geräts tatsächlich ändert.
+        """
+        heap, active_at_midnight = self._boundaries()
+        active = [False] * len(self.rules)
+        by_device = {}      # Gerät -> Max-Heap (negativer Index) der aktiven Regeln, lazy gelöscht
+        desired = {}        # Gerät -> zuletzt gemeldete Aktion
+
+        def activate(index):
+            active[index] = True
+            heapq.heappush(by_device.setdefault(self.rules[index].device, []), -index)
+
+        def winner(device):
+            candidates = by_device.get(device)
+            while candidates and not active[-candidates[0]]:
+                heapq.heappop(candidates)
+            return self.rules[-candidates[0]] if candidates else None
+
+        touched = set()
+        for index in active_at_midnight:
+            activate(index)
+            touched.add(self.rules[index].device)
+        minute = 0
+
+        while True:
+            while heap and heap[0][0] == minute:
+                _, index, starts = heapq.heappop(heap)
+                if starts:
+                    activate(index)
+                else:
+                    active[index] = False
+                touched.add(self.rules[index].device)
+
+            actions = []
+            for device in touched:
+                rule = winner(device)
+                # keine aktive Regel mehr → Gerät bleibt, wie es ist
+                if rule is not None and desired.get(device) != rule.action:
+                    desired[device] = rule.action
+                    actions.append((device, rule.action))
+            touched.clear()
+            if actions:
+                yield minute, actions
+
+            if not heap:
+                return
+            minute = heap[0][0]
+
+
 class DaySimulator:
     def __init__(self, speed: float = 1.0): # Geschwindigkeit einstellen in Float
         self.speed = speed
         self.rules = []
+        self.step = 15              # Minuten pro Schritt (Raster der Regeln)
+        self.evaluations = 0        # Regelprüfungen bzw. Heap-Wakeups des letzten Laufs
 
     def add_rule(self, rule: Rule):
         self.rules.append(rule)
 
-    def run(self):
+    def run(self, schedule=None):
+        # Event-gesteuert: wacht nur zu den vorberechneten Schaltzeitpunkten auf.
+        # schedule: fertig aufgelöster Plan (z.B. RuleAnalyzer.resolve()), sonst aus self.rules
+        start = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+
+        print("\n" + "="*40)
+        print("DAY-SIMULATION STARTING")
+        print("="*40)
+
+        self.evaluations = 0
+        last = 0
+        if schedule is None:
+            schedule = TransitionScheduler(self.rules, self.step)
+        for minute, actions in schedule.transitions():
+            # Wartezeit bis zum nächsten Übergang (speed = Sekunden pro simulierter Stunde)
+            if self.speed > 0 and minute > last:
+                time.sleep(self.speed * (minute - last) / 60)
+            last = minute
+            self.evaluations += 1
+
+            sim_time = start + timedelta(minutes=minute)
+            print(f"\n{sim_time.strftime('%H:%M')} Uhr")
+
+            for device, action in actions:
+                if action == "on" and not device.is_on:
+                    device.turn_on()
+                elif action == "off" and device.is_on:
+                    device.turn_off()
+
+        print("\n" + "="*40)
+        print("SAY-SIMULATION ENDED")
+        print("="*40)
+
+    def run_polling(self):
+        # alte Variante: alle 15 Minuten jede Regel prüfen (zum Vergleich)
         start = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
 
         print("\n" + "="*40)
         print("DAY-SIMULATION STARTING")
         print("="*40)
 
-        for minutes in range(0, 24 * 60, 15):
+        self.evaluations = 0
+        for minutes in range(0, 24 * 60, self.step):
             sim_time = start + timedelta(minutes=minutes)
             current  = sim_time.time()
 
@@ -51,9 +190,46 @@ class DaySimulator:
 
             for rule in self.rules:
                 rule.evaluate(current)
+                self.evaluations += 1
 
             time.sleep(self.speed / 4)
 
         print("\n" + "="*40)
         print("SAY-SIMULATION ENDED")
-        print("="*40)
\ No newline at end of file
+        print("="*40)
+
+
+if __name__ == "__main__":
+    # Benchmark: Polling vs. Übergänge mit vielen Zeitregeln, Endzustand muss gleich sein
+    import contextlib
+    import io
+    import random
+    import sys
+
+    n_rules = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    n_devices = n_rules // 5
+    rng = random.Random(7)
+
+    def build():
+        devices = [Device(f"Gerät {i}") for i in range(n_devices)]
+        sim = DaySimulator(speed=0)
+        rng.seed(7)
+        for _ in range(n_rules):
+            start = dtime(rng.randrange(24), rng.choice([0, 15, 30, 45, 7]))
+            end = dtime(rng.randrange(24), rng.choice([0, 15, 30, 45, 52]))
+            sim.add_rule(Rule(TimeCondition(start, end), rng.choice(devices), rng.choice(["on", "off"])))
+        return devices, sim
+
+    results = {}
+    for name in ("run_polling", "run"):
+        devices, sim = build()
+        with contextlib.redirect_stdout(io.StringIO()):
+            started = time.perf_counter()
+            getattr(sim, name)()
+            elapsed = time.perf_counter() - started
+        results[name] = ([d.is_on for d in devices], elapsed, sim.evaluations)
+
+    same = results["run_polling"][0] == results["run"][0]
+    print(f"{n_rules} rules, {n_devices} devices, same final state: {same}")
+    print(f"  polling     : {results['run_polling'][1] * 1000:8.1f} ms  {results['run_polling'][2]} rule checks")
+    print(f"  transitions : {results['run'][1] * 1000:8.1f} ms  {results['run'][2]} wakeups")
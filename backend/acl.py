@@ -0,0 +1,83 @@
+# acl.py
+# Identität + Raumrechte des eingeloggten Users.
+# get_identity() wird pro Request nur einmal aufgelöst (liegt danach in
+# request.state), die Raum-IDs pro User liegen zusätzlich prozessweit in einem
+# kurzen TTL-Cache. Jede Änderung an Raumrechten (assign/unassign, Raum anlegen
+# oder löschen) muss invalidate_rooms() aufrufen.
+
+import threading
+import time
+from fastapi import Request
+from users_api import get_current_user
+from async_database import fetch_all
+
+ACL_TTL = 30.0      # Sekunden, die die Raum-IDs eines Users gecacht bleiben
+
+_room_cache = {}    # user_id -> (zeitpunkt, frozenset(room_ids))
+_room_cache_lock = threading.Lock()
+_generation = 0     # zählt invalidate_rooms(); ändert es sich während einer Abfrage, wird nicht gecacht
+
+
+class Identity:
+    def __init__(self, user, room_ids):
+        self.user = user
+        self.user_id = user["user_id"]
+        self.is_admin = user["user_role"] == "admin"
+        self.room_ids = room_ids    # None bei Admins = alle Räume
+
+    def can_access(self, room_id) -> bool:
+        return self.is_admin or room_id in self.room_ids
+
+
+def invalidate_rooms(user_id=None):
+    # user_id=None leert den ganzen Cache (z.B. wenn ein Raum gelöscht wird)
+    global _generation
+    with _room_cache_lock:
+        _generation += 1
+        if user_id is None:
+            _room_cache.clear()
+        else:
+            _room_cache.pop(user_id, None)
+
+
+async def accessible_room_ids(user_id) -> frozenset:
+    # eigene + zugewiesene Räume, aus dem Cache oder frisch aus der DB
+    now = time.monotonic()
+    with _room_cache_lock:
+        hit = _room_cache.get(user_id)
+        generation = _generation
+    if hit and now - hit[0] < ACL_TTL:
+        return hit[1]
+
+    rows = await fetch_all("""
+        SELECT room_id FROM rooms WHERE user_id = ?
+        UNION
+        SELECT room_id FROM room_users WHERE user_id = ?
+    """, (user_id, user_id))
+    room_ids = frozenset(row["room_id"] for row in rows)
+
+    with _room_cache_lock:
+        # invalidate_rooms() lief während der Abfrage → Ergebnis evtl. veraltet, nur diesmal benutzen
+        if generation == _generation:
+            _room_cache[user_id] = (now, room_ids)
+    return room_ids
+
+
+async def get_identity(request: Request):
+    """
+    Eingeloggter User samt Raumrechten oder None.
+    Kann direkt aufgerufen oder als FastAPI-Dependency (Depends(get_identity))
+    genutzt werden – innerhalb eines Requests wird nur einmal aufgelöst.
+    """
+    user = await get_current_user(request)
+    if not user:
+        return None
+
+    identity = getattr(request.state, "identity", None)
+    if identity is not None and identity.user_id == user["user_id"]:
+        return identity
+
+    room_ids = None if user["user_role"] == "admin" else await accessible_room_ids(user["user_id"])
+    identity = Identity(user, room_ids)
+    request.state.identity = identity
+    return identity
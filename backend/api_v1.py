@@ -0,0 +1,538 @@
+import sqlite3
+from typing import Optional
+from fastapi import APIRouter, Request
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+from acl import get_identity, invalidate_rooms
+from async_database import run_db, write_devices, device_change
+from database import batch_load
+from event_bus import bus
+from pagination import fetch_event_page
+from rule_index import invalidate_rules
+
+# Versionierte JSON-API für Automatisierung/Flotten-Tools.
+# Gleiche Datenzugriffe wie die HTML-Routen (async_database, acl, pagination),
+# aber ohne Templates und Redirects. Bulk-Endpunkte nehmen eine JSON-Liste und
+# schreiben alles mit executemany in EINER Transaktion – entweder alles oder
+# nichts. Listen-Endpunkte kennen ?fields=a,b (nur diese Spalten) und
+# ?compact=1 ({"fields": [...], "rows": [[...], ...]} statt Objekten).
+router = APIRouter(prefix="/api/v1", tags=["api"])
+
+MAX_BULK = 5000         # Einträge pro Bulk-Request
+DEFAULT_LIMIT = 500     # Zeilen pro Seite
+MAX_LIMIT = 5000
+
+ROOM_FIELDS = ("room_id", "room_name", "user_id")
+DEVICE_FIELDS = ("device_id", "room_id", "device_name", "device_type", "device_status")
+RULE_FIELDS = (
+    "rules_id", "device_id", "device_name", "device_type", "device_status", "room_id", "room_name",
+    "temp_treshold_high", "temp_treshold_low", "brightness_treshold_high", "brightness_treshold_low",
+)
+EVENT_FIELDS = (
+    "event_id", "device_id", "device_name", "device_type",
+    "device_status", "event_timestamp", "temp_value", "brightness_value",
+)
+
+
+class RoomIn(BaseModel):
+    room_name: str
+
+
+class DeviceIn(BaseModel):
+    room_id: int
+    device_name: str
+    device_type: str
+    device_status: bool = False
+
+
+class DeviceUpdate(BaseModel):
+    device_id: int
+    device_name: Optional[str] = None
+    device_type: Optional[str] = None
+    device_status: Optional[bool] = None
+    room_id: Optional[int] = None
+
+
+class RuleIn(BaseModel):
+    device_id: int
+    temp_treshold_high: int = 0
+    temp_treshold_low: int = 0
+    brightness_treshold_high: int = 0
+    brightness_treshold_low: int = 0
+
+
+class RuleUpdate(BaseModel):
+    rules_id: int
+    temp_treshold_high: Optional[int] = None
+    temp_treshold_low: Optional[int] = None
+    brightness_treshold_high: Optional[int] = None
+    brightness_treshold_low: Optional[int] = None
+
+
+class IdList(BaseModel):
+    ids: list[int]
+
+
+def _error(message, status_code, **extra):
+    return JSONResponse({"error": message, **extra}, status_code=status_code)
+
+
+async def _identity_or_error(request: Request, items=()):
+    # items: Liste eines Bulk-Requests, wird gegen MAX_BULK geprüft
+    identity = await get_identity(request)
+    if not identity:
+        return None, _error("not logged in", 401)
+    if len(items) > MAX_BULK:
+        return None, _error(f"max {MAX_BULK} items per request", 400)
+    return identity, None
+
+
+def _fields(fields, allowed, required=()):
+    """
+    ?fields=a,b → Spaltenliste (geprüft gegen allowed, also sicher fürs SQL).
+    required wird immer mitgeliefert (z.B. der Cursor). Ohne fields: alle.
+    """
+    if not fields:
+        return list(allowed), None
+    columns = [f.strip() for f in fields.split(",") if f.strip()]
+    unknown = [c for c in columns if c not in allowed]
+    if unknown:
+        return None, _error(f"unknown fields {unknown}", 400, allowed=list(allowed))
+    return list(dict.fromkeys(list(required) + columns)), None
+
+
+def _rows(rows, columns, compact):
+    if compact:
+        return {"fields": columns, "rows": [list(row) for row in rows]}
+    return {"items": [dict(zip(columns, row)) for row in rows]}
+
+
+def _limit(limit):
+    return max(1, min(limit or DEFAULT_LIMIT, MAX_LIMIT))
+
+
+def _room_filter(identity, column="room_id"):
+    # Nicht-Admins sehen nur ihre Räume
+    if identity.is_admin:
+        return "1 = 1", ()
+    room_ids = tuple(identity.room_ids)
+    if not room_ids:
+        return "0 = 1", ()
+    return f"{column} IN ({', '.join('?' * len(room_ids))})", room_ids
+
+
+def _forbidden(identity, room_ids):
+    return sorted({r for r in room_ids if not identity.can_access(r)})
+
+
+# ── Rooms ─────────────────────────────────────────────────────────
+@router.get("/rooms")
+async def list_rooms(request: Request, fields: Optional[str] = None, compact: bool = False):
+    identity, error = await _identity_or_error(request)
+    if error:
+        return error
+    columns, error = _fields(fields, ROOM_FIELDS)
+    if error:
+        return error
+
+    where, params = _room_filter(identity)
+
+    def _load(conn, curs):
+        return curs.execute(
+            f"SELECT {', '.join(columns)} FROM rooms WHERE {where} ORDER BY room_id", params
+        ).fetchall()
+
+    return _rows(await run_db(_load), columns, compact)
+
+
+@router.post("/rooms", status_code=201)
+async def create_rooms(request: Request, rooms: list[RoomIn]):
+    identity, error = await _identity_or_error(request, rooms)
+    if error:
+        return error
+
+    def _create(conn, curs):
+        with conn:
+            curs.executemany(
+                "INSERT INTO rooms (room_name, user_id) VALUES (?, ?)",
+                [(room.room_name, identity.user_id) for room in rooms]
+            )
+            last = curs.execute("SELECT last_insert_rowid()").fetchone()[0]
+        # AUTOINCREMENT in einer Transaktion → fortlaufende IDs
+        return list(range(last - len(rooms) + 1, last + 1)) if rooms else []
+
+    try:
+        ids = await run_db(_create)
+    except sqlite3.IntegrityError as e:
+        return _error(f"room already exists ({e})", 409)
+    invalidate_rooms(identity.user_id)
+    return {"created": len(ids), "ids": ids}
+
+
+@router.delete("/rooms")
+async def delete_rooms(request: Request, body: IdList):
+    identity, error = await _identity_or_error(request, body.ids)
+    if error:
+        return error
+    forbidden = _forbidden(identity, body.ids)
+    if forbidden:
+        return _error("no access", 403, room_ids=forbidden)
+
+    def _delete(conn, curs):
+        params = [(room_id,) for room_id in body.ids]
+        with conn:
+            curs.executemany("DELETE FROM devices WHERE room_id = ?", params)
+            curs.executemany("DELETE FROM rooms WHERE room_id = ?", params)
+            return curs.rowcount
+
+    deleted = await write_devices(_delete)
+    invalidate_rooms()
+    return {"deleted": deleted}
+
+
+# ── Devices ───────────────────────────────────────────────────────
+@router.get("/devices")
+async def list_devices(
+    request: Request,
+    room_id: Optional[int] = None,
+    device_type: Optional[str] = None,
+    after: Optional[int] = None,
+    limit: Optional[int] = None,
+    fields: Optional[str] = None,
+    compact: bool = False,
+):
+    """
+    Geräte nach device_id sortiert, Keyset-Pagination über ?after=<next>.
+    """
+    identity, error = await _identity_or_error(request)
+    if error:
+        return error
+    columns, error = _fields(fields, DEVICE_FIELDS, required=("device_id",))
+    if error:
+        return error
+    if room_id is not None and not identity.can_access(room_id):
+        return _error("no access", 403, room_ids=[room_id])
+
+    where, params = _room_filter(identity)
+    conditions, params = [where], list(params)
+    for column, value in (("room_id", room_id), ("device_type", device_type)):
+        if value is not None:
+            conditions.append(f"{column} = ?")
+            params.append(value)
+    if after is not None:
+        conditions.append("device_id > ?")
+        params.append(after)
+    limit = _limit(limit)
+
+    def _load(conn, curs):
+        return curs.execute(
+            f"SELECT {', '.join(columns)} FROM devices WHERE {' AND '.join(conditions)} "
+            "ORDER BY device_id LIMIT ?",
+            params + [limit + 1]
+        ).fetchall()
+
+    rows = await run_db(_load)
+    result = _rows(rows[:limit], columns, compact)
+    result["next"] = rows[limit - 1][0] if len(rows) > limit else None
+    return result
+
+
+@router.post("/devices", status_code=201)
+async def create_devices(request: Request, devices: list[DeviceIn]):
+    identity, error = await _identity_or_error(request, devices)
+    if error:
+        return error
+    forbidden = _forbidden(identity, [d.room_id for d in devices])
+    if forbidden:
+        return _error("no access", 403, room_ids=forbidden)
+
+    def _create(conn, curs):
+        rooms = batch_load(curs, "SELECT room_id FROM rooms WHERE room_id IN ({keys})",
+                           [d.room_id for d in devices], "room_id")
+        missing = sorted({d.room_id for d in devices} - rooms.keys())
+        if missing:
+            return None, missing
+        with conn:
+            curs.executemany("""
+                INSERT INTO devices (room_id, device_name, device_type, device_status)
+                VALUES (?, ?, ?, ?)
+            """, [(d.room_id, d.device_name, d.device_type, int(d.device_status)) for d in devices])
+            last = curs.execute("SELECT last_insert_rowid()").fetchone()[0]
+        return list(range(last - len(devices) + 1, last + 1)) if devices else [], None
+
+    try:
+        ids, missing = await write_devices(_create)
+    except sqlite3.IntegrityError as e:
+        return _error(f"device name already exists ({e})", 409)
+    if missing:
+        return _error("unknown rooms", 404, room_ids=missing)
+    return {"created": len(ids), "ids": ids}
+
+
+@router.patch("/devices")
+async def update_devices(request: Request, devices: list[DeviceUpdate]):
+    """
+    Nur gesetzte Felder werden geändert (COALESCE), z.B.
+    [{"device_id": 4, "device_status": true}, {"device_id": 5, "room_id": 2}]
+    """
+    identity, error = await _identity_or_error(request, devices)
+    if error:
+        return error
+
+    def _update(conn, curs):
+        current = batch_load(curs, "SELECT device_id, room_id FROM devices WHERE device_id IN ({keys})",
+                             [d.device_id for d in devices], "device_id")
+        missing = sorted({d.device_id for d in devices} - current.keys())
+        if missing:
+            return None, _error("unknown devices", 404, device_ids=missing)
+        targets = [d.room_id for d in devices if d.room_id is not None]
+        forbidden = _forbidden(identity, [current[d.device_id][0]["room_id"] for d in devices] + targets)
+        if forbidden:
+            return None, _error("no access", 403, room_ids=forbidden)
+        # Zielräume müssen existieren (sonst hängen Geräte an keinem Raum)
+        existing = batch_load(curs, "SELECT room_id FROM rooms WHERE room_id IN ({keys})", targets, "room_id")
+        missing = sorted(set(targets) - existing.keys())
+        if missing:
+            return None, _error("unknown rooms", 404, room_ids=missing)
+        # erst nach den Prüfungen: offene Simulationswerte nur der geänderten Geräte verwerfen
+        with device_change(list(current)), conn:
+            curs.executemany("""
+                UPDATE devices SET
+                    device_name   = COALESCE(?, device_name),
+                    device_type   = COALESCE(?, device_type),
+                    device_status = COALESCE(?, device_status),
+                    room_id       = COALESCE(?, room_id)
+                WHERE device_id = ?
+            """, [(
+                d.device_name, d.device_type,
+                None if d.device_status is None else int(d.device_status),
+                d.room_id, d.device_id
+            ) for d in devices])
+        return current, None
+
+    try:
+        # schreibt über den DeviceStateStore: die Simulation übernimmt Status und Raum
+        current, error = await run_db(_update)
+    except sqlite3.IntegrityError as e:
+        return _error(f"device name already exists ({e})", 409)
+    if error:
+        return error
+
+    bus.publish_many([{
+        "type": "device_status",
+        "device_id": d.device_id,
+        "room_id": d.room_id if d.room_id is not None else current[d.device_id][0]["room_id"],
+        "device_status": int(d.device_status),
+    } for d in devices if d.device_status is not None])
+    return {"updated": len(devices)}
+
+
+@router.delete("/devices")
+async def delete_devices(request: Request, body: IdList):
+    identity, error = await _identity_or_error(request, body.ids)
+    if error:
+        return error
+
+    def _delete(conn, curs):
+        current = batch_load(curs, "SELECT device_id, room_id FROM devices WHERE device_id IN ({keys})",
+                             body.ids, "device_id")
+        forbidden = _forbidden(identity, [rows[0]["room_id"] for rows in current.values()])
+        if forbidden:
+            return None, _error("no access", 403, room_ids=forbidden)
+        with device_change(list(current)), conn:
+            curs.executemany("DELETE FROM devices WHERE device_id = ?", [(i,) for i in current])
+        return len(current), None
+
+    deleted, error = await run_db(_delete)
+    return error or {"deleted": deleted}
+
+
+# ── Rules ─────────────────────────────────────────────────────────
+@router.get("/rules")
+async def list_rules(
+    request: Request,
+    device_id: Optional[int] = None,
+    room_id: Optional[int] = None,
+    fields: Optional[str] = None,
+    compact: bool = False,
+):
+    identity, error = await _identity_or_error(request)
+    if error:
+        return error
+    columns, error = _fields(fields, RULE_FIELDS)
+    if error:
+        return error
+
+    where, params = _room_filter(identity)
+    conditions, params = [where], list(params)
+    for column, value in (("device_id", device_id), ("room_id", room_id)):
+        if value is not None:
+            conditions.append(f"{column} = ?")
+            params.append(value)
+
+    def _load(conn, curs):
+        return curs.execute(
+            f"SELECT {', '.join(columns)} FROM rules WHERE {' AND '.join(conditions)} ORDER BY rules_id",
+            params
+        ).fetchall()
+
+    return _rows(await run_db(_load), columns, compact)
+
+
+@router.post("/rules", status_code=201)
+async def create_rules(request: Request, rules: list[RuleIn]):
+    identity, error = await _identity_or_error(request, rules)
+    if error:
+        return error
+
+    def _create(conn, curs):
+        devices = batch_load(curs, """
+            SELECT d.device_id, d.device_name, d.device_type, d.device_status,
+                   d.room_id, r.room_name
+            FROM devices d
+            JOIN rooms r ON d.room_id = r.room_id
+            WHERE d.device_id IN ({keys})
+        """, [rule.device_id for rule in rules], "device_id")
+        missing = sorted({rule.device_id for rule in rules} - devices.keys())
+        if missing:
+            return None, _error("unknown devices", 404, device_ids=missing)
+        forbidden = _forbidden(identity, [rows[0]["room_id"] for rows in devices.values()])
+        if forbidden:
+            return None, _error("no access", 403, room_ids=forbidden)
+
+        rows = []
+        for rule in rules:
+            device = devices[rule.device_id][0]
+            rows.append((
+                device["device_id"], device["device_name"], device["device_type"], device["device_status"],
+                device["room_id"], device["room_name"],
+                rule.temp_treshold_high, rule.temp_treshold_low,
+                rule.brightness_treshold_high, rule.brightness_treshold_low
+            ))
+        with conn:
+            curs.executemany("""
+                INSERT INTO rules (
+                    device_id, device_name, device_type, device_status,
+                    room_id, room_name,
+                    temp_treshold_high, temp_treshold_low,
+                    brightness_treshold_high, brightness_treshold_low
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, rows)
+            last = curs.execute("SELECT last_insert_rowid()").fetchone()[0]
+        return list(range(last - len(rows) + 1, last + 1)) if rows else [], None
+
+    ids, error = await run_db(_create)
+    if error:
+        return error
+    invalidate_rules()     # Simulation kompiliert die Regeln neu
+    return {"created": len(ids), "ids": ids}
+
+
+@router.patch("/rules")
+async def update_rules(request: Request, rules: list[RuleUpdate]):
+    identity, error = await _identity_or_error(request, rules)
+    if error:
+        return error
+
+    def _update(conn, curs):
+        current = batch_load(curs, "SELECT rules_id, room_id FROM rules WHERE rules_id IN ({keys})",
+                             [rule.rules_id for rule in rules], "rules_id")
+        missing = sorted({rule.rules_id for rule in rules} - current.keys())
+        if missing:
+            return _error("unknown rules", 404, rules_ids=missing)
+        forbidden = _forbidden(identity, [rows[0]["room_id"] for rows in current.values()])
+        if forbidden:
+            return _error("no access", 403, room_ids=forbidden)
+        with conn:
+            curs.executemany("""
+                UPDATE rules SET
+                    temp_treshold_high       = COALESCE(?, temp_treshold_high),
+                    temp_treshold_low        = COALESCE(?, temp_treshold_low),
+                    brightness_treshold_high = COALESCE(?, brightness_treshold_high),
+                    brightness_treshold_low  = COALESCE(?, brightness_treshold_low)
+                WHERE rules_id = ?
+            """, [(
+                rule.temp_treshold_high, rule.temp_treshold_low,
+                rule.brightness_treshold_high, rule.brightness_treshold_low,
+                rule.rules_id
+            ) for rule in rules])
+        return None
+
+    error = await run_db(_update)
+    if error:
+        return error
+    invalidate_rules()
+    return {"updated": len(rules)}
+
+
+@router.delete("/rules")
+async def delete_rules(request: Request, body: IdList):
+    identity, error = await _identity_or_error(request, body.ids)
+    if error:
+        return error
+
+    def _delete(conn, curs):
+        current = batch_load(curs, "SELECT rules_id, room_id FROM rules WHERE rules_id IN ({keys})",
+                             body.ids, "rules_id")
+        forbidden = _forbidden(identity, [rows[0]["room_id"] for rows in current.values()])
+        if forbidden:
+            return None, _error("no access", 403, room_ids=forbidden)
+        with conn:
+            curs.executemany("DELETE FROM rules WHERE rules_id = ?", [(i,) for i in current])
+        return len(current), None
+
+    deleted, error = await run_db(_delete)
+    if error:
+        return error
+    invalidate_rules()
+    return {"deleted": deleted}
+
+
+# ── Events ────────────────────────────────────────────────────────
+@router.get("/events")
+async def list_events(
+    request: Request,
+    device_id: Optional[int] = None,
+    device_type: Optional[str] = None,
+    room_id: Optional[int] = None,
+    before: Optional[int] = None,
+    after: Optional[int] = None,
+    limit: Optional[int] = None,
+    fields: Optional[str] = None,
+    compact: bool = False,
+):
+    """
+    device_event_log, neueste zuerst. Keyset-Cursor wie bei den HTML-Seiten:
+    ?before=<older> für ältere, ?after=<newer> für neuere Events.
+    """
+    identity, error = await _identity_or_error(request)
+    if error:
+        return error
+    columns, error = _fields(fields, EVENT_FIELDS, required=("event_id",))
+    if error:
+        return error
+    if room_id is not None and not identity.can_access(room_id):
+        return _error("no access", 403, room_ids=[room_id])
+
+    room_where, room_params = _room_filter(identity)
+    conditions, params = [], []
+    if not identity.is_admin:
+        conditions.append(f"device_id IN (SELECT device_id FROM devices WHERE {room_where})")
+        params.extend(room_params)
+    if room_id is not None:
+        conditions.append("device_id IN (SELECT device_id FROM devices WHERE room_id = ?)")
+        params.append(room_id)
+    for column, value in (("device_id", device_id), ("device_type", device_type)):
+        if value is not None:
+            conditions.append(f"{column} = ?")
+            params.append(value)
+    where = " AND ".join(conditions) or "1 = 1"
+
+    def _load(conn, curs):
+        return fetch_event_page(curs, where, params, before, after, _limit(limit), ", ".join(columns))
+
+    page = await run_db(_load)
+    result = _rows(page["events"], columns, compact)
+    result["older"] = page["older"]
+    result["newer"] = page["newer"]
+    return result
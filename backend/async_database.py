@@ -0,0 +1,93 @@
+# async_database.py
+# Async Zugriff auf die Datenbank für die FastAPI-Router.
+# sqlite3 blockiert, deshalb läuft jede Abfrage im Threadpool von Starlette –
+# der Event Loop bleibt frei und parallele Requests überlappen sich wirklich.
+
+from starlette.concurrency import run_in_threadpool
+from database import Database, get_pool
+from state_store import get_state_store
+
+DB_PATH = "hub.db"
+
+
+def _run(fn, args):
+    conn = get_pool(DB_PATH).acquire()
+    curs = conn.cursor()
+    try:
+        return fn(conn, curs, *args)
+    finally:
+        conn.close()
+
+
+async def run_db(fn, *args):
+    """
+    Führt fn(conn, curs, *args) mit einer Pool-Verbindung im Threadpool aus.
+    Für alles, was mehrere Statements in einer Transaktion braucht.
+    """
+    return await run_in_threadpool(_run, fn, args)
+
+
+def device_change(device_ids=()):
+    """
+    DeviceStateStore.external_change für DB_PATH. Für Funktionen unter run_db,
+    die erst prüfen (Rechte, Existenz) und dann nur einen Teil der Geräte
+    schreiben: nur um den Schreibzugriff legen, mit genau diesen device_ids.
+    """
+    return get_state_store(Database(DB_PATH)).external_change(device_ids)
+
+
+async def write_devices(fn, *args, device_ids=()):
+    """
+    Wie run_db, für Schreibzugriffe auf devices (Status, Anlegen, Löschen,
+    Verschieben): fn läuft in DeviceStateStore.external_change, damit kein
+    Flush der Simulation die Änderung überschreibt und die Simulation ihre
+    Geräte vor dem nächsten Tick neu lädt.
+    """
+    def _write(conn, curs, *args):
+        with device_change(device_ids):
+            return fn(conn, curs, *args)
+    return await run_db(_write, *args)
+
+
+async def fetch_one(query, params=()):
+    def _fetch(conn, curs):
+        return curs.execute(query, params).fetchone()
+    return await run_db(_fetch)
+
+
+async def fetch_all(query, params=()):
+    def _fetch(conn, curs):
+        return curs.execute(query, params).fetchall()
+    return await run_db(_fetch)
+
+
+async def fetch_value(query, params=(), default=None):
+    # erste Spalte der ersten Zeile, z.B. für COUNT(*)
+    row = await fetch_one(query, params)
+    return default if row is None else row[0]
+
+
+async def execute(query, params=()):
+    # schreibendes Statement + commit, gibt lastrowid zurück
+    def _execute(conn, curs):
+        curs.execute(query, params)
+        conn.commit()
+        return curs.lastrowid
+    return await run_db(_execute)
+
+
+async def execute_devices(query, params=(), device_ids=()):
+    # wie execute, für devices: Anlegen/Löschen lädt die Simulation neu
+    def _execute(conn, curs):
+        curs.execute(query, params)
+        conn.commit()
+        return curs.lastrowid
+    return await write_devices(_execute, device_ids=device_ids)
+
+
+async def execute_many(query, rows):
+    def _execute(conn, curs):
+        curs.executemany(query, rows)
+        conn.commit()
+        return curs.rowcount
+    return await run_db(_execute)
@@ -0,0 +1,172 @@
+import asyncio
+import json
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect
+from acl import get_identity, accessible_room_ids
+from async_database import run_db, device_change
+from database import batch_load
+from event_bus import bus
+from event_writer import INSERT_EVENT_SQL, utc_timestamp
+from hub_logging import get_logger
+
+# WebSocket-Kanal für viele Gerätebefehle auf einmal (z.B. Szenen).
+# Statt einem Formular-POST + Redirect pro Gerät schickt der Client
+#     {"id": 1, "commands": [{"device_id": 4, "action": "on"},
+#                            {"device_id": 7, "action": "brightness", "value": 40}]}
+# und bekommt pro Nachricht ein Ack
+#     {"id": 1, "applied": 2, "errors": []}
+# Ein Reader nimmt Nachrichten an, ein Worker arbeitet alle wartenden
+# Nachrichten in EINER Transaktion ab und schickt danach die Acks.
+log = get_logger("command_api")
+
+router = APIRouter(prefix="/devices", tags=["devices"])
+
+COMMAND_QUEUE = 64      # Nachrichten, die auf Verarbeitung warten dürfen (danach liest der Reader nicht weiter)
+MAX_COMMANDS = 1000     # Befehle pro Nachricht
+ACTIONS = ("on", "off", "brightness")
+
+UPDATE_STATUS_SQL = "UPDATE devices SET device_status = ? WHERE device_id = ?"
+
+
+def _parse(text):
+    """
+    Prüft eine Nachricht auf Form und Inhalt.
+    Gibt (id, [(device_id, action, value), ...], fehler) zurück.
+    """
+    try:
+        message = json.loads(text)
+    except ValueError:
+        return None, [], "invalid json"
+    if not isinstance(message, dict) or not isinstance(message.get("commands"), list):
+        return None, [], "expected {\"id\": ..., \"commands\": [...]}"
+
+    msg_id = message.get("id")
+    if len(message["commands"]) > MAX_COMMANDS:
+        return msg_id, [], f"max {MAX_COMMANDS} commands per message"
+
+    commands = []
+    for command in message["commands"]:
+        if not isinstance(command, dict):
+            return msg_id, [], "command must be an object"
+        device_id, action, value = command.get("device_id"), command.get("action"), command.get("value")
+        if not isinstance(device_id, int) or action not in ACTIONS:
+            return msg_id, [], f"invalid command {command}"
+        if action == "brightness" and not (isinstance(value, int) and 0 <= value <= 100):
+            return msg_id, [], "brightness value must be 0-100"
+        commands.append((device_id, action, value))
+    return msg_id, commands, None
+
+
+def _apply_commands(conn, curs, batch, room_ids):
+    """
+    batch: [[(device_id, action, value), ...], ...] – eine Liste pro Nachricht.
+    Alle Geräte werden mit einer Query geladen, Rechte gegen room_ids
+    (None = Admin) geprüft und alle gültigen Befehle in einer Transaktion
+    geschrieben; pro Gerät zählt der letzte Befehl. Nur die geschriebenen
+    Geräte laufen durch external_change (fremde oder unbekannte IDs lassen
+    offene Werte der Simulation in Ruhe).
+    Gibt ([(applied, errors), ...] pro Nachricht, [geschriebene Events]) zurück.
+    """
+    devices = batch_load(
+        curs,
+        "SELECT device_id, device_name, device_type, room_id FROM devices WHERE device_id IN ({keys})",
+        [device_id for commands in batch for device_id, _, _ in commands],
+        "device_id"
+    )
+
+    results, final = [], {}     # final: device_id -> (device, status, brightness)
+    for commands in batch:
+        applied, errors = 0, []
+        for device_id, action, value in commands:
+            rows = devices.get(device_id)
+            if not rows or (room_ids is not None and rows[0]["room_id"] not in room_ids):
+                errors.append({"device_id": device_id, "error": "no access"})
+                continue
+            device = rows[0]
+            if action == "brightness":
+                if device["device_type"] != "Lamp":
+                    errors.append({"device_id": device_id, "error": "no brightness control"})
+                    continue
+                final[device_id] = (device, value > 0, value)
+            else:
+                final[device_id] = (device, action == "on", None)
+            applied += 1
+        results.append((applied, errors))
+
+    if not final:
+        return results, []
+
+    timestamp = utc_timestamp()
+    events = [{
+        "type": "device_status",
+        "device_id": device_id,
+        "device_name": device["device_name"],
+        "device_type": device["device_type"],
+        "room_id": device["room_id"],
+        "device_status": int(status),
+        "event_timestamp": timestamp,
+        "brightness_value": brightness,
+    } for device_id, (device, status, brightness) in final.items()]
+
+    with device_change(list(final)), conn:
+        curs.executemany(UPDATE_STATUS_SQL, [(e["device_status"], e["device_id"]) for e in events])
+        curs.executemany(INSERT_EVENT_SQL, [
+            (e["device_id"], e["device_name"], e["device_type"], e["device_status"],
+             timestamp, None, e["brightness_value"])
+            for e in events
+        ])
+    return results, events
+
+
+@router.websocket("/ws")
+async def device_commands(websocket: WebSocket):
+    identity = await get_identity(websocket)
+    if not identity:
+        await websocket.close(code=1008)    # policy violation: nicht eingeloggt
+        return
+    await websocket.accept()
+
+    inbox = asyncio.Queue(COMMAND_QUEUE)
+
+    async def worker():
+        try:
+            await process()
+        except Exception:
+            log.exception("Befehle fehlgeschlagen", extra={"user_id": identity.user_id})
+            await websocket.close(code=1011)
+
+    async def process():
+        while True:
+            # alles abholen, was schon wartet → eine Transaktion für alle
+            pending = [await inbox.get()]
+            while not inbox.empty():
+                pending.append(inbox.get_nowait())
+
+            valid = [(msg_id, commands) for msg_id, commands, error in pending if not error]
+            results, events = [], []
+            if valid:
+                # Raumrechte aus dem ACL-Cache, damit Änderungen auch offene Sockets erreichen
+                room_ids = None if identity.is_admin else await accessible_room_ids(identity.user_id)
+                # schreibt über den DeviceStateStore: die Simulation übernimmt die neuen Stati
+                results, events = await run_db(_apply_commands, [commands for _, commands in valid], room_ids)
+            if events:
+                bus.publish_many(events)
+
+            results = iter(results)
+            for msg_id, commands, error in pending:
+                if error:
+                    await websocket.send_json({"id": msg_id, "applied": 0, "errors": [{"error": error}]})
+                else:
+                    applied, errors = next(results)
+                    await websocket.send_json({"id": msg_id, "applied": applied, "errors": errors})
+
+    task = asyncio.create_task(worker())
+    try:
+        while True:
+            text = await websocket.receive_text()
+            if task.done():
+                break
+            await inbox.put(_parse(text))
+    except WebSocketDisconnect:
+        pass
+    finally:
+        task.cancel()
@@ -1,11 +1,242 @@
 # database.py
+import os
+import queue
 import sqlite3
+import threading
+from metrics import TimedCursor, in_request, trace_statement
+
+# max. offene Verbindungen pro Datenbankdatei (alle bleiben zur Wiederverwendung offen)
+POOL_SIZE = 16
+# Sekunden, die acquire() auf eine freie Verbindung wartet, bevor PoolTimeout kommt
+ACQUIRE_TIMEOUT = 10.0
+
+# PRAGMAs werden einmal pro physischer Verbindung gesetzt (beim Öffnen)
+DEFAULT_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "cache_size": -16000,       # negativ = KiB, also ~16 MB Page-Cache
+    "mmap_size": 134217728,     # 128 MB memory-mapped I/O
+    "busy_timeout": 5000,       # ms warten statt sofort "database is locked"
+}
+
+
+class PoolTimeout(sqlite3.OperationalError):
+    """Keine freie Verbindung innerhalb von ACQUIRE_TIMEOUT."""
+
+
+class PooledConnection:
+    """
+    Dünner Wrapper um eine sqlite3-Verbindung aus dem Pool.
+    Verhält sich wie eine normale Connection, aber close() gibt die
+    Verbindung an den Pool zurück statt sie wirklich zu schließen.
+    """
+
+    def __init__(self, pool, conn):
+        self._pool = pool
+        self._conn = conn
+
+    def __getattr__(self, name):
+        conn = self.__dict__.get("_conn")
+        if conn is None:
+            raise sqlite3.ProgrammingError("Connection was already returned to the pool.")
+        return getattr(conn, name)
+
+    def _raw(self):
+        conn = self._conn
+        if conn is None:
+            raise sqlite3.ProgrammingError("Connection was already returned to the pool.")
+        return conn
+
+    # Cursor + Kurzformen laufen über TimedCursor (SQL-Zeit pro Request, siehe metrics.py)
+    def cursor(self, factory=TimedCursor):
+        return self._raw().cursor(factory)
+
+    def execute(self, sql, params=()):
+        return self.cursor().execute(sql, params)
+
+    def executemany(self, sql, rows):
+        return self.cursor().executemany(sql, rows)
+
+    def __enter__(self):
+        # sich selbst zurückgeben, damit auch "with conn as c:" über TimedCursor läuft
+        self._raw().__enter__()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return self._conn.__exit__(exc_type, exc, tb)
+
+    def close(self):
+        conn, self._conn = self._conn, None
+        if conn is not None:
+            self._pool.release(conn)
+
+    def __del__(self):
+        # Falls jemand close() vergisst, landet die Verbindung trotzdem wieder im Pool
+        try:
+            self.close()
+        except Exception:
+            pass
+
+
+class ConnectionPool:
+    """
+    Hält höchstens pool_size Verbindungen zu einer SQLite-Datei offen.
+    Jeder Checkout bekommt eine eigene Verbindung (nie zwei Threads/Tasks
+    gleichzeitig auf derselben). Sind alle ausgecheckt, wartet acquire()
+    bis zu timeout Sekunden auf eine Rückgabe und wirft dann PoolTimeout –
+    unter Last gibt es also kein Öffnen/Schließen pro Request, und ein
+    Handler, der selbst schon eine Verbindung hält, hängt nicht endlos.
+    """
+
+    def __init__(self, db_path, pool_size=POOL_SIZE, pragmas=None, timeout=ACQUIRE_TIMEOUT):
+        self.db_path = db_path
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.pragmas = dict(DEFAULT_PRAGMAS if pragmas is None else pragmas)
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(pool_size)    # eine Marke pro ausgecheckter Verbindung
+        self._lock = threading.Lock()
+        self._open = 0
+        self.waits = 0          # Checkouts, die auf eine Verbindung warten mussten
+        self.timeouts = 0
+
+    def _create(self):
+        conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        for name, value in self.pragmas.items():
+            conn.execute(f"PRAGMA {name} = {value}")
+        with self._lock:
+            self._open += 1
+        return conn
+
+    def _discard(self, conn):
+        with self._lock:
+            self._open -= 1
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+
+    @staticmethod
+    def _is_healthy(conn):
+        try:
+            conn.execute("SELECT 1").fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def acquire(self, timeout=None):
+        if not self._slots.acquire(blocking=False):
+            self.waits += 1
+            if not self._slots.acquire(timeout=self.timeout if timeout is None else timeout):
+                self.timeouts += 1
+                raise PoolTimeout(f"no free connection to {self.db_path} (pool_size={self.pool_size})")
+        try:
+            while True:
+                try:
+                    conn = self._idle.get_nowait()
+                except queue.Empty:
+                    conn = self._create()
+                    break
+                if self._is_healthy(conn):
+                    break
+                self._discard(conn)
+        except BaseException:
+            self._slots.release()
+            raise
+        if in_request():
+            # Statements pro Request zählen (metrics.py), beim release wieder aus
+            conn.set_trace_callback(trace_statement)
+        return PooledConnection(self, conn)
+
+    def release(self, conn):
+        # offene Transaktionen nicht in den nächsten Checkout mitschleppen
+        try:
+            conn.set_trace_callback(None)
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            self._discard(conn)
+        else:
+            self._idle.put(conn)
+        finally:
+            self._slots.release()
+
+    def close_all(self):
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._discard(conn)
+
+    def stats(self):
+        return {"open": self._open, "idle": self._idle.qsize(), "pool_size": self.pool_size,
+                "waits": self.waits, "timeouts": self.timeouts}
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(db_path, pool_size=None):
+    """
+    Ein Pool pro Datei, egal ob relativ oder absolut angegeben.
+    pool_size gilt nur beim Anlegen (Standard POOL_SIZE); eine andere Größe
+    für einen schon offenen Pool ist ein Fehler statt stillschweigend ignoriert.
+    """
+    key = os.path.abspath(db_path)
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = ConnectionPool(key, pool_size=POOL_SIZE if pool_size is None else pool_size)
+            _pools[key] = pool
+        elif pool_size is not None and pool_size != pool.pool_size:
+            raise ValueError(f"pool for {key} already open with pool_size={pool.pool_size}, not {pool_size}")
+        return pool
+
+
+def pool_stats():
+    # {db-pfad: stats()} aller Pools, z.B. für /metrics
+    with _pools_lock:
+        return {path: pool.stats() for path, pool in _pools.items()}
+
+
+def close_all_pools():
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.close_all()
+
+
+BATCH_KEYS = 500    # max. Platzhalter pro IN (...) – SQLite erlaubt je nach Version nur 999
+
+
+def batch_load(curs, query, keys, key_column):
+    """
+    Lädt Kind-Zeilen für viele Eltern auf einmal statt einer Query pro Eltern (N+1).
+
+    query      : SQL mit "{keys}" an der Stelle der IN-Liste, z.B.
+                 "SELECT * FROM devices WHERE room_id IN ({keys})"
+    keys       : Eltern-IDs
+    key_column : Spalte im Ergebnis, nach der gruppiert wird
+
+    Gibt {key: [zeilen]} zurück; Eltern ohne Kinder fehlen im dict.
+    """
+    keys = list(dict.fromkeys(keys))
+    grouped = {}
+    for start in range(0, len(keys), BATCH_KEYS):
+        chunk = keys[start:start + BATCH_KEYS]
+        placeholders = ", ".join("?" for _ in chunk)
+        for row in curs.execute(query.format(keys=placeholders), chunk):
+            grouped.setdefault(row[key_column], []).append(row)
+    return grouped
+
 
 class Database:
-    def __init__(self, db_path):
+    # pool_size: nur für den ersten Database(path) einer Datei, siehe get_pool
+    def __init__(self, db_path, pool_size=None):
         self.db_path = db_path
+        self.pool = get_pool(db_path, pool_size)
 
     def connect(self):
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
-        return conn
\ No newline at end of file
+        return self.pool.acquire()
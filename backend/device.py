@@ -1,4 +1,17 @@
+from event_writer import INSERT_EVENT_SQL, utc_timestamp
+from state_store import get_state_store
+from event_bus import bus
+from hub_logging import get_logger
+
+log = get_logger("device")
+
+
 class Device:
+    # __slots__: kein __dict__ pro Gerät, spart bei vielen Geräten deutlich Speicher.
+    # Neue Attribute müssen hier (bzw. in den __slots__ der Unterklasse) stehen.
+    __slots__ = ("device_id", "device_name", "device_type", "device_status",
+                 "room_id", "database", "state_table")
+
     def __init__(self, device_id, device_name, device_type, device_status, room_id, database):
         self.device_id = device_id
         self.device_name = device_name
@@ -6,62 +19,72 @@ class Device:
         self.device_status = bool(device_status)
         self.room_id = room_id
         self.database = database
-        self.brightness = None
-        
+        self.state_table = None     # optional: DeviceStateTable des Hubs
 
+
+    # device_status ist der Stand der DB: Änderungen von außen übernimmt der Hub
+    # vor jedem Tick (SmartHomeHub.refresh_devices), deshalb darf hier übersprungen werden
     def turn_on(self):
+        if self.device_status:      # schon an → nichts zu schreiben
+            return
         self.device_status = True
         self._update_status_in_db()
-        print(f"{self.device_name} turned ON")
+        log.debug("%s turned ON", self.device_name, extra={"device_id": self.device_id, "room_id": self.room_id})
 
     def turn_off(self):
+        if not self.device_status:  # schon aus → nichts zu schreiben
+            return
         self.device_status = False
         self._update_status_in_db()
-        print(f"{self.device_name} turned OFF")
+        log.debug("%s turned OFF", self.device_name, extra={"device_id": self.device_id, "room_id": self.room_id})
 
     def _update_status_in_db(self):
+        if self.state_table is not None:
+            self.state_table.set_status(self.device_id, self.device_status)
+        # write-behind: wird gesammelt und vom DeviceStateStore gebündelt geschrieben
+        get_state_store(self.database).mark(self.device_id, self.device_status)
+        if len(bus):
+            bus.publish({
+                "type": "device_status",
+                "device_id": self.device_id,
+                "device_name": self.device_name,
+                "device_type": self.device_type,
+                "room_id": self.room_id,
+                "device_status": int(self.device_status),
+            })
+
+    def save_to_db(self, event_writer=None):
+        """
+        Speichert das aktuelle Device in die DB.
+        Mit event_writer wird der Event-Log-Eintrag gepuffert statt sofort geschrieben
+        (z.B. beim Anlegen vieler Geräte auf einmal).
+        """
         conn = self.database.connect()
         cursor = conn.cursor()
 
-        cursor.execute("""
-            UPDATE devices
-            SET device_status = ?
-            WHERE device_id = ?
-        """, (int(self.device_status), self.device_id))
+        # neues Gerät → laufende Simulation lädt vor dem nächsten Tick neu
+        with get_state_store(self.database).external_change():
+            # Device speichern
+            cursor.execute("""
+                INSERT INTO devices (device_name, device_type, device_status, room_id)
+                VALUES (?, ?, ?, ?)
+            """, (self.device_name, self.device_type, int(self.device_status), self.room_id))
 
-        conn.commit()
-        conn.close()
+            # device_id setzen (falls AUTOINCREMENT)
+            self.device_id = cursor.lastrowid
 
-    def save_to_db(self):
-        """Speichert das aktuelle Device in die DB"""
-        conn = self.database.connect()
-        cursor = conn.cursor()
+            # Event Log korrekt eintragen
+            event = (self.device_id, self.device_name, self.device_type, int(self.device_status))
+            if event_writer is None:
+                cursor.execute(INSERT_EVENT_SQL, event + (utc_timestamp(), None, None))
 
-        # Device speichern
-        cursor.execute("""
-            INSERT INTO devices (device_name, device_type, device_status, room_id)
-            VALUES (?, ?, ?, ?)
-        """, (self.device_name, self.device_type, int(self.device_status), self.room_id))
-
-        # device_id setzen (falls AUTOINCREMENT)
-        self.device_id = cursor.lastrowid
-
-        # Event Log korrekt eintragen
-        cursor.execute("""
-            INSERT INTO device_event_log
-            (device_id, device_name, device_type, device_status, event_timestamp)
-            VALUES (?, ?, ?, ?, datetime('now'))
-        """, (
-            self.device_id,
-            self.device_name,
-            self.device_type,
-            int(self.device_status)
-        ))
-
-        conn.commit()
+            conn.commit()
         conn.close()
 
-        print(f"{self.device_name} saved to DB")
+        if event_writer is not None:
+            event_writer.add(*event)
+
+        log.debug("%s saved to DB", self.device_name, extra={"device_id": self.device_id, "room_id": self.room_id})
 
     def print_info(self):
         state = "ON" if self.device_status else "OFF"
@@ -80,6 +103,8 @@ class Device:
 
 
 class Lamp(Device):
+    __slots__ = ("brightness",)
+
     def __init__(self, device_id, device_name, device_status, room_id, database, brightness=0):
         super().__init__(
             device_id=device_id,
@@ -94,12 +119,14 @@ class Lamp(Device):
     def set_brightness(self, level: int):
         """Setzt die Helligkeit (0–100). Nur für Geräte mit Brightness."""
         if self.brightness == 0:
-            print(f"{self.device_name} does not support brightness control")
+            log.warning("%s does not support brightness control", self.device_name, extra={"device_id": self.device_id})
             return
 
     def set_brightness(self, level: int):
         """Setzt die Helligkeit (0–100)."""
         self.brightness = max(0, min(100, level))
+        if self.state_table is not None:
+            self.state_table.set_brightness(self.device_id, self.brightness)
 
         if self.brightness == 0:
             self.turn_off()
@@ -108,6 +135,8 @@ class Lamp(Device):
 
 
 class alarm_clock(Device):
+    __slots__ = ()
+
     def __init__(self, device_id, device_name, device_status, room_id, database):
         super().__init__(
             device_id=device_id,
@@ -120,6 +149,8 @@ class alarm_clock(Device):
 
 
 class Heater(Device):
+    __slots__ = ()
+
     def __init__(self, device_id, device_name, device_status, room_id, database):
         super().__init__(
             device_id=device_id,
@@ -138,10 +169,10 @@ class Heater(Device):
         """
         if current_temperature <= 8:
             if not self.device_status:
-                print(f"{self.device_name}: {current_temperature}°C → Heater ON")
+                log.debug("%s: %s°C → Heater ON", self.device_name, current_temperature, extra={"device_id": self.device_id})
                 self.turn_on()
 
         elif current_temperature >= 20:
             if self.device_status:
-                print(f"{self.device_name}: {current_temperature}°C → Heater OFF")
+                log.debug("%s: %s°C → Heater OFF", self.device_name, current_temperature, extra={"device_id": self.device_id})
                 self.turn_off()
\ No newline at end of file
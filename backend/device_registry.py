@@ -0,0 +1,102 @@
+# device_registry.py
+# In-Memory-Register der Geräte für den SmartHomeHub.
+# Lookup per device_id ist ein dict-Zugriff (O(1)), zusätzlich gibt es
+# Indizes nach device_type und room_id, damit z.B. der stündliche Regel-Durchlauf
+# nur die Heater bzw. Lampen anfasst statt jedes Mal alle Geräte zu filtern.
+# Alle drei Indizes werden in add/remove/clear gemeinsam gepflegt.
+
+_EMPTY = {}
+
+
+class DeviceRegistry:
+    def __init__(self, devices=()):
+        self._by_id = {}        # device_id -> device
+        self._by_type = {}      # device_type -> {device_id: device}
+        self._by_room = {}      # room_id -> {device_id: device}
+        for device in devices:
+            self.add(device)
+
+    def add(self, device):
+        # ersetzt ein vorhandenes Gerät mit gleicher ID (inkl. Indizes)
+        if device.device_id in self._by_id:
+            self.remove(device.device_id)
+        self._by_id[device.device_id] = device
+        self._by_type.setdefault(device.device_type, {})[device.device_id] = device
+        self._by_room.setdefault(device.room_id, {})[device.device_id] = device
+
+    def remove(self, device_id):
+        device = self._by_id.pop(device_id, None)
+        if device is None:
+            return None
+        self._discard(self._by_type, device.device_type, device_id)
+        self._discard(self._by_room, device.room_id, device_id)
+        return device
+
+    @staticmethod
+    def _discard(index, key, device_id):
+        bucket = index.get(key)
+        if bucket is not None:
+            bucket.pop(device_id, None)
+            if not bucket:
+                del index[key]
+
+    def clear(self):
+        self._by_id.clear()
+        self._by_type.clear()
+        self._by_room.clear()
+
+    def get(self, device_id):
+        return self._by_id.get(device_id)
+
+    def by_type(self, device_type):
+        # Live-View auf den Index – nicht während der Iteration add/remove aufrufen
+        return self._by_type.get(device_type, _EMPTY).values()
+
+    def by_room(self, room_id):
+        return self._by_room.get(room_id, _EMPTY).values()
+
+    def types(self):
+        return list(self._by_type)
+
+    def __iter__(self):
+        return iter(list(self._by_id.values()))
+
+    def __len__(self):
+        return len(self._by_id)
+
+    def __contains__(self, device_id):
+        return device_id in self._by_id
+
+
+if __name__ == "__main__":
+    # Vergleich mit der alten Liste: Lookup + Filter nach Typ bei vielen Geräten
+    import time
+    from device import Device
+
+    n = 50_000
+    types = ["Lamp", "Heater", "alarm_clock", "Sensor"]
+    devices = [Device(i, f"dev{i}", types[i % len(types)], 0, i % 200, None) for i in range(1, n + 1)]
+    registry = DeviceRegistry(devices)
+
+    start = time.perf_counter()
+    for device_id in range(1, n + 1, 50):
+        next((d for d in devices if d.device_id == device_id), None)
+    list_lookup = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for device_id in range(1, n + 1, 50):
+        registry.get(device_id)
+    registry_lookup = time.perf_counter() - start
+
+    start = time.perf_counter()
+    heaters = [d for d in devices if d.device_type == "Heater"]
+    list_filter = time.perf_counter() - start
+
+    start = time.perf_counter()
+    indexed = list(registry.by_type("Heater"))
+    registry_filter = time.perf_counter() - start
+
+    assert len(heaters) == len(indexed)
+    print(f"{n} devices, {n // 50} lookups")
+    print(f"  lookup  list: {list_lookup * 1000:9.2f} ms   registry: {registry_lookup * 1000:7.2f} ms")
+    print(f"  by type list: {list_filter * 1000:9.2f} ms   registry: {registry_filter * 1000:7.2f} ms")
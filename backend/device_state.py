@@ -0,0 +1,130 @@
+# device_state.py
+# Spaltenorientierte Zustandstabelle für viele Geräte.
+# Statt pro Gerät ein dict {device_id: status} zu bauen, liegen die Zustände
+# in parallelen Arrays (ids, Status-Bytes, Helligkeit-Bytes); Zeile i gehört
+# immer zum selben Gerät. Ein Snapshot einer simulierten Stunde ist damit
+# eine einzige Kopie des Status-Arrays (bytes, 1 Byte pro Gerät).
+#
+#     python device_state.py [anzahl]   Speicher-Benchmark dict vs. __slots__ vs. Arrays
+
+from array import array
+
+
+class DeviceStateTable:
+    def __init__(self):
+        self.ids = array("q")           # device_id pro Zeile
+        self.status = bytearray()       # 0/1 pro Zeile
+        self.brightness = bytearray()   # 0–100 pro Zeile (0 bei Nicht-Lampen)
+        self.rows = {}                  # device_id -> Zeile
+
+    @classmethod
+    def from_devices(cls, devices):
+        table = cls()
+        for device in devices:
+            table.add(device.device_id, device.device_status, getattr(device, "brightness", 0) or 0)
+        return table
+
+    def add(self, device_id, status=False, brightness=0):
+        row = self.rows.get(device_id)
+        if row is None:
+            row = len(self.ids)
+            self.rows[device_id] = row
+            self.ids.append(device_id)
+            self.status.append(0)
+            self.brightness.append(0)
+        self.status[row] = 1 if status else 0
+        self.brightness[row] = max(0, min(100, int(brightness)))
+        return row
+
+    def remove(self, device_id) -> bool:
+        """
+        Entfernt die Zeile eines Geräts: die letzte Zeile rückt an ihre Stelle
+        (O(1)). Ältere Snapshots passen danach nicht mehr zu row().
+        """
+        row = self.rows.pop(device_id, None)
+        if row is None:
+            return False
+        last = len(self.ids) - 1
+        if row != last:
+            moved = self.ids[last]
+            self.ids[row] = moved
+            self.status[row] = self.status[last]
+            self.brightness[row] = self.brightness[last]
+            self.rows[moved] = row
+        self.ids.pop()
+        self.status.pop()
+        self.brightness.pop()
+        return True
+
+    def row(self, device_id):
+        return self.rows.get(device_id)
+
+    def set_status(self, device_id, status):
+        row = self.rows.get(device_id)
+        if row is not None:
+            self.status[row] = 1 if status else 0
+
+    def set_brightness(self, device_id, level):
+        row = self.rows.get(device_id)
+        if row is not None:
+            self.brightness[row] = max(0, min(100, int(level)))
+
+    def snapshot(self) -> bytes:
+        # unveränderliche Kopie aller Status-Bits, Index = Zeile
+        return bytes(self.status)
+
+    def count_on(self) -> int:
+        return self.status.count(1)
+
+    def __len__(self):
+        return len(self.ids)
+
+
+if __name__ == "__main__":
+    import sys
+    import tracemalloc
+    from device import Device
+
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    hours = 24
+
+    class DictDevice:
+        # altes Layout: normales Objekt mit __dict__ und brightness-Attribut
+        def __init__(self, device_id, device_name, device_type, device_status, room_id, database):
+            self.device_id = device_id
+            self.device_name = device_name
+            self.device_type = device_type
+            self.device_status = bool(device_status)
+            self.room_id = room_id
+            self.database = database
+            self.brightness = None
+
+    def measure(build):
+        tracemalloc.start()
+        result = build()
+        size = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        return result, size
+
+    def mb(size):
+        return f"{size / 1024 / 1024:8.1f} MB"
+
+    names = [f"device-{i}" for i in range(n)]    # Namen zählen bei beiden nicht mit
+
+    dict_devices, dict_size = measure(
+        lambda: [DictDevice(i, names[i], "Lamp", i % 2, i % 500, None) for i in range(n)])
+    slot_devices, slot_size = measure(
+        lambda: [Device(i, names[i], "Lamp", i % 2, i % 500, None) for i in range(n)])
+    table, table_size = measure(lambda: DeviceStateTable.from_devices(slot_devices))
+
+    _, dict_snap_size = measure(
+        lambda: {h: {d.device_id: int(d.device_status) for d in dict_devices} for h in range(hours)})
+    _, table_snap_size = measure(lambda: {h: table.snapshot() for h in range(hours)})
+
+    print(f"{n} devices")
+    print(f"  objects with __dict__   : {mb(dict_size)}")
+    print(f"  objects with __slots__  : {mb(slot_size)}")
+    print(f"  DeviceStateTable        : {mb(table_size)}")
+    print(f"{hours} hourly snapshots")
+    print(f"  dict of dicts           : {mb(dict_snap_size)}")
+    print(f"  bytes per hour          : {mb(table_snap_size)}")
@@ -1,12 +1,23 @@
 """
 Day Emulator für das Smart Home System
 Simuliert einen 24-Stunden-Tag mit Temperaturveränderungen.
+
+    python emulator.py              Standalone-Test (ein Tag)
+    python emulator.py --profiles   Benchmark skalar vs. generate_profiles (NumPy)
 """
 
+import logging
 import time
 import random
 import sqlite3
-from datetime import datetime
+from datetime import date, datetime, timedelta
+
+import numpy as np
+
+from rule_index import get_rule_index
+from hub_logging import get_logger, setup_logging
+
+log = get_logger("emulator")
 
 
 # Temperaturprofil für einen typischen Tag (Stunde -> Basistemperatur in °C)
@@ -67,6 +78,10 @@ BRIGHTNESS_PROFILE = {
 }
 
 
+# speed=FAST_FORWARD: virtuelle Uhr ohne sleep, ein Tag dauert nur die Rechenzeit
+FAST_FORWARD = 0
+
+
 def get_temperature_at_hour(hour: int) -> float:
     """
     Gibt die simulierte Temperatur für eine bestimmte Stunde zurück.
@@ -85,6 +100,10 @@ def get_brightness_at_hour(hour: int) -> int:
     return BRIGHTNESS_PROFILE.get(hour % 24, 0)
 
 
+def _timestamp(day: date, hour: int) -> str:
+    return f"{day.isoformat()} {hour:02d}:00:00"
+
+
        # Beschreibung der Tageszeit 
 def get_time_of_day(hour: int) -> str:
     
@@ -102,6 +121,58 @@ def get_time_of_day(hour: int) -> str:
         return "Night"
 
 
+# Profile als Arrays (Index = Stunde) für die vektorisierte Erzeugung
+TEMP_ARRAY = np.array([TEMP_PROFILE[h] for h in range(24)], dtype=np.float32)
+BRIGHTNESS_ARRAY = np.array([BRIGHTNESS_PROFILE[h] for h in range(24)], dtype=np.uint8)
+
+
+def generate_profiles(days: int, homes: int = 1, seed=None):
+    """
+    Erzeugt Temperatur- und Helligkeitsverläufe für days Tage × homes Häuser
+    in einem Aufruf, gleiche Verteilung wie get_temperature_at_hour (±0.5°C).
+
+    Gibt (temperature, brightness) mit Shape (homes, days, 24) zurück:
+    temperature als float32 (auf 0.1 gerundet), brightness als uint8.
+    brightness ist eine read-only Broadcast-View auf BRIGHTNESS_PROFILE und
+    belegt deshalb keinen zusätzlichen Speicher.
+    Mit seed ist das Ergebnis reproduzierbar.
+    """
+    rng = np.random.default_rng(seed)
+    shape = (homes, days, 24)
+    variation = rng.uniform(-0.5, 0.5, size=shape).astype(np.float32)
+    temperature = np.round(TEMP_ARRAY + variation, 1)
+    brightness = np.broadcast_to(BRIGHTNESS_ARRAY, shape)
+    return temperature, brightness
+
+
+def summarize_profiles(temperature, brightness) -> dict:
+    """
+    Kennzahlen über Temperatur-/Helligkeits-Arrays (letzte Achse = Stunden).
+
+    Gesamt: temp_min/temp_max (+ flacher Index der Stunde), temp_mean,
+    lit_hours, avg_brightness (nur Stunden mit Licht, sonst None).
+    Pro Tag (Shape ohne letzte Achse): daily_min, daily_max, daily_mean,
+    daily_lit_hours.
+    """
+    temperature = np.asarray(temperature)
+    brightness = np.asarray(brightness)
+    lit = brightness > 0
+    lit_hours = int(np.count_nonzero(lit))
+    return {
+        "temp_min": round(float(temperature.min()), 1),
+        "temp_min_index": int(temperature.argmin()),
+        "temp_max": round(float(temperature.max()), 1),
+        "temp_max_index": int(temperature.argmax()),
+        "temp_mean": round(float(temperature.mean(dtype=np.float64)), 1),
+        "lit_hours": lit_hours,
+        "avg_brightness": round(float(brightness[lit].mean()), 1) if lit_hours else None,
+        "daily_min": temperature.min(axis=-1),
+        "daily_max": temperature.max(axis=-1),
+        "daily_mean": temperature.mean(axis=-1),
+        "daily_lit_hours": lit.sum(axis=-1),
+    }
+
+
 class DayEmulator:
     """
     Simuliert einen 24-Stunden-Tag für das Smart Home System.
@@ -110,16 +181,20 @@ class DayEmulator:
     ----------
     database    : Database-Objekt aus main.py
     speed       : Sekunden pro simulierter Stunde (Standard: 1 Sekunde) Kann beliebig umgestellt werden
+                  FAST_FORWARD (0) = virtuelle Uhr, kein Warten
     start_hour  : Startstunde des Tages (0–23, Standard: 0)
+    start_date  : simuliertes Datum (Standard: heute), landet im Timestamp jedes Log-Eintrags
     """
 
-    def __init__(self, database, speed: float = 1.0, start_hour: int = 0):
+    def __init__(self, database, speed: float = 1.0, start_hour: int = 0, start_date: date = None):
         self.database = database
         self.speed = speed          
+        self.current_date = start_date or date.today()
         self.current_hour = start_hour % 24
         self.current_temp = get_temperature_at_hour(self.current_hour)
         self.current_brightness = get_brightness_at_hour(self.current_hour)
         self.running = False
+        self.stopped = False        # True, wenn der letzte Tag per stop() abgebrochen wurde
         self._log: list[dict] = []  # internes Protokoll aller Stunden
 
   
@@ -136,6 +211,10 @@ class DayEmulator:
         # Gibt den aktuellen Helligkeitswert (0–100 %) zurück.
         return self.current_brightness
 
+    def get_current_timestamp(self) -> str:
+        # Simulierte Uhrzeit als "YYYY-MM-DD HH:00:00"
+        return _timestamp(self.current_date, self.current_hour)
+
     def get_log(self) -> list[dict]:
         # Gibt das vollständige Tagesprotokoll zurück.
         return self._log
@@ -152,13 +231,14 @@ class DayEmulator:
             Note: brightness (int, 0–100) is passed as a keyword argument.
         """
         self.running = True
-        print("=" * 50)
-        print("Smart Home – Day Simulation started")
-        print("=" * 50)
+        self.stopped = False
+        first = len(self._log)      # Einträge dieses Tages: self._log[first:]
+        log.info("Day Simulation started (%s)", self.current_date.isoformat())
 
         for hour in range(self.current_hour, 24):
             if not self.running:
-                print("Simulation stopped.")
+                log.info("Simulation stopped.")
+                self.stopped = True
                 break
 
             self.current_hour = hour
@@ -167,32 +247,64 @@ class DayEmulator:
             tod = get_time_of_day(hour)
 
             entry = {
+                "date": self.current_date.isoformat(),
                 "hour": hour,
+                "timestamp": self.get_current_timestamp(),
                 "temperature": self.current_temp,
                 "time_of_day": tod,
                 "brightness": self.current_brightness,
             }
             self._log.append(entry)
 
-            brightness_str = f"{self.current_brightness}%" if self.current_brightness > 0 else "OFF"
-            print(
-                f"\n[{hour:02d}:00 ]  {tod}  –  "
-                f"Temperature: {self.current_temp}°C  |  "
-                f"Lamp Brightness: {brightness_str}"
+            log.debug(
+                "[%02d:00]  %s  –  Temperature: %s°C  |  Lamp Brightness: %s",
+                hour, tod, self.current_temp,
+                f"{self.current_brightness}%" if self.current_brightness > 0 else "OFF"
             )
 
             # Optionaler Callback aus der Main-Datei
             if callable(on_hour_callback):
                 on_hour_callback(hour, self.current_temp, tod, brightness=self.current_brightness)
 
-            # Warte 'speed' Sekunden bevor die nächste Stunde kommt
-            time.sleep(self.speed)
+            # Warte 'speed' Sekunden bevor die nächste Stunde kommt (FAST_FORWARD: gar nicht)
+            if self.speed > 0:
+                time.sleep(self.speed)
 
         self.running = False
-        print("\n" + "=" * 50)
-        print("Day Simulation ended!")
-        print("=" * 50)
-        self._print_summary()
+        log.info("Day Simulation ended (%s)", self.current_date.isoformat())
+        self._print_summary(self._log[first:])
+
+    def simulate_days(self, days: int, start_date: date = None, on_hour_callback=None, on_day_end=None,
+                      keep_log: bool = False):
+        """
+        Simuliert mehrere Tage hintereinander, jeder mit eigenem Datum.
+
+        Parameters
+        ----------
+        days             : Anzahl Tage
+        start_date       : Datum des ersten Tages (Standard: current_date)
+        on_hour_callback : wie bei simulate_day
+        on_day_end       : callable(day, entries) | None
+            Wird nach jedem Tag mit dem Datum und den Log-Einträgen dieses
+            Tages aufgerufen, z.B. um die Events des Tages zu schreiben.
+        keep_log         : Einträge aller Tage in get_log() behalten. Standard:
+            nach on_day_end verwerfen, damit lange Läufe nicht mitwachsen.
+        """
+        day = start_date or self.current_date
+        start_hour = self.current_hour
+        for _ in range(days):
+            self.current_date = day
+            self.current_hour = start_hour
+            first = len(self._log)
+            self.simulate_day(on_hour_callback=on_hour_callback)
+            if callable(on_day_end):
+                on_day_end(day, self._log[first:])
+            if not keep_log:
+                del self._log[first:]
+            if self.stopped:            # stop() während des Tages
+                break
+            day += timedelta(days=1)
+            start_hour = 0
 
     def stop(self):
         # Stoppt die laufende Simulation vorzeitig.
@@ -207,7 +319,9 @@ class DayEmulator:
         self.current_brightness = get_brightness_at_hour(self.current_hour)
         tod = get_time_of_day(self.current_hour)
         entry = {
+            "date": self.current_date.isoformat(),
             "hour": self.current_hour,
+            "timestamp": self.get_current_timestamp(),
             "temperature": self.current_temp,
             "time_of_day": tod,
             "brightness": self.current_brightness,
@@ -215,25 +329,53 @@ class DayEmulator:
         self._log.append(entry)
         return entry
 
+    def step(self, on_hour_callback=None) -> dict:
+        """
+        Eine Stunde für den Dauerbetrieb (SimulationScheduler): simuliert
+        current_date/current_hour, ruft den Callback auf und stellt die Uhr
+        eine Stunde weiter (nach 23:00 auf den nächsten Tag). Schreibt nicht
+        ins Tagesprotokoll, damit es im Dauerbetrieb nicht endlos wächst.
+        """
+        hour = self.current_hour
+        self.current_temp = get_temperature_at_hour(hour)
+        self.current_brightness = get_brightness_at_hour(hour)
+        tod = get_time_of_day(hour)
+        entry = {
+            "date": self.current_date.isoformat(),
+            "hour": hour,
+            "timestamp": self.get_current_timestamp(),
+            "temperature": self.current_temp,
+            "time_of_day": tod,
+            "brightness": self.current_brightness,
+        }
+        if callable(on_hour_callback):
+            on_hour_callback(hour, self.current_temp, tod, brightness=self.current_brightness)
+
+        if hour == 23:
+            self.current_date += timedelta(days=1)
+        self.current_hour = (hour + 1) % 24
+        return entry
+
    
     # Private helpers
    
 
-    def _print_summary(self):
-        if not self._log:
+    def _print_summary(self, entries):
+        # entries: Log-Einträge des gerade simulierten Tages
+        if not entries or not log.isEnabledFor(logging.INFO):
             return
-        temps = [e["temperature"] for e in self._log]
-        print(f"\n Daily review:")
-        print(f"  Max. Temerature : {max(temps)}°C  (ca. {self._log[temps.index(max(temps))]['hour']:02d}:00)")
-        print(f"  Min. Temperature : {min(temps)}°C  (ca. {self._log[temps.index(min(temps))]['hour']:02d}:00)")
-        print(f"  Average Temperature : {round(sum(temps)/len(temps), 1)}°C")
-        lit_hours = [e for e in self._log if e["brightness"] > 0]
-        print(f"  Hours with lamps on : {len(lit_hours)} h")
-        if lit_hours:
-            avg_brightness = round(sum(e["brightness"] for e in lit_hours) / len(lit_hours), 1)
-            print(f"  Average Lamp Brightness (when on) : {avg_brightness}%\n")
-        else:
-            print()
+        summary = summarize_profiles(
+            [e["temperature"] for e in entries],
+            [e["brightness"] for e in entries],
+        )
+        log.info(
+            "Daily review: max %s°C (ca. %02d:00), min %s°C (ca. %02d:00), avg %s°C, "
+            "lamps on %s h, avg brightness (when on) %s%%",
+            summary["temp_max"], entries[summary["temp_max_index"]]["hour"],
+            summary["temp_min"], entries[summary["temp_min_index"]]["hour"],
+            summary["temp_mean"], summary["lit_hours"],
+            summary["avg_brightness"] if summary["avg_brightness"] is not None else "–",
+        )
 
 
 
@@ -242,57 +384,33 @@ class DayEmulator:
 
 def default_device_callback(hub):
     """
-    Liest Thresholds aus der rules-Tabelle.
-    Temperatur steuert nur Heater, Brightness nur die Lampen.
+    Schaltet Geräte nach den Thresholds aus der rules-Tabelle (Regel des
+    Geräts, sonst die letzte Regel seines Typs). Temperatur steuert nur
+    Heater, Brightness nur die Lampen. Die Regeln kommen kompiliert aus
+    rule_index.py (kein DB-Zugriff pro Stunde); hub.devices muss ein
+    DeviceRegistry sein (by_type).
     """
 
-    def load_rules() -> dict:
-        conn = hub.database.connect()
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM rules")
-        rows = cursor.fetchall()
-        conn.close()
-        return {row["device_type"]: row for row in rows}
-
-    def handle_temperature(devices, temperature, rules):
-        rule = rules.get("Heater")
-        temp_high = rule["temp_treshold_high"] if rule else 22.0
-        temp_low  = rule["temp_treshold_low"]  if rule else 16.0
-        
-        for device in devices:
-            if device.device_type != "Heater":
-                continue
-            if temperature >= temp_high:
-                device.turn_off()
-                print(f"  [TEMP] {device.device_name} OFF  (>{temp_high}°C)")
-            elif temperature <= temp_low:
-                device.turn_on()
-                print(f"  [TEMP] {device.device_name} ON   (<{temp_low}°C)")
-            else:
-                print(f"  [TEMP] {device.device_name} unchanged  ({temperature}°C)")
-
-    def handle_brightness(devices, brightness, rules):
-        rule = rules.get("Lamp")
-        brightness_threshold = rule["brightness_treshold_high"] if rule else 10
-            
-
-        for device in devices:
-            if device.device_type != "Lamp":
-                continue
-            if brightness >= brightness_threshold:
+    def callback(hour, temperature, time_of_day, brightness=0):
+        rules = get_rule_index(hub.database)
+        log.debug("Stunde %02d:00 – %s°C | Brightness: %s%%", hour, temperature, brightness)
+        debug = log.isEnabledFor(logging.DEBUG)
+
+        # nur die nötigen Änderungen anwenden
+        for device, status, level in rules.evaluate(hub.devices, temperature, brightness):
+            if level is not None and hasattr(device, "set_brightness"):
+                device.set_brightness(level)
+            elif status:
                 device.turn_on()
-                if hasattr(device, "set_brightness"):
-                    device.set_brightness(brightness)
-                print(f"  [LAMP] {device.device_name} ON  @ {brightness}%")
             else:
                 device.turn_off()
-                print(f"  [LAMP] {device.device_name} OFF  (unter Threshold {brightness_threshold}%)")
 
-    def callback(hour, temperature, time_of_day, brightness=0):
-        rules = load_rules()
-        print(f"\n  Stunde {hour:02d}:00 – {temperature}°C | Brightness: {brightness}%")
-        handle_temperature(hub.devices, temperature, rules)
-        handle_brightness(hub.devices, brightness, rules)
+            if debug:   # Felder nur bauen, wenn DEBUG für hub.emulator an ist
+                fields = {"device_id": device.device_id, "room_id": device.room_id}
+                if device.device_type == "Heater":
+                    log.debug("[TEMP] %s %s  (%s°C)", device.device_name, "ON " if status else "OFF", temperature, extra=fields)
+                else:
+                    log.debug("[LAMP] %s %s", device.device_name, f"ON  @ {level}%" if status else "OFF", extra=fields)
 
     return callback
 
@@ -301,7 +419,33 @@ def default_device_callback(hub):
 # Standalone-Test für  Emulator ohne Main.py und Datenbank. über emulator.py aufrufbar
 
 
+def _benchmark_profiles(days=365, homes=100, seed=42):
+    # skalarer Weg (Stunde für Stunde) gegen generate_profiles
+    start = time.perf_counter()
+    for _ in range(homes * days):
+        temps = [get_temperature_at_hour(h) for h in range(24)]
+        brightness = [get_brightness_at_hour(h) for h in range(24)]
+    scalar = time.perf_counter() - start
+
+    start = time.perf_counter()
+    temperature, brightness = generate_profiles(days, homes, seed=seed)
+    summary = summarize_profiles(temperature, brightness)
+    vectorized = time.perf_counter() - start
+
+    print(f"{days} days x {homes} homes = {temperature.size} hours")
+    print(f"  scalar     : {scalar:7.3f} s")
+    print(f"  vectorized : {vectorized:7.3f} s  (incl. summary, {temperature.nbytes / 1024 / 1024:.1f} MB)")
+    print(f"  min {summary['temp_min']}°C  max {summary['temp_max']}°C  mean {summary['temp_mean']}°C  "
+          f"lit hours {summary['lit_hours']}  avg brightness {summary['avg_brightness']}%")
+
+
 if __name__ == "__main__":
+    import sys
+    if "--profiles" in sys.argv:
+        _benchmark_profiles()
+        sys.exit(0)
+
+    setup_logging("DEBUG")
     print("Standalone-Test of simulator (No databank necessary)\n")
     emulator = DayEmulator(database=None, speed=0.2, start_hour=0)
 
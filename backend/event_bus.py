@@ -0,0 +1,101 @@
+# event_bus.py
+# In-Process Pub/Sub für Live-Updates (SSE unter /status/stream).
+# Device.turn_on/turn_off, toggle_device_status und der EventWriter rufen
+# publish() auf – aus dem Simulations-Thread genauso wie aus dem Event-Loop.
+# Jeder Abonnent hat eine eigene, begrenzte asyncio.Queue in seinem Loop.
+# Ist sie voll (Client liest zu langsam), wird das älteste Event verworfen
+# und mitgezählt; der Publisher blockiert nie.
+# Ohne Abonnenten kostet publish() nur einen Längen-Check.
+
+import asyncio
+import threading
+
+QUEUE_SIZE = 256        # Events pro Client, danach wird das älteste verworfen
+
+
+class Subscription:
+    def __init__(self, bus, loop, device_ids=None, room_ids=None, maxsize=QUEUE_SIZE):
+        self.bus = bus
+        self.loop = loop
+        self.device_ids = device_ids    # None = kein Filter
+        self.room_ids = room_ids
+        self.queue = asyncio.Queue(maxsize)
+        self.dropped = 0                # verworfene Events seit dem letzten get()
+
+    def wants(self, event) -> bool:
+        if self.device_ids is None and self.room_ids is None:
+            return True
+        if self.device_ids is not None and event.get("device_id") in self.device_ids:
+            return True
+        return self.room_ids is not None and event.get("room_id") in self.room_ids
+
+    def _offer(self, events):
+        # läuft im Loop des Abonnenten
+        for event in events:
+            if self.queue.full():
+                self.queue.get_nowait()
+                self.dropped += 1
+            self.queue.put_nowait(event)
+
+    async def get(self, timeout=None):
+        """
+        Wartet auf das nächste Event und gibt alles zurück, was schon in der
+        Queue liegt (mindestens eins), bei Timeout eine leere Liste.
+        """
+        try:
+            events = [await asyncio.wait_for(self.queue.get(), timeout)]
+        except asyncio.TimeoutError:
+            return []
+        while not self.queue.empty():
+            events.append(self.queue.get_nowait())
+        return events
+
+    def take_dropped(self) -> int:
+        dropped, self.dropped = self.dropped, 0
+        return dropped
+
+    def close(self):
+        self.bus._remove(self)
+
+
+class EventBus:
+    def __init__(self):
+        self._subscriptions = ()    # Tupel, wird nur ersetzt: publish() liest ohne Lock
+        self._lock = threading.Lock()
+        self.published = 0
+
+    def __len__(self):
+        return len(self._subscriptions)
+
+    def subscribe(self, device_ids=None, room_ids=None, maxsize=QUEUE_SIZE) -> Subscription:
+        # muss im Event-Loop des Abonnenten aufgerufen werden
+        sub = Subscription(self, asyncio.get_running_loop(), device_ids, room_ids, maxsize)
+        with self._lock:
+            self._subscriptions = self._subscriptions + (sub,)
+        return sub
+
+    def _remove(self, sub):
+        with self._lock:
+            self._subscriptions = tuple(s for s in self._subscriptions if s is not sub)
+
+    def publish(self, event):
+        self.publish_many((event,))
+
+    def publish_many(self, events):
+        # ein Callback pro Abonnent und Aufruf, nicht pro Event
+        subscriptions = self._subscriptions
+        if not subscriptions:
+            return
+        self.published += len(events)
+        for sub in subscriptions:
+            matching = [event for event in events if sub.wants(event)]
+            if not matching:
+                continue
+            try:
+                sub.loop.call_soon_threadsafe(sub._offer, matching)
+            except RuntimeError:
+                # Loop schon geschlossen → Abonnent ist weg
+                self._remove(sub)
+
+
+bus = EventBus()
@@ -0,0 +1,150 @@
+# event_writer.py
+# Gepufferter Writer für device_event_log.
+# Statt pro Event ein eigenes INSERT + commit werden Zeilen gesammelt und
+# gebündelt mit executemany in EINER Transaktion geschrieben – sobald
+# batch_size voll ist, spätestens aber nach flush_interval (Hintergrund-Thread,
+# auch wenn keine neuen Zeilen mehr kommen).
+
+import threading
+import time
+from datetime import datetime, timezone
+from event_bus import bus
+from hub_logging import get_logger
+
+log = get_logger("event_writer")
+
+INSERT_EVENT_SQL = """
+    INSERT INTO device_event_log
+    (device_id, device_name, device_type,
+     device_status, event_timestamp,
+     temp_value, brightness_value)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+"""
+
+EVENT_FIELDS = (
+    "device_id", "device_name", "device_type", "device_status",
+    "event_timestamp", "temp_value", "brightness_value",
+)
+
+BATCH_SIZE = 1000       # so viele Zeilen sammeln, bevor geschrieben wird
+FLUSH_INTERVAL = 2.0    # spätestens nach so vielen Sekunden schreiben
+
+
+def utc_timestamp() -> str:
+    # gleiches Format wie datetime('now') in SQLite
+    return datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+
+
+class EventWriter:
+    """
+    Puffert Event-Zeilen und schreibt sie gebündelt.
+
+    Parameter
+    ----------
+    database       : Database-Objekt (Verbindung kommt aus dem Pool)
+    batch_size     : Anzahl Zeilen, ab der automatisch geschrieben wird
+    flush_interval : Sekunden seit dem letzten Schreiben, nach denen
+                     gepufferte Zeilen spätestens geschrieben werden
+    auto_flush     : False = nur flush() schreibt (kein Hintergrund-Thread),
+                     z.B. wenn ein Batch mit anderen Writes atomar sein muss
+    """
+
+    def __init__(self, database, batch_size: int = BATCH_SIZE, flush_interval: float = FLUSH_INTERVAL,
+                 auto_flush: bool = True):
+        self.database = database
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.auto_flush = auto_flush
+        self._buffer: list[tuple] = []
+        self._lock = threading.Lock()
+        self._last_flush = time.monotonic()
+        self._stop = threading.Event()
+        self._thread = None
+        self.rows_written = 0
+
+    def add(self, device_id, device_name, device_type, device_status,
+            event_timestamp=None, temp_value=None, brightness_value=None):
+        row = (
+            device_id,
+            device_name,
+            device_type,
+            int(device_status),
+            event_timestamp or utc_timestamp(),
+            temp_value,
+            brightness_value,
+        )
+        with self._lock:
+            self._buffer.append(row)
+            if not self.auto_flush:
+                return
+            if self._thread is None:
+                self._start()
+            due = (
+                len(self._buffer) >= self.batch_size
+                or time.monotonic() - self._last_flush >= self.flush_interval
+            )
+        if due:
+            self.flush()
+
+    def pending(self) -> int:
+        return len(self._buffer)
+
+    def flush(self, statements=()) -> int:
+        """
+        Schreibt alle gepufferten Zeilen. statements: weitere (sql, params),
+        die in derselben Transaktion laufen (alles oder nichts).
+        """
+        # Puffer tauschen, damit add() während des Schreibens weiterlaufen kann
+        with self._lock:
+            rows, self._buffer = self._buffer, []
+            self._last_flush = time.monotonic()
+        if not rows and not statements:
+            return 0
+
+        conn = self.database.connect()
+        try:
+            with conn:
+                conn.executemany(INSERT_EVENT_SQL, rows)
+                for sql, params in statements:
+                    conn.execute(sql, params)
+        except Exception:
+            # nichts verlieren: vor die inzwischen hinzugekommenen Zeilen zurücklegen
+            with self._lock:
+                self._buffer = rows + self._buffer
+            raise
+        finally:
+            conn.close()
+
+        self.rows_written += len(rows)
+        if len(bus):
+            # erst nach dem Commit: Abonnenten sehen nur, was auch in der DB steht
+            bus.publish_many([dict(zip(EVENT_FIELDS, row), type="event") for row in rows])
+        return len(rows)
+
+    def _start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="event-writer-flusher", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        # schreibt, was länger als flush_interval im Puffer liegt
+        while not self._stop.wait(max(0.05, self._last_flush + self.flush_interval - time.monotonic())):
+            if self._buffer and time.monotonic() - self._last_flush >= self.flush_interval:
+                try:
+                    self.flush()
+                except Exception:
+                    log.exception("Flush fehlgeschlagen")
+
+    def close(self):
+        # Flusher beenden und alles Offene schreiben
+        self._stop.set()
+        thread, self._thread = self._thread, None
+        if thread is not None:
+            thread.join()
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
@@ -0,0 +1,253 @@
+# fleet_simulation.py
+# Lasttest für Speicher + Regel-Engine: simuliert viele virtuelle Häuser parallel.
+# Die Häuser werden in Shards aufgeteilt, jeder Shard läuft in einem eigenen
+# Prozess gegen eine eigene SQLite-Datei (kein Lock-Konflikt zwischen Workern,
+# Events gehen wie im Hub gebündelt über den EventWriter). Danach werden alle
+# Shards in eine Ziel-DB zusammengeführt (IDs werden dabei verschoben).
+#
+#     python fleet_simulation.py --homes 200 --devices 10 --days 7 --workers 4
+#     python fleet_simulation.py --out fleet.db --keep-shards
+
+import argparse
+import glob
+import os
+import random
+import sqlite3
+import time
+from datetime import date, timedelta
+from multiprocessing import Pool
+
+from database import Database, close_all_pools
+from hub_logging import setup_logging
+from migrations import run_migrations
+from state_store import close_all_state_stores
+
+DEVICE_TYPES = ["Lamp", "Heater"]
+
+
+def _shard_path(shard_dir, shard):
+    return os.path.join(shard_dir, f"shard_{shard:03d}.db")
+
+
+def _seed_homes(database, home_ids, devices_per_home, seed):
+    """
+    Legt pro Haus einen Raum, devices_per_home Geräte (abwechselnd Lamp/Heater)
+    und pro Gerät eine Regel mit hausspezifischen Schwellwerten an.
+    """
+    conn = database.connect()
+    try:
+        with conn:
+            for home in home_ids:
+                rng = random.Random(seed * 1_000_003 + home)
+                temp_low = rng.randint(14, 18)
+                temp_high = temp_low + rng.randint(3, 7)
+                brightness_high = rng.choice([10, 20, 30, 50])
+
+                room_name = f"home-{home:05d}"
+                room_id = conn.execute(
+                    "INSERT INTO rooms (room_name) VALUES (?)", (room_name,)
+                ).lastrowid
+
+                for n in range(devices_per_home):
+                    device_type = DEVICE_TYPES[n % len(DEVICE_TYPES)]
+                    device_name = f"{room_name}-{device_type.lower()}-{n}"
+                    device_id = conn.execute("""
+                        INSERT INTO devices (device_name, device_type, device_status, room_id)
+                        VALUES (?, ?, 0, ?)
+                    """, (device_name, device_type, room_id)).lastrowid
+                    conn.execute("""
+                        INSERT INTO rules (
+                            device_id, device_name, device_type, device_status,
+                            room_id, room_name,
+                            temp_treshold_high, temp_treshold_low,
+                            brightness_treshold_high, brightness_treshold_low
+                        ) VALUES (?, ?, ?, 0, ?, ?, ?, ?, ?, 0)
+                    """, (device_id, device_name, device_type, room_id, room_name,
+                          temp_high, temp_low, brightness_high))
+    finally:
+        conn.close()
+
+
+def simulate_shard(task):
+    """
+    Worker: ein Shard = eine eigene DB mit mehreren Häusern, alle Geräte
+    laufen in einem SmartHomeHub. Gibt Kennzahlen des Shards zurück.
+    """
+    shard, home_ids, devices_per_home, days, start_date, shard_dir, seed = task
+    started = time.perf_counter()
+    # erst hier importieren: main zieht die FastAPI-App mit, das soll nur im Worker passieren
+    from main import run_simulation
+
+    path = _shard_path(shard_dir, shard)
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+
+    # Stunden- und Gerätemeldungen sind im Lasttest nur Ballast, nur Warnungen ausgeben
+    setup_logging("WARNING")
+
+    db = Database(path)
+    run_migrations(db)
+    _seed_homes(db, home_ids, devices_per_home, seed)
+    random.seed(seed + shard)
+
+    start = time.perf_counter()
+    hub = run_simulation(days=days, start_date=start_date, database=db)
+    elapsed = time.perf_counter() - start
+    setup = start - started         # Import, Migrationen, Seed – nicht Teil der Simulation
+
+    conn = db.connect()
+    events = conn.execute("SELECT COUNT(*) FROM device_event_log").fetchone()[0]
+    conn.close()
+    close_all_state_stores()
+    close_all_pools()
+
+    return {
+        "shard": shard,
+        "path": path,
+        "homes": len(home_ids),
+        "devices": len(hub.devices),
+        "device_hours": len(hub.devices) * days * 24,
+        "events": events,
+        "seconds": elapsed,
+        "setup_seconds": setup,
+    }
+
+
+def merge_shards(target_path, shard_paths):
+    """
+    Führt die Shard-DBs in target_path zusammen. rooms/devices bekommen neue
+    IDs (Offset = aktuelles Maximum im Ziel), Events und Regeln werden auf die
+    neuen IDs umgeschrieben. Gibt die Anzahl übernommener Events zurück.
+    """
+    target = Database(target_path)
+    run_migrations(target)
+
+    conn = sqlite3.connect(target_path)
+    merged = 0
+    try:
+        for path in shard_paths:
+            conn.execute("ATTACH DATABASE ? AS shard", (path,))
+            try:
+                with conn:
+                    room_off = conn.execute("SELECT COALESCE(MAX(room_id), 0) FROM rooms").fetchone()[0]
+                    dev_off = conn.execute("SELECT COALESCE(MAX(device_id), 0) FROM devices").fetchone()[0]
+
+                    conn.execute("""
+                        INSERT INTO rooms (room_id, room_name, user_id)
+                        SELECT room_id + ?, room_name, user_id FROM shard.rooms
+                    """, (room_off,))
+                    conn.execute("""
+                        INSERT INTO devices (device_id, room_id, device_name, device_type, device_status)
+                        SELECT device_id + ?, room_id + ?, device_name, device_type, device_status
+                        FROM shard.devices
+                    """, (dev_off, room_off))
+                    conn.execute("""
+                        INSERT INTO rules (
+                            device_id, device_name, device_status, device_type, room_id, room_name,
+                            temp_treshold_high, temp_treshold_low,
+                            brightness_treshold_high, brightness_treshold_low
+                        )
+                        SELECT device_id + ?, device_name, device_status, device_type, room_id + ?, room_name,
+                               temp_treshold_high, temp_treshold_low,
+                               brightness_treshold_high, brightness_treshold_low
+                        FROM shard.rules
+                    """, (dev_off, room_off))
+                    merged += conn.execute("""
+                        INSERT INTO device_event_log (
+                            device_id, device_name, device_type, device_status,
+                            event_timestamp, temp_value, brightness_value
+                        )
+                        SELECT device_id + ?, device_name, device_type, device_status,
+                               event_timestamp, temp_value, brightness_value
+                        FROM shard.device_event_log ORDER BY event_id
+                    """, (dev_off,)).rowcount
+            finally:
+                conn.execute("DETACH DATABASE shard")
+    finally:
+        conn.close()
+    return merged
+
+
+def run_fleet(homes, devices_per_home, days, workers=None, start_date=None,
+              out="fleet.db", shard_dir="fleet_shards", seed=1, keep_shards=False):
+    workers = workers or os.cpu_count() or 1
+    start_date = start_date or date.today() - timedelta(days=days - 1)
+    os.makedirs(shard_dir, exist_ok=True)
+    # Ziel-DB wird jedes Mal neu aufgebaut
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(out + suffix):
+            os.remove(out + suffix)
+
+    # Häuser gleichmäßig auf die Shards verteilen (ein Shard pro Worker)
+    shards = min(workers, homes)
+    tasks = [
+        (shard, list(range(shard, homes, shards)), devices_per_home, days, start_date, shard_dir, seed)
+        for shard in range(shards)
+    ]
+
+    start = time.perf_counter()
+    with Pool(processes=workers) as pool:
+        results = pool.map(simulate_shard, tasks)
+    wall_seconds = time.perf_counter() - start
+    # Die Shards simulieren parallel: der langsamste bestimmt die Simulationszeit.
+    # Alles andere (Prozessstart, Import von main, Migrationen, Seed) ist Startkosten.
+    simulate_seconds = max(r["seconds"] for r in results)
+
+    start = time.perf_counter()
+    merged = merge_shards(out, [r["path"] for r in results])
+    merge_seconds = time.perf_counter() - start
+
+    if not keep_shards:
+        for path in glob.glob(os.path.join(shard_dir, "shard_*.db*")):
+            os.remove(path)
+
+    device_hours = sum(r["device_hours"] for r in results)
+    return {
+        "homes": homes,
+        "devices": sum(r["devices"] for r in results),
+        "days": days,
+        "workers": workers,
+        "shards": results,
+        "device_hours": device_hours,
+        "events": merged,
+        "simulate_seconds": simulate_seconds,
+        "startup_seconds": wall_seconds - simulate_seconds,
+        "wall_seconds": wall_seconds,
+        "merge_seconds": merge_seconds,
+        "device_hours_per_second": device_hours / simulate_seconds if simulate_seconds else 0.0,
+    }
+
+
+def print_report(report):
+    print(f"{report['homes']} homes, {report['devices']} devices, {report['days']} days, "
+          f"{report['workers']} workers")
+    for shard in report["shards"]:
+        rate = shard["device_hours"] / shard["seconds"] if shard["seconds"] else 0.0
+        print(f"  shard {shard['shard']:3d}: {shard['homes']:5d} homes  "
+              f"{shard['device_hours']:9d} device-hours  {shard['seconds']:7.2f} s  {rate:10.0f}/s  "
+              f"(setup {shard['setup_seconds']:.2f} s)")
+    print(f"simulate : {report['simulate_seconds']:7.2f} s  "
+          f"{report['device_hours_per_second']:10.0f} device-hours/s (aggregate, slowest shard)")
+    print(f"startup  : {report['startup_seconds']:7.2f} s  (processes, imports, migrations, seed; "
+          f"wall {report['wall_seconds']:.2f} s)")
+    print(f"merge    : {report['merge_seconds']:7.2f} s  {report['events']} events")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Parallele Flotten-Simulation vieler Häuser")
+    parser.add_argument("--homes", type=int, default=100)
+    parser.add_argument("--devices", type=int, default=10, help="Geräte pro Haus")
+    parser.add_argument("--days", type=int, default=7)
+    parser.add_argument("--workers", type=int, default=None, help="Standard: Anzahl CPUs")
+    parser.add_argument("--out", default="fleet.db", help="Ziel-DB für die zusammengeführten Shards (wird überschrieben)")
+    parser.add_argument("--shard-dir", default="fleet_shards")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--keep-shards", action="store_true")
+    args = parser.parse_args()
+
+    setup_logging("WARNING")
+    print_report(run_fleet(
+        args.homes, args.devices, args.days, workers=args.workers,
+        out=args.out, shard_dir=args.shard_dir, seed=args.seed, keep_shards=args.keep_shards,
+    ))
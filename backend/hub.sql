@@ -1,3 +1,5 @@
+-- Gesamtschema als Referenz. Angewendet wird es beim Start über migrations.py.
+
 PRAGMA foreign_keys = ON;
 
 -- 1. Users Tabelle
@@ -73,4 +75,94 @@ CREATE TABLE IF NOT EXISTS rules (
     FOREIGN KEY (device_type) REFERENCES devices(device_type),
     FOREIGN KEY (room_id) REFERENCES rooms(room_id),
     FOREIGN KEY (room_name) REFERENCES rooms(room_name)
-    );
\ No newline at end of file
+    );
+
+-- 7. letzter Zustand pro Gerät (wird per Trigger aus device_event_log gepflegt, siehe latest_state.py)
+CREATE TABLE IF NOT EXISTS device_latest_state (
+    device_id        INTEGER PRIMARY KEY,
+    event_id         INTEGER NOT NULL,
+    device_name      TEXT    NOT NULL DEFAULT '',
+    device_type      TEXT    NOT NULL DEFAULT '',
+    device_status    BOOLEAN NOT NULL DEFAULT 0,
+    event_timestamp  TEXT    NOT NULL DEFAULT '',
+    temp_value       INTEGER,
+    brightness_value INTEGER
+);
+
+CREATE TRIGGER IF NOT EXISTS trg_device_latest_state
+AFTER INSERT ON device_event_log
+WHEN NEW.device_id IS NOT NULL
+BEGIN
+    INSERT INTO device_latest_state (
+        device_id, event_id, device_name, device_type,
+        device_status, event_timestamp, temp_value, brightness_value
+    ) VALUES (
+        NEW.device_id, NEW.event_id, NEW.device_name, NEW.device_type,
+        NEW.device_status, NEW.event_timestamp, NEW.temp_value, NEW.brightness_value
+    )
+    ON CONFLICT(device_id) DO UPDATE SET
+        event_id         = excluded.event_id,
+        device_name      = excluded.device_name,
+        device_type      = excluded.device_type,
+        device_status    = excluded.device_status,
+        event_timestamp  = excluded.event_timestamp,
+        temp_value       = excluded.temp_value,
+        brightness_value = excluded.brightness_value
+    WHERE excluded.event_id > device_latest_state.event_id;
+END;
+
+
+-- 8. Indizes (Migration 003 in migrations.py)
+CREATE INDEX IF NOT EXISTS idx_event_log_device   ON device_event_log(device_id, event_id);
+CREATE INDEX IF NOT EXISTS idx_event_log_type     ON device_event_log(device_type, event_id);
+CREATE INDEX IF NOT EXISTS idx_rules_device       ON rules(device_id);
+CREATE INDEX IF NOT EXISTS idx_rules_room         ON rules(room_id);
+CREATE INDEX IF NOT EXISTS idx_room_users_user    ON room_users(user_id);
+CREATE INDEX IF NOT EXISTS idx_rooms_user         ON rooms(user_id);
+CREATE INDEX IF NOT EXISTS idx_devices_room       ON devices(room_id);
+CREATE INDEX IF NOT EXISTS idx_users_name         ON users(user_name);
+
+-- 9. Zeitfenster beim Export (Migration 004)
+CREATE INDEX IF NOT EXISTS idx_event_log_timestamp ON device_event_log(event_timestamp);
+
+-- 10. Rollups für verdichtete Events (Migration 005, siehe rollups.py)
+CREATE TABLE IF NOT EXISTS device_event_hourly (
+    device_id        INTEGER NOT NULL,
+    hour             TEXT    NOT NULL,      -- 'YYYY-MM-DD HH:00:00'
+    device_name      TEXT    NOT NULL DEFAULT '',
+    device_type      TEXT    NOT NULL DEFAULT '',
+    events           INTEGER NOT NULL DEFAULT 0,
+    on_events        INTEGER NOT NULL DEFAULT 0,
+    temp_min         REAL,
+    temp_max         REAL,
+    temp_sum         REAL    NOT NULL DEFAULT 0,
+    temp_count       INTEGER NOT NULL DEFAULT 0,
+    brightness_sum   REAL    NOT NULL DEFAULT 0,
+    brightness_count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (device_id, hour)
+);
+
+CREATE TABLE IF NOT EXISTS device_event_daily (
+    device_id        INTEGER NOT NULL,
+    day              TEXT    NOT NULL,      -- 'YYYY-MM-DD'
+    device_name      TEXT    NOT NULL DEFAULT '',
+    device_type      TEXT    NOT NULL DEFAULT '',
+    events           INTEGER NOT NULL DEFAULT 0,
+    on_events        INTEGER NOT NULL DEFAULT 0,
+    temp_min         REAL,
+    temp_max         REAL,
+    temp_sum         REAL    NOT NULL DEFAULT 0,
+    temp_count       INTEGER NOT NULL DEFAULT 0,
+    brightness_sum   REAL    NOT NULL DEFAULT 0,
+    brightness_count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (device_id, day)
+);
+
+-- 11. Zuletzt simulierte Stunde der Dauer-Simulation (Migration 006, siehe main.py)
+CREATE TABLE IF NOT EXISTS simulation_state (
+    id             INTEGER PRIMARY KEY CHECK (id = 1),
+    last_timestamp TEXT NOT NULL            -- 'YYYY-MM-DD HH:00:00'
+);
+
+-- 12. Grenze roh/verdichtet (Migration 007, rollups.raw_events_since)
+CREATE INDEX IF NOT EXISTS idx_event_daily_day ON device_event_daily(day);
@@ -0,0 +1,106 @@
+# hub_logging.py
+# Logging für Hub und Simulation statt print().
+# - Alle Logger hängen unter "hub" (get_logger("emulator") → "hub.emulator"),
+#   Level pro Modul einstellbar.
+# - Der Aufrufer legt den Record nur in eine Queue (QueueHandler); formatiert
+#   und auf stderr geschrieben wird in einem eigenen Thread (QueueListener).
+#   Abgeschaltete Level kosten nur den isEnabledFor-Check, deshalb Meldungen
+#   mit %-Platzhaltern statt f-Strings schreiben.
+# - Strukturierte Felder über extra={"device_id": ..., "room_id": ...}; route
+#   wird innerhalb eines Requests automatisch gesetzt (TimingMiddleware).
+#
+# Konfiguration per Umgebungsvariable, überschreibt die Vorgaben im Code:
+#     HUB_LOG_LEVELS="WARNING,emulator=DEBUG,status_api=INFO"
+# (erstes Element ohne "=" = Standard-Level für alle hub.*-Logger)
+
+import atexit
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+from contextvars import ContextVar
+
+ROOT = "hub"
+DEFAULT_LEVEL = "INFO"
+LEVELS_ENV = "HUB_LOG_LEVELS"
+FIELDS = ("route", "device_id", "room_id", "rules_id", "user_id")   # Reihenfolge in der Ausgabe
+FORMAT = "%(asctime)s %(levelname)-7s %(name)s: %(message)s"
+
+request_route = ContextVar("request_route", default=None)
+
+_listener = None
+_listener_pid = None
+
+
+def get_logger(name) -> logging.Logger:
+    return logging.getLogger(f"{ROOT}.{name}")
+
+
+class _RouteFilter(logging.Filter):
+    # läuft im aufrufenden Thread, dort ist die ContextVar des Requests noch gesetzt
+    def filter(self, record):
+        if not hasattr(record, "route"):
+            route = request_route.get()
+            if route is not None:
+                record.route = route
+        return True
+
+
+class StructuredFormatter(logging.Formatter):
+    def format(self, record):
+        text = super().format(record)
+        fields = " ".join(f"{name}={getattr(record, name)}" for name in FIELDS if hasattr(record, name))
+        return f"{text}  [{fields}]" if fields else text
+
+
+def _parse_levels(text):
+    default, levels = None, {}
+    for part in filter(None, (p.strip() for p in text.split(","))):
+        if "=" in part:
+            name, level = part.split("=", 1)
+            levels[name.strip()] = level.strip().upper()
+        else:
+            default = part.upper()
+    return default, levels
+
+
+def setup_logging(level=DEFAULT_LEVEL, levels=None, stream=None):
+    """
+    level  : Standard-Level aller hub.*-Logger
+    levels : {"modul": "LEVEL"} für einzelne Module
+    stream : Ziel der Ausgabe (Standard: sys.stderr)
+    HUB_LOG_LEVELS hat Vorrang vor beidem. Mehrfach aufrufbar, es gibt nur
+    einen Listener pro Prozess (nach fork wird ein neuer gestartet).
+    """
+    global _listener, _listener_pid
+    env_default, env_levels = _parse_levels(os.environ.get(LEVELS_ENV, ""))
+
+    root = logging.getLogger(ROOT)
+    root.setLevel(env_default or level)
+    for name, module_level in {**(levels or {}), **env_levels}.items():
+        get_logger(name).setLevel(module_level)
+
+    if _listener is not None and _listener_pid == os.getpid():
+        return
+
+    records = queue.SimpleQueue()
+    handler = logging.StreamHandler(stream or sys.stderr)
+    handler.setFormatter(StructuredFormatter(FORMAT))
+    queue_handler = logging.handlers.QueueHandler(records)
+    queue_handler.addFilter(_RouteFilter())
+
+    root.handlers = [queue_handler]     # Handler eines geforkten Elternprozesses ersetzen
+    root.propagate = False
+    _listener = logging.handlers.QueueListener(records, handler)
+    _listener.start()
+    _listener_pid = os.getpid()
+    atexit.register(stop_logging)
+
+
+def stop_logging():
+    # schreibt alles aus der Queue und beendet den Listener-Thread
+    global _listener
+    if _listener is not None and _listener_pid == os.getpid():
+        _listener.stop()
+    _listener = None
@@ -0,0 +1,85 @@
+# latest_state.py
+# Materialisierter "aktueller Zustand" pro Gerät.
+# device_latest_state enthält immer das letzte Event jeder device_id und wird
+# per Trigger bei jedem INSERT in device_event_log mitgeführt – egal ob das
+# Event vom EventWriter, Device.save_to_db oder sonst woher kommt.
+#
+# Angelegt wird alles über migrations.py (Migration 002).
+# Bestehende Datenbanken neu aufbauen:
+#     python latest_state.py            (nutzt hub.db)
+#     python latest_state.py pfad/zur.db
+
+import sys
+from database import Database
+
+LATEST_STATE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS device_latest_state (
+    device_id        INTEGER PRIMARY KEY,
+    event_id         INTEGER NOT NULL,
+    device_name      TEXT    NOT NULL DEFAULT '',
+    device_type      TEXT    NOT NULL DEFAULT '',
+    device_status    BOOLEAN NOT NULL DEFAULT 0,
+    event_timestamp  TEXT    NOT NULL DEFAULT '',
+    temp_value       INTEGER,
+    brightness_value INTEGER
+);
+
+CREATE TRIGGER IF NOT EXISTS trg_device_latest_state
+AFTER INSERT ON device_event_log
+WHEN NEW.device_id IS NOT NULL
+BEGIN
+    INSERT INTO device_latest_state (
+        device_id, event_id, device_name, device_type,
+        device_status, event_timestamp, temp_value, brightness_value
+    ) VALUES (
+        NEW.device_id, NEW.event_id, NEW.device_name, NEW.device_type,
+        NEW.device_status, NEW.event_timestamp, NEW.temp_value, NEW.brightness_value
+    )
+    ON CONFLICT(device_id) DO UPDATE SET
+        event_id         = excluded.event_id,
+        device_name      = excluded.device_name,
+        device_type      = excluded.device_type,
+        device_status    = excluded.device_status,
+        event_timestamp  = excluded.event_timestamp,
+        temp_value       = excluded.temp_value,
+        brightness_value = excluded.brightness_value
+    WHERE excluded.event_id > device_latest_state.event_id;
+END;
+"""
+
+REBUILD_SQL = """
+INSERT INTO device_latest_state (
+    device_id, event_id, device_name, device_type,
+    device_status, event_timestamp, temp_value, brightness_value
+)
+SELECT l.device_id, l.event_id, l.device_name, l.device_type,
+       l.device_status, l.event_timestamp, l.temp_value, l.brightness_value
+FROM device_event_log l
+JOIN (
+    SELECT device_id, MAX(event_id) AS event_id
+    FROM device_event_log
+    WHERE device_id IS NOT NULL
+    GROUP BY device_id
+) m ON l.event_id = m.event_id
+"""
+
+
+def rebuild_latest_state(database) -> int:
+    # komplette Neuberechnung aus device_event_log, gibt Anzahl Geräte zurück
+    conn = database.connect()
+    try:
+        with conn:
+            conn.execute("DELETE FROM device_latest_state")
+            conn.execute(REBUILD_SQL)
+        return conn.execute("SELECT COUNT(*) FROM device_latest_state").fetchone()[0]
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    db = Database(sys.argv[1] if len(sys.argv) > 1 else "hub.db")
+    conn = db.connect()
+    conn.executescript(LATEST_STATE_SCHEMA)
+    conn.close()
+    count = rebuild_latest_state(db)
+    print(f"device_latest_state rebuilt: {count} devices")
@@ -0,0 +1,119 @@
+"""
+Einfacher Lasttest gegen einen laufenden Hub (nur Standardbibliothek).
+
+Startet N parallele Clients, die reihum die Status-Seiten abrufen, und gibt
+die Latenz-Perzentile aus. Damit lässt sich vergleichen, ob sich parallele
+Requests überlappen oder vom Event Loop serialisiert werden.
+
+Die Historie blättert per Keyset-Cursor (lamp_before, heater_before, ...).
+Für "Seite N" folgt der Test vor dem Start den "Older"-Links der Seite, die
+Cursor-Werte hängen ja von der Datenbank ab.
+
+Aufruf (Server vorher mit `uvicorn main:app` starten):
+    python load_test.py --url http://127.0.0.1:8000 --clients 50 --requests 20
+"""
+
+import argparse
+import html
+import re
+import threading
+import time
+import urllib.error
+import urllib.request
+
+HISTORY_PATH = "/status/events/history"
+DEEP_PAGE = 5           # Seite, die zusätzlich abgerufen wird (über "older"-Links)
+
+DEFAULT_PATHS = [
+    "/status/events/all_devices",
+    HISTORY_PATH,
+    HISTORY_PATH + "?lamp_after=0&heater_after=0",     # älteste Seite
+]
+
+# ein Treffer pro Pager; leer, wenn "Older" deaktiviert ist
+_OLDER_LINK = re.compile(r'(?:href="([^"]*)"|class="disabled")>Older')
+
+
+def older_page(base_url, path, tables=2, pages=DEEP_PAGE):
+    """
+    Folgt in jeder der tables Tabellen der Seite (Pager in Reihenfolge der
+    Seite) pages-1 Mal dem "Older"-Link und gibt den Pfad der erreichten
+    Seite zurück (None, wenn es so viele Seiten nicht gibt).
+    """
+    for table in range(tables):
+        for _ in range(pages - 1):
+            with urllib.request.urlopen(base_url + path, timeout=60) as response:
+                links = _OLDER_LINK.findall(response.read().decode())
+            if len(links) <= table or not links[table]:
+                return None
+            path = path.split("?")[0] + html.unescape(links[table])
+    return path
+
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    index = min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))
+    return values[index]
+
+
+def run_client(base_url, paths, count, latencies, errors, lock):
+    for i in range(count):
+        url = base_url + paths[i % len(paths)]
+        start = time.perf_counter()
+        try:
+            with urllib.request.urlopen(url, timeout=60) as response:
+                response.read()
+        except (urllib.error.URLError, OSError):
+            with lock:
+                errors.append(url)
+            continue
+        elapsed = time.perf_counter() - start
+        with lock:
+            latencies.append(elapsed)
+
+
+def run_load_test(base_url, clients=50, requests_per_client=20, paths=None):
+    if not paths:
+        paths = list(DEFAULT_PATHS)
+        deep = older_page(base_url, HISTORY_PATH)
+        if deep is not None:
+            paths.append(deep)
+    latencies, errors = [], []
+    lock = threading.Lock()
+
+    threads = [
+        threading.Thread(target=run_client, args=(base_url, paths, requests_per_client, latencies, errors, lock))
+        for _ in range(clients)
+    ]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    duration = time.perf_counter() - started
+
+    return {
+        "paths": paths,
+        "requests": len(latencies),
+        "errors": len(errors),
+        "duration_s": round(duration, 2),
+        "throughput_rps": round(len(latencies) / duration, 1) if duration else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 1),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 1),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Lasttest für den Smart Home Hub")
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--clients", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=20, help="Requests pro Client")
+    parser.add_argument("--path", action="append", help="Pfad(e) die abgerufen werden, mehrfach möglich")
+    args = parser.parse_args()
+
+    result = run_load_test(args.url.rstrip("/"), args.clients, args.requests, args.path)
+    for key, value in result.items():
+        print(f"{key:>15}: {value}")
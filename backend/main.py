@@ -1,35 +1,72 @@
 import sqlite3
 from device import Device, alarm_clock, Lamp
-from emulator import DayEmulator, default_device_callback
+from emulator import DayEmulator, default_device_callback, FAST_FORWARD
+from device_registry import DeviceRegistry
+from device_state import DeviceStateTable
+from event_writer import EventWriter
+from migrations import run_migrations
+from rollups import compaction_loop
+from state_store import get_state_store, close_all_state_stores
 from fastapi import FastAPI
 from fastapi.templating import Jinja2Templates
 from starlette.middleware.sessions import SessionMiddleware
 from users_api import router as users_router
 from rooms_devices_api import router as rooms_router
-from database import Database
+from database import Database, close_all_pools
 from fastapi.responses import RedirectResponse
 from status_api import router as status_router
 from rules_api import router as rules_router
-from datetime import datetime
+from simulation_api import router as simulation_router
+from command_api import router as command_router
+from api_v1 import router as api_router
+from metrics_api import router as metrics_router
+from metrics import TimingMiddleware
+from hub_logging import get_logger, setup_logging
+from simulation_scheduler import SimulationScheduler, SPEED
+from datetime import date, datetime, timedelta
 import threading
+import asyncio
 from contextlib import asynccontextmanager
 from fastapi.staticfiles import StaticFiles
 
-def run_simulation_loop():
-    counter = 0
-    while counter < 50:
-        counter += 1
-        run_simulation()
+log = get_logger("main")
+
+SEED_DAYS = 50      # Tage, die beim ersten Start nachsimuliert werden (bis einschließlich heute)
+
+
+def create_scheduler():
+    # erster Start: Backfill der letzten SEED_DAYS-1 Tage bis jetzt, danach live;
+    # jeder weitere Start macht nach der zuletzt simulierten Stunde weiter
+    return SimulationScheduler(
+        lambda: LiveSimulation.resume(Database("hub.db"), backfill_days=SEED_DAYS - 1),
+        speed=SPEED,
+    )
 
 @asynccontextmanager 
 async def lifespan(app: FastAPI):
-    thread = threading.Thread(target=run_simulation_loop) 
-    thread.start() 
+    run_migrations(Database("hub.db"))
+    app.state.simulation = create_scheduler()
+    app.state.simulation.start()
+    # alte Events regelmäßig in die Rollup-Tabellen verdichten
+    compaction = asyncio.create_task(compaction_loop(Database("hub.db")))
     yield
+    compaction.cancel()
+    try:
+        await compaction
+    except asyncio.CancelledError:
+        pass
+    await app.state.simulation.stop()
+    close_all_state_stores()
+    close_all_pools()
+
 
+# INFO für alle hub.*-Logger, pro Modul über HUB_LOG_LEVELS (siehe hub_logging.py)
+setup_logging()
 
 app = FastAPI(lifespan=lifespan)
 app.add_middleware(SessionMiddleware, secret_key="SUPER_SECRET_KEY_123")
+# Latenz + SQL pro Request, Ausgabe unter /metrics und im Server-Timing-Header
+app.add_middleware(TimingMiddleware, server_timing=True)
 
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
@@ -37,6 +74,10 @@ app.include_router(users_router)
 app.include_router(rooms_router)
 app.include_router(status_router)
 app.include_router(rules_router)
+app.include_router(simulation_router)
+app.include_router(command_router)
+app.include_router(api_router)
+app.include_router(metrics_router)
 
 templates = Jinja2Templates(directory="templates")
 
@@ -47,9 +88,13 @@ async def root():
 class SmartHomeHub:
     def __init__(self, database):
         self.database = database
-        self.devices = []
+        self.devices = DeviceRegistry()     # Lookup per ID + Indizes nach Typ/Raum
+        self.state = DeviceStateTable()     # Status/Helligkeit als Arrays (Snapshots)
+        self.devices_version = None         # DeviceStateStore.version beim letzten Laden
 
     def load_devices(self):
+        # Version VOR dem Lesen merken: kommt währenddessen eine Änderung, lädt refresh_devices erneut
+        self.devices_version = get_state_store(self.database).version
         conn = self.database.connect()
         cursor = conn.cursor()
         cursor.execute("SELECT * FROM devices")
@@ -83,56 +128,163 @@ class SmartHomeHub:
                     room_id=row["room_id"],
                     database=self.database
                 )
-            self.devices.append(device)
+            self.devices.add(device)
         conn.close()
 
-    def get_device(self, device_id):
+        self.state = DeviceStateTable.from_devices(self.devices)
         for device in self.devices:
-            if device.device_id == device_id:
-                return device
-        return None
+            device.state_table = self.state
+
+    def refresh_devices(self, force=False) -> bool:
+        """
+        Lädt die Geräte neu, wenn devices seit dem letzten Laden von außen
+        geändert wurde (Formular, WebSocket, API – siehe state_store.py),
+        mit force=True auf jeden Fall (einmal pro simulierten Tag, falls
+        jemand an external_change vorbei schreibt).
+        Offene Statuswerte der Simulation werden vorher geschrieben, damit
+        das Neuladen sie nicht mit älteren DB-Werten überschreibt.
+        """
+        store = get_state_store(self.database)
+        if not force and store.version == self.devices_version:
+            return False
+        store.flush()
+        self.load_devices()
+        return True
+
+    def add_device(self, device):
+        self.devices.add(device)
+        self.state.add(device.device_id, device.device_status, getattr(device, "brightness", 0) or 0)
+        device.state_table = self.state
+
+    def get_device(self, device_id):
+        return self.devices.get(device_id)
 
     def delete_device(self, device_id):
         conn = self.database.connect()
         cursor = conn.cursor()
-        cursor.execute("DELETE FROM devices WHERE device_id = ?", (device_id,))
-        conn.commit()
+        with get_state_store(self.database).external_change([device_id]):
+            cursor.execute("DELETE FROM devices WHERE device_id = ?", (device_id,))
+            conn.commit()
         conn.close()
-        self.devices = [d for d in self.devices if d.device_id != device_id]
-        print(f"Device {device_id} deleted")
+        self.devices.remove(device_id)
+        self.state.remove(device_id)
+        log.info("Device %s deleted", device_id, extra={"device_id": device_id})
 
     def list_devices(self):
         for device in self.devices:
             device.print_info()
 
-def run_simulation():
-    db = Database("hub.db")
+def run_simulation(days=1, start_date=None, speed=FAST_FORWARD, database=None):
+    """
+    Simuliert days Tage ab start_date (Standard: heute) und schreibt die
+    Events mit dem simulierten Datum. speed=FAST_FORWARD läuft ohne Warten,
+    speed > 0 = Sekunden pro simulierter Stunde (Echtzeit-Demo).
+    database: andere DB als hub.db (z.B. Shard-Dateien in fleet_simulation.py).
+    Gibt den Hub zurück.
+    """
+    db = database or Database("hub.db")
     hub = SmartHomeHub(db)
     hub.load_devices()
 
-    emulator = DayEmulator(database=db, speed=1, start_hour=0)
+    emulator = DayEmulator(database=db, speed=speed, start_hour=0, start_date=start_date)
     
-    # NEU: Dictionary zum Speichern der Stati pro Stunde
+    # Stati pro Stunde: ein bytes-Snapshot der Zustandstabelle (Index = Zeile)
     hourly_device_states = {}
     
     # NEU: Callback der zusätzlich einen Snapshot der Stati speichert
     base_callback = default_device_callback(hub)
     def callback_with_snapshot(hour, temp, tod, brightness=0):
         base_callback(hour, temp, tod, brightness=brightness)
-        hourly_device_states[hour] = {
-            d.device_id: int(d.device_status) for d in hub.devices
-        }
+        hourly_device_states[hour] = hub.state.snapshot()
+
+    # alle Events gepuffert schreiben (executemany, eine Transaktion pro Batch)
+    with EventWriter(db) as writer:
+
+        def write_day(day, entries):
+            # offene Statusänderungen des Tages gebündelt schreiben
+            get_state_store(db).flush()
+            write_events(writer, hub, entries, hourly_device_states)
+            hourly_device_states.clear()
+            # neue/gelöschte Geräte ab dem nächsten Tag mitsimulieren
+            hub.refresh_devices(force=True)
+
+        # GEÄNDERT: callback_with_snapshot statt callback übergeben
+        emulator.simulate_days(days, start_date,
+                               on_hour_callback=callback_with_snapshot, on_day_end=write_day)
+
+    return hub
 
-    # GEÄNDERT: callback_with_snapshot statt callback übergeben
-    emulator.simulate_day(on_hour_callback=callback_with_snapshot)
 
-    log = emulator.get_log()
-    today = datetime.now().strftime("%Y-%m-%d")
+SAVE_STATE_SQL = "INSERT OR REPLACE INTO simulation_state (id, last_timestamp) VALUES (1, ?)"
 
-    conn = db.connect()
-    cursor = conn.cursor()
 
-    for entry in log:
+def last_simulated_hour(database):
+    """
+    Zeitpunkt der zuletzt simulierten Stunde (simulation_state) oder None.
+    Bewusst kein Rückgriff auf device_event_log: dort stehen auch UTC-Zeitstempel
+    von Nutzeraktionen, die keine simulierten (lokalen) Stunden sind.
+    """
+    conn = database.connect()
+    try:
+        row = conn.execute("SELECT last_timestamp FROM simulation_state WHERE id = 1").fetchone()
+    finally:
+        conn.close()
+    if row is None:
+        return None
+    return datetime.strptime(row[0][:13], "%Y-%m-%d %H")
+
+
+class LiveSimulation:
+    """
+    Simulation Stunde für Stunde für den SimulationScheduler:
+    tick() = eine simulierte Stunde inkl. Regeln; Events und simulation_state
+    in einer Transaktion (nach einem Absturz wird keine Stunde doppelt geschrieben),
+    next_time() = Zeitpunkt der Stunde, die der nächste tick() simuliert.
+    """
+
+    def __init__(self, database, start_date=None, start_hour=0):
+        self.database = database
+        self.hub = SmartHomeHub(database)
+        self.hub.load_devices()
+        self.emulator = DayEmulator(database=database, speed=FAST_FORWARD, start_hour=start_hour, start_date=start_date)
+        self.callback = default_device_callback(self.hub)
+        self.writer = EventWriter(database, auto_flush=False)     # schreibt nur in tick()
+        self._lock = threading.Lock()   # tick() und close() nie gleichzeitig
+
+    @classmethod
+    def resume(cls, database, backfill_days=SEED_DAYS - 1):
+        """
+        Startet eine Stunde nach der zuletzt simulierten (last_simulated_hour),
+        höchstens backfill_days Tage zurück (dann ab 00:00 dieses Tages).
+        """
+        start = datetime.combine(date.today() - timedelta(days=backfill_days), datetime.min.time())
+        last = last_simulated_hour(database)
+        if last is not None:
+            start = max(start, last + timedelta(hours=1))
+        return cls(database, start_date=start.date(), start_hour=start.hour)
+
+    def next_time(self) -> datetime:
+        return datetime.combine(self.emulator.current_date, datetime.min.time()) + timedelta(hours=self.emulator.current_hour)
+
+    def tick(self):
+        with self._lock:
+            # Änderungen von Nutzern übernehmen, zu Tagesbeginn immer neu laden
+            self.hub.refresh_devices(force=self.emulator.current_hour == 0)
+            entry = self.emulator.step(on_hour_callback=self.callback)
+            snapshot = {entry["hour"]: self.hub.state.snapshot()}
+            write_events(self.writer, self.hub, [entry], snapshot)
+            self.writer.flush(statements=[(SAVE_STATE_SQL, (entry["timestamp"],))])
+            return entry
+
+    def close(self):
+        with self._lock:
+            self.writer.close()
+            get_state_store(self.database).flush()
+
+
+def write_events(writer, hub, entries, hourly_device_states):
+    for entry in entries:
+        snapshot = hourly_device_states.get(entry["hour"])
         for device in hub.devices:
 
             temp_value = None
@@ -145,29 +297,19 @@ def run_simulation():
                 brightness_value = entry["brightness"]
 
             # GEÄNDERT: Status aus hourly_device_states holen statt device.device_status
-            status_at_hour = hourly_device_states.get(entry["hour"], {}).get(device.device_id, 0)
-
-            cursor.execute("""
-                INSERT INTO device_event_log 
-                (device_id, device_name, device_type,
-                 device_status, event_timestamp,
-                 temp_value, brightness_value)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
-            """, (
+            row = hub.state.row(device.device_id)
+            status_at_hour = snapshot[row] if snapshot is not None and row is not None else 0
+
+            writer.add(
                 device.device_id,
                 device.device_name,
                 device.device_type,
                 status_at_hour,   # ← GEÄNDERT
-                f"{today} {entry['hour']:02d}:00:00",
+                entry["timestamp"],
                 temp_value,
                 brightness_value
-            ))
-
-    conn.commit()
-    conn.close()
+            )
 
 if __name__ == "__main__":
-    counter = 0
-    while counter != 7:
-        counter += 1
-        run_simulation()
\ No newline at end of file
+    # eine Woche bis einschließlich heute nachsimulieren
+    run_simulation(days=7, start_date=date.today() - timedelta(days=6))
@@ -0,0 +1,228 @@
+# metrics.py
+# Messwerte pro Request: Latenz-Histogramm pro Route plus Anzahl und Dauer der
+# SQL-Statements, die der Request ausgelöst hat. Ausgabe unter /metrics
+# (Prometheus-Textformat, siehe metrics_api.py) und optional als
+# Server-Timing-Header, den die Browser-Devtools direkt anzeigen.
+#
+# SQL wird an zwei Stellen erfasst, beide in database.py eingehängt:
+# - trace_statement: sqlite3-Trace-Callback, zählt jedes Statement, das SQLite
+#   wirklich ausführt (auch einzelne Zeilen von executemany und Trigger). Wird
+#   nur gesetzt, solange ein Request die Verbindung hält – bei der Simulation
+#   würde er sonst jede Zeile eines executemany verlangsamen
+# - TimedCursor: Cursor der Pool-Verbindungen, misst execute/fetch
+# Zugeordnet wird über eine ContextVar, die auch in den Threadpool von
+# run_db mitwandert. Außerhalb eines Requests (Simulation, Verdichtung) ist sie
+# leer und kostet nur einen Lookup.
+
+import sqlite3
+import threading
+import time
+from contextvars import ContextVar
+from hub_logging import request_route
+
+# Obergrenzen der Histogramm-Buckets in Sekunden
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class RequestMetrics:
+    __slots__ = ("statements", "sql_time")
+
+    def __init__(self):
+        self.statements = 0
+        self.sql_time = 0.0
+
+
+_current = ContextVar("request_metrics", default=None)
+
+
+def in_request() -> bool:
+    return _current.get() is not None
+
+
+def trace_statement(statement):
+    current = _current.get()
+    if current is not None:
+        current.statements += 1
+
+
+class TimedCursor(sqlite3.Cursor):
+    # misst nur, wenn gerade ein Request läuft
+    def execute(self, *args):
+        current = _current.get()
+        if current is None:
+            return super().execute(*args)
+        start = time.perf_counter()
+        try:
+            return super().execute(*args)
+        finally:
+            current.sql_time += time.perf_counter() - start
+
+    def executemany(self, *args):
+        current = _current.get()
+        if current is None:
+            return super().executemany(*args)
+        start = time.perf_counter()
+        try:
+            return super().executemany(*args)
+        finally:
+            current.sql_time += time.perf_counter() - start
+
+    def fetchone(self):
+        current = _current.get()
+        if current is None:
+            return super().fetchone()
+        start = time.perf_counter()
+        try:
+            return super().fetchone()
+        finally:
+            current.sql_time += time.perf_counter() - start
+
+    def fetchmany(self, *args):
+        current = _current.get()
+        if current is None:
+            return super().fetchmany(*args)
+        start = time.perf_counter()
+        try:
+            return super().fetchmany(*args)
+        finally:
+            current.sql_time += time.perf_counter() - start
+
+    def fetchall(self):
+        current = _current.get()
+        if current is None:
+            return super().fetchall()
+        start = time.perf_counter()
+        try:
+            return super().fetchall()
+        finally:
+            current.sql_time += time.perf_counter() - start
+
+
+class RouteStats:
+    __slots__ = ("buckets", "count", "total", "statements", "sql_time")
+
+    def __init__(self):
+        self.buckets = [0] * len(LATENCY_BUCKETS)   # nicht kumuliert, wird beim Export aufsummiert
+        self.count = 0
+        self.total = 0.0
+        self.statements = 0
+        self.sql_time = 0.0
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self.routes = {}        # (method, route, status) -> RouteStats
+        self._lock = threading.Lock()
+
+    def observe(self, method, route, status, elapsed, request):
+        key = (method, route, status)
+        with self._lock:
+            stats = self.routes.get(key)
+            if stats is None:
+                stats = self.routes[key] = RouteStats()
+            for i, bound in enumerate(LATENCY_BUCKETS):
+                if elapsed <= bound:
+                    stats.buckets[i] += 1
+                    break
+            stats.count += 1
+            stats.total += elapsed
+            stats.statements += request.statements
+            stats.sql_time += request.sql_time
+
+    def render(self, gauges=()):
+        """
+        Prometheus-Textformat. gauges: zusätzliche (name, hilfe, [(labels, wert), ...]).
+        """
+        with self._lock:
+            routes = sorted(self.routes.items())
+            snapshot = [(key, list(s.buckets), s.count, s.total, s.statements, s.sql_time) for key, s in routes]
+
+        lines = [
+            "# HELP hub_http_request_duration_seconds Zeit bis zum Antwort-Header pro Route",
+            "# TYPE hub_http_request_duration_seconds histogram",
+        ]
+        for (method, route, status), buckets, count, total, _, _ in snapshot:
+            labels = f'method="{method}",route="{_escape(route)}",status="{status}"'
+            cumulative = 0
+            for bound, n in zip(LATENCY_BUCKETS, buckets):
+                cumulative += n
+                lines.append(f'hub_http_request_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f'hub_http_request_duration_seconds_bucket{{{labels},le="+Inf"}} {count}')
+            lines.append(f"hub_http_request_duration_seconds_sum{{{labels}}} {total:.6f}")
+            lines.append(f"hub_http_request_duration_seconds_count{{{labels}}} {count}")
+
+        lines += [
+            "# HELP hub_sql_statements_total SQL-Statements, die Requests ausgelöst haben",
+            "# TYPE hub_sql_statements_total counter",
+        ]
+        for (method, route, status), _, _, _, statements, _ in snapshot:
+            lines.append(f'hub_sql_statements_total{{method="{method}",route="{_escape(route)}",status="{status}"}} {statements}')
+
+        lines += [
+            "# HELP hub_sql_seconds_total Zeit in execute/fetch während Requests",
+            "# TYPE hub_sql_seconds_total counter",
+        ]
+        for (method, route, status), _, _, _, _, sql_time in snapshot:
+            lines.append(f'hub_sql_seconds_total{{method="{method}",route="{_escape(route)}",status="{status}"}} {sql_time:.6f}')
+
+        for name, help_text, samples in gauges:
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} gauge"]
+            for labels, value in samples:
+                label_text = ",".join(f'{k}="{_escape(str(v))}"' for k, v in labels.items())
+                lines.append(f"{name}{{{label_text}}} {value}" if label_text else f"{name} {value}")
+
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+registry = MetricsRegistry()
+
+
+class TimingMiddleware:
+    """
+    ASGI-Middleware (bewusst kein BaseHTTPMiddleware: kein Extra-Task pro
+    Request, Streams wie /status/stream laufen unverändert durch).
+    Gemessen wird bis zum Antwort-Header; als Route zählt das Pfad-Template
+    (z.B. /rules/edit/{rules_id}), damit die Zahl der Zeitreihen begrenzt bleibt.
+    """
+
+    def __init__(self, app, server_timing=True):
+        self.app = app
+        self.server_timing = server_timing
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        request = RequestMetrics()
+        token = _current.set(request)
+        route_token = request_route.set(f"{scope['method']} {scope['path']}")     # für Log-Zeilen
+        start = time.perf_counter()
+
+        async def send_timed(message):
+            if message["type"] == "http.response.start":
+                elapsed = time.perf_counter() - start
+                route = scope.get("route")      # von FastAPI gesetzt; Mounts wie /static nur über root_path
+                registry.observe(
+                    scope["method"],
+                    route.path if route is not None else scope.get("root_path") or "unmatched",
+                    message["status"],
+                    elapsed,
+                    request,
+                )
+                if self.server_timing:
+                    header = (
+                        f'app;dur={elapsed * 1000:.1f}, '
+                        f'db;dur={request.sql_time * 1000:.1f};desc="{request.statements} statements"'
+                    )
+                    message["headers"] = list(message.get("headers", [])) + [(b"server-timing", header.encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_timed)
+        finally:
+            _current.reset(token)
+            request_route.reset(route_token)
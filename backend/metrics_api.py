@@ -0,0 +1,38 @@
+from fastapi import APIRouter, Request
+from fastapi.responses import PlainTextResponse
+from database import pool_stats
+from event_bus import bus
+from metrics import registry
+
+# /metrics im Prometheus-Textformat: Request-Latenzen + SQL pro Route
+# (metrics.py) sowie ein paar Gauges zu Pool, Event-Bus und Simulation.
+# Ohne Login, damit ein Scraper sie abholen kann – enthält nur Zähler.
+router = APIRouter(tags=["metrics"])
+
+
+def _gauges(request: Request):
+    gauges = [
+        ("hub_db_pool_connections", "Offene Verbindungen pro Datenbank-Pool",
+         [({"db": path, "state": state}, stats[state])
+          for path, stats in pool_stats().items() for state in ("open", "idle")]),
+        ("hub_db_pool_waits", "Checkouts, die auf eine Verbindung warten mussten bzw. abgebrochen wurden",
+         [({"db": path, "result": result}, stats[key])
+          for path, stats in pool_stats().items() for result, key in (("waited", "waits"), ("timeout", "timeouts"))]),
+        ("hub_event_bus_subscribers", "Offene SSE-Abonnements", [({}, len(bus))]),
+    ]
+
+    scheduler = getattr(request.app.state, "simulation", None)
+    if scheduler is not None:
+        stats = scheduler.stats()
+        gauges += [
+            ("hub_simulation_ticks", "Simulierte Stunden seit dem Start", [({}, stats["ticks"])]),
+            ("hub_simulation_lag_seconds", "Verspätung der Simulations-Ticks",
+             [({"kind": kind}, stats[f"lag_{kind}"]) for kind in ("last", "max", "avg")]),
+            ("hub_simulation_late_ticks", "Ticks, die später als geplant liefen", [({}, stats["late_ticks"])]),
+        ]
+    return gauges
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def metrics(request: Request):
+    return PlainTextResponse(registry.render(_gauges(request)), media_type="text/plain; version=0.0.4")
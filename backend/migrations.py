@@ -0,0 +1,296 @@
+# migrations.py
+# Versionierte Schema-Migrationen für hub.db.
+# Jede Migration hat eine feste Nummer und läuft genau einmal; welche schon
+# gelaufen sind, steht in der Tabelle schema_migrations. Beim Start der App
+# (lifespan in main.py) werden alle fehlenden Migrationen der Reihe nach
+# angewendet. Neue Schema-Änderungen bitte hier als neue Nummer anhängen –
+# bestehende Migrationen nie nachträglich ändern.
+#
+#     python migrations.py              Migrationen auf hub.db anwenden
+#     python migrations.py --explain    Kurzcheck der wichtigsten Queries auf Indizes
+# Die Queries, die die Router wirklich absetzen, prüft tests/test_query_plans.py.
+
+import sqlite3
+import sys
+from database import Database
+from latest_state import LATEST_STATE_SCHEMA, REBUILD_SQL
+from rollups import ROLLUP_SCHEMA
+from hub_logging import get_logger, setup_logging
+
+
+# 1: Tabellen aus hub.sql (inkl. room_users, früher migrate_rooms_users.py)
+log = get_logger("migrations")
+
+BASE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    user_id       INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_name     TEXT    NOT NULL,
+    user_password TEXT    NOT NULL,
+    user_role     TEXT    NOT NULL CHECK(user_role IN ('admin', 'user'))
+);
+
+CREATE TABLE IF NOT EXISTS rooms (
+    room_id   INTEGER PRIMARY KEY AUTOINCREMENT,
+    room_name TEXT NOT NULL UNIQUE,
+    user_id   INTEGER,
+    FOREIGN KEY (user_id) REFERENCES users(user_id)
+);
+
+CREATE TABLE IF NOT EXISTS devices (
+    device_id   INTEGER PRIMARY KEY AUTOINCREMENT,
+    room_id     INTEGER,
+    device_name TEXT    NOT NULL UNIQUE,
+    device_type TEXT    NOT NULL,
+    device_status      BOOLEAN NOT NULL DEFAULT 0,
+    FOREIGN KEY (room_id) REFERENCES rooms(room_id)
+);
+
+CREATE TABLE IF NOT EXISTS room_users (
+    room_id INTEGER NOT NULL,
+    user_id INTEGER NOT NULL,
+    room_name TEXT,
+    user_name TEXT,
+    user_role TEXT,
+    PRIMARY KEY (room_id, user_id),
+    FOREIGN KEY (room_id) REFERENCES rooms(room_id) ON DELETE CASCADE,
+    FOREIGN KEY (user_id) REFERENCES users(user_id) ON DELETE CASCADE
+);
+
+CREATE TABLE IF NOT EXISTS device_event_log (
+    event_id   INTEGER PRIMARY KEY AUTOINCREMENT,
+    device_id INTEGER,
+    device_name TEXT NOT NULL DEFAULT '',
+    device_type TEXT NOT NULL DEFAULT '',
+    device_status BOOLEAN NOT NULL DEFAULT 0,
+    event_timestamp TEXT NOT NULL DEFAULT '',
+    temp_value INTEGER,
+    brightness_value INTEGER,
+    FOREIGN KEY (device_id) REFERENCES devices(device_id),
+    FOREIGN KEY (device_name) REFERENCES devices(device_name),
+    FOREIGN KEY (device_status) REFERENCES devices(device_status),
+    FOREIGN KEY (device_type) REFERENCES devices(device_type)
+);
+
+CREATE TABLE IF NOT EXISTS rules (
+    rules_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    device_id INTEGER NOT NULL DEFAULT '',
+    device_name TEXT NOT NULL DEFAULT '',
+    device_status BOOLEAN NOT NULL DEFAULT 0,
+    device_type TEXT NOT NULL DEFAULT '',
+    room_id INTEGER NOT NULL DEFAULT '',
+    room_name TEXT NOT NULL DEFAULT '',
+    temp_treshold_high INTEGER NOT NULL DEFAULT 0,
+    temp_treshold_low INTEGER NOT NULL DEFAULT 0,
+    brightness_treshold_high INTEGER NOT NULL DEFAULT 0,
+    brightness_treshold_low INTEGER NOT NULL DEFAULT 0,
+    FOREIGN KEY (device_status) REFERENCES devices(device_status),
+    FOREIGN KEY (device_id) REFERENCES devices(device_id),
+    FOREIGN KEY (device_name) REFERENCES devices(device_name),
+    FOREIGN KEY (device_type) REFERENCES devices(device_type),
+    FOREIGN KEY (room_id) REFERENCES rooms(room_id),
+    FOREIGN KEY (room_name) REFERENCES rooms(room_name)
+);
+"""
+
+# 3: Indizes für die Filter der Router-Queries
+HOT_QUERY_INDEXES = """
+CREATE INDEX IF NOT EXISTS idx_event_log_device   ON device_event_log(device_id, event_id);
+CREATE INDEX IF NOT EXISTS idx_event_log_type     ON device_event_log(device_type, event_id);
+CREATE INDEX IF NOT EXISTS idx_rules_device       ON rules(device_id);
+CREATE INDEX IF NOT EXISTS idx_rules_room         ON rules(room_id);
+CREATE INDEX IF NOT EXISTS idx_room_users_user    ON room_users(user_id);
+CREATE INDEX IF NOT EXISTS idx_rooms_user         ON rooms(user_id);
+CREATE INDEX IF NOT EXISTS idx_devices_room       ON devices(room_id);
+CREATE INDEX IF NOT EXISTS idx_users_name         ON users(user_name);
+"""
+
+# 4: Zeitfenster-Filter beim Export (/status/export?since=&until=)
+EVENT_TIMESTAMP_INDEX = """
+CREATE INDEX IF NOT EXISTS idx_event_log_timestamp ON device_event_log(event_timestamp);
+"""
+
+# 6: zuletzt simulierte Stunde der Dauer-Simulation (eine Zeile), damit ein
+# Neustart dort weitermacht statt den Backfill zu wiederholen
+SIMULATION_STATE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS simulation_state (
+    id             INTEGER PRIMARY KEY CHECK (id = 1),
+    last_timestamp TEXT NOT NULL            -- 'YYYY-MM-DD HH:00:00'
+);
+"""
+
+# 7: Grenze roh/verdichtet (rollups.raw_events_since, MAX(day))
+ROLLUP_DAY_INDEX = """
+CREATE INDEX IF NOT EXISTS idx_event_daily_day ON device_event_daily(day);
+"""
+
+
+def _latest_state(conn):
+    _run_script(conn, LATEST_STATE_SCHEMA)
+    conn.execute("DELETE FROM device_latest_state")
+    conn.execute(REBUILD_SQL)
+
+
+# (Nummer, Name, SQL-Skript oder Funktion(conn))
+MIGRATIONS = [
+    (1, "base_schema", BASE_SCHEMA),
+    (2, "device_latest_state", _latest_state),
+    (3, "hot_query_indexes", HOT_QUERY_INDEXES),
+    (4, "event_timestamp_index", EVENT_TIMESTAMP_INDEX),
+    (5, "event_rollups", ROLLUP_SCHEMA),
+    (6, "simulation_state", SIMULATION_STATE_SCHEMA),
+    (7, "rollup_day_index", ROLLUP_DAY_INDEX),
+]
+
+
+def _split_statements(script):
+    # Skript in einzelne Statements zerlegen (Trigger enthalten selbst ';')
+    statements, current = [], ""
+    for line in script.splitlines(keepends=True):
+        current += line
+        if sqlite3.complete_statement(current):
+            statements.append(current.strip())
+            current = ""
+    if current.strip():
+        statements.append(current.strip())
+    return statements
+
+
+def _run_script(conn, script):
+    # anders als executescript() ohne implizites COMMIT, bleibt also in der Transaktion
+    for statement in _split_statements(script):
+        conn.execute(statement)
+
+
+def applied_versions(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version    INTEGER PRIMARY KEY,
+            name       TEXT NOT NULL,
+            applied_at TEXT NOT NULL DEFAULT (datetime('now'))
+        )
+    """)
+    return {row[0] for row in conn.execute("SELECT version FROM schema_migrations")}
+
+
+def run_migrations(database, migrations=MIGRATIONS):
+    """
+    Wendet alle noch nicht angewendeten Migrationen an.
+    Jede Migration läuft in einer eigenen Transaktion – schlägt sie fehl,
+    bleibt die Datenbank auf dem Stand davor. Gibt die Liste der neu
+    angewendeten Versionen zurück.
+    """
+    conn = database.connect()
+    applied = []
+    try:
+        done = applied_versions(conn)
+        for version, name, step in sorted(migrations, key=lambda m: m[0]):
+            if version in done:
+                continue
+            conn.execute("BEGIN")
+            try:
+                if callable(step):
+                    step(conn)
+                else:
+                    _run_script(conn, step)
+                conn.execute(
+                    "INSERT INTO schema_migrations (version, name) VALUES (?, ?)",
+                    (version, name)
+                )
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            applied.append(version)
+            log.info("Migration %03d %s applied", version, name)
+    finally:
+        conn.close()
+    return applied
+
+
+# Queries aus den Routern, die einen Index benutzen müssen (Name, SQL, Parameter)
+HOT_QUERIES = [
+    ("login", "SELECT * FROM users WHERE user_name = ? AND user_password = ?", ("a", "b")),
+    ("device history", """
+        SELECT * FROM device_event_log WHERE device_id = ? AND event_id < ?
+        ORDER BY event_id DESC LIMIT ?""", (1, 1000, 101)),
+    ("history lamp count", "SELECT COUNT(*) FROM device_event_log WHERE device_type = 'Lamp'", ()),
+    ("history lamp page", """
+        SELECT * FROM device_event_log WHERE device_type = 'Lamp' AND event_id < ?
+        ORDER BY event_id DESC LIMIT ?""", (1000, 31)),
+    ("export time range", """
+        SELECT * FROM device_event_log
+        WHERE event_timestamp >= ? AND event_timestamp < ? ORDER BY event_id""",
+        ("2026-01-01", "2026-01-02")),
+    ("room events", """
+        SELECT * FROM device_event_log
+        WHERE device_id IN (SELECT device_id FROM devices WHERE room_id = ?)
+        ORDER BY event_id DESC""", (1,)),
+    ("device daily rollup", """
+        SELECT * FROM device_event_daily
+        WHERE device_id = ? AND day >= ? AND day < ? ORDER BY day DESC""", (1, "", "9999")),
+    ("devices in room", "SELECT * FROM devices WHERE room_id = ?", (1,)),
+    ("rules by device", "SELECT * FROM rules WHERE device_id = ? ORDER BY rules_id DESC", (1,)),
+    ("rules by room", "SELECT * FROM rules WHERE room_id = ? ORDER BY rules_id DESC", (1,)),
+    ("room access", """
+        SELECT * FROM rooms WHERE room_id = ? AND (
+            user_id = ?
+            OR room_id IN (SELECT room_id FROM room_users WHERE user_id = ?)
+        )""", (1, 1, 1)),
+    ("user rooms", """
+        SELECT * FROM rooms WHERE user_id = ?
+        UNION
+        SELECT r.* FROM rooms r
+        JOIN room_users ru ON r.room_id = ru.room_id
+        WHERE ru.user_id = ?""", (1, 1)),
+    ("user rules", """
+        SELECT r.* FROM rules r
+        WHERE r.room_id IN (
+            SELECT room_id FROM rooms WHERE user_id = ?
+            UNION
+            SELECT room_id FROM room_users WHERE user_id = ?
+        )
+        ORDER BY r.rules_id DESC""", (1, 1)),
+    ("assigned users", """
+        SELECT u.user_id, u.user_name FROM room_users ru
+        JOIN users u ON ru.user_id = u.user_id
+        WHERE ru.room_id = ?""", (1,)),
+]
+
+
+def _is_table_scan(detail):
+    # "SCAN <tabelle>" ohne Index = Full Table Scan; "SCAN (subquery-N)" liest nur ein Zwischenergebnis
+    upper = detail.upper()
+    return detail.startswith("SCAN ") and "USING" not in upper and "SUBQUERY" not in upper \
+        and "CO-ROUTINE" not in upper
+
+
+def check_query_plans(database, queries=HOT_QUERIES):
+    """
+    Führt EXPLAIN QUERY PLAN für jede Query aus und liefert die, die
+    eine Tabelle komplett scannen: [(name, detail), ...]. Leer = alles ok.
+    """
+    conn = database.connect()
+    failures = []
+    try:
+        for name, sql, params in queries:
+            for row in conn.execute("EXPLAIN QUERY PLAN " + sql, params):
+                detail = row[3]
+                if _is_table_scan(detail):
+                    failures.append((name, detail))
+    finally:
+        conn.close()
+    return failures
+
+
+if __name__ == "__main__":
+    setup_logging()
+    args = [a for a in sys.argv[1:] if not a.startswith("--")]
+    db = Database(args[0] if args else "hub.db")
+    run_migrations(db)
+
+    if "--explain" in sys.argv:
+        failures = check_query_plans(db)
+        for name, detail in failures:
+            print(f"FULL SCAN  {name}: {detail}")
+        print(f"{len(HOT_QUERIES) - len({n for n, _ in failures})}/{len(HOT_QUERIES)} queries use an index")
+        sys.exit(1 if failures else 0)
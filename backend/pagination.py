@@ -0,0 +1,110 @@
+# pagination.py
+# Keyset-Pagination für device_event_log.
+# Statt LIMIT/OFFSET (Seite N muss N*per_page Zeilen überspringen) merkt sich
+# jede Seite die event_id am Rand: "before=<id>" = ältere Events, "after=<id>" =
+# neuere Events. Mit dem Index (device_id/device_type, event_id) kostet damit
+# jede Seite gleich viel, egal wie tief man blättert.
+
+import time
+import threading
+from urllib.parse import urlencode
+
+COUNT_TTL = 60.0    # Sekunden, die eine gezählte Gesamtzahl gültig bleibt
+
+_count_cache = {}
+_count_lock = threading.Lock()
+
+
+def cached_count(curs, query, params=(), ttl=COUNT_TTL):
+    """
+    COUNT(*) mit Cache: die Gesamtzahl wird nur alle ttl Sekunden neu gezählt.
+    Für die Anzeige "ca. N Events" reicht das, und nicht jeder Seitenaufruf
+    muss das ganze Log zählen.
+    """
+    key = (query, tuple(params))
+    now = time.monotonic()
+    with _count_lock:
+        hit = _count_cache.get(key)
+    if hit and now - hit[0] < ttl:
+        return hit[1]
+
+    count = curs.execute(query, params).fetchone()[0]
+    with _count_lock:
+        _count_cache[key] = (now, count)
+    return count
+
+
+def _exists(curs, where, params, bound, value):
+    return curs.execute(
+        f"SELECT 1 FROM device_event_log WHERE {where} AND {bound} LIMIT 1",
+        params + (value,)
+    ).fetchone() is not None
+
+
+def fetch_event_page(curs, where, params=(), before=None, after=None, per_page=30, columns="*"):
+    """
+    Eine Seite aus device_event_log, neueste zuerst.
+
+    where     : Filter ohne "WHERE", z.B. "device_type = ?"
+    before    : nur Events mit event_id < before (nächste, ältere Seite)
+    after     : nur Events mit event_id > after (vorherige, neuere Seite)
+
+    Gibt ein dict mit events, older (Cursor für ältere Seite oder None)
+    und newer (Cursor für neuere Seite oder None) zurück.
+    """
+    params = tuple(params)
+    if after is not None:
+        rows = curs.execute(
+            f"SELECT {columns} FROM device_event_log WHERE {where} AND event_id > ? "
+            "ORDER BY event_id ASC LIMIT ?",
+            params + (after, per_page + 1)
+        ).fetchall()
+        has_newer = len(rows) > per_page
+        rows = list(reversed(rows[:per_page]))
+        has_older = _exists(curs, where, params, "event_id <= ?", after)
+    else:
+        cursor_sql, cursor_params = ("AND event_id < ?", (before,)) if before is not None else ("", ())
+        rows = curs.execute(
+            f"SELECT {columns} FROM device_event_log WHERE {where} {cursor_sql} "
+            "ORDER BY event_id DESC LIMIT ?",
+            params + cursor_params + (per_page + 1,)
+        ).fetchall()
+        has_older = len(rows) > per_page
+        rows = rows[:per_page]
+        has_newer = before is not None and _exists(curs, where, params, "event_id >= ?", before)
+
+    return {
+        "events": rows,
+        "older": rows[-1]["event_id"] if rows and has_older else None,
+        "newer": rows[0]["event_id"] if rows and has_newer else None,
+    }
+
+
+def page_links(query_params, prefix, page):
+    """
+    URLs für Newest / Newer / Older / Oldest einer Seite.
+    prefix trennt mehrere Tabellen auf einer Seite (z.B. "lamp_", "heater_");
+    die Cursor der anderen Tabellen bleiben in der URL erhalten.
+    """
+    base = {k: v for k, v in query_params.items() if k not in (prefix + "before", prefix + "after")}
+
+    def link(**cursor):
+        query = dict(base)
+        query.update({prefix + k: v for k, v in cursor.items()})
+        return "?" + urlencode(query)
+
+    return {
+        "newest": link() if page["newer"] is not None else None,
+        "newer": link(after=page["newer"]) if page["newer"] is not None else None,
+        "older": link(before=page["older"]) if page["older"] is not None else None,
+        "oldest": link(after=0) if page["older"] is not None else None,
+    }
+
+
+def int_param(query_params, name):
+    # Cursor aus der Query lesen, ungültige Werte ignorieren
+    value = query_params.get(name)
+    try:
+        return int(value) if value is not None else None
+    except ValueError:
+        return None
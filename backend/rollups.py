@@ -0,0 +1,247 @@
+# rollups.py
+# Verdichtung von device_event_log.
+# Rohe Events, die älter als RAW_RETENTION_DAYS sind, werden pro Gerät zu
+# Stunden- und Tageswerten zusammengefasst (Anzahl Events, davon "an",
+# min/max/Summe Temperatur, Summe Helligkeit) und danach aus dem Log gelöscht
+# bzw. in eine Archiv-DB verschoben. Stundenwerte werden nach
+# HOURLY_RETENTION_DAYS ebenfalls gelöscht, Tageswerte bleiben.
+# Gespeichert werden Summen + Zähler statt Mittelwerten, damit sich Teile
+# (Rollup + noch rohe Events desselben Tages) einfach addieren lassen.
+#
+# Die Event-Listen unter /status zeigen nur rohe Events; ältere Zeiträume
+# liefert device_summary (Geräte-Historie, /status/events/device/{id}/summary),
+# ein Export davor antwortet mit 410 (raw_events_since).
+#
+# Angelegt wird alles über migrations.py (Migration 005). Läuft im Hub als
+# Hintergrund-Task (compaction_loop im lifespan), von Hand:
+#     python rollups.py [db] [--raw-days 30] [--hourly-days 365] [--archive archiv.db]
+
+import asyncio
+import sys
+from datetime import date, timedelta
+from hub_logging import get_logger, setup_logging
+
+log = get_logger("rollups")
+
+RAW_RETENTION_DAYS = 30         # so lange bleiben rohe Events im Log
+HOURLY_RETENTION_DAYS = 365     # so lange bleiben Stundenwerte
+COMPACT_INTERVAL = 3600.0       # Sekunden zwischen zwei Läufen im Hub
+
+ROLLUP_SCHEMA = """
+CREATE TABLE IF NOT EXISTS device_event_hourly (
+    device_id        INTEGER NOT NULL,
+    hour             TEXT    NOT NULL,      -- 'YYYY-MM-DD HH:00:00'
+    device_name      TEXT    NOT NULL DEFAULT '',
+    device_type      TEXT    NOT NULL DEFAULT '',
+    events           INTEGER NOT NULL DEFAULT 0,
+    on_events        INTEGER NOT NULL DEFAULT 0,
+    temp_min         REAL,
+    temp_max         REAL,
+    temp_sum         REAL    NOT NULL DEFAULT 0,
+    temp_count       INTEGER NOT NULL DEFAULT 0,
+    brightness_sum   REAL    NOT NULL DEFAULT 0,
+    brightness_count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (device_id, hour)
+);
+
+CREATE TABLE IF NOT EXISTS device_event_daily (
+    device_id        INTEGER NOT NULL,
+    day              TEXT    NOT NULL,      -- 'YYYY-MM-DD'
+    device_name      TEXT    NOT NULL DEFAULT '',
+    device_type      TEXT    NOT NULL DEFAULT '',
+    events           INTEGER NOT NULL DEFAULT 0,
+    on_events        INTEGER NOT NULL DEFAULT 0,
+    temp_min         REAL,
+    temp_max         REAL,
+    temp_sum         REAL    NOT NULL DEFAULT 0,
+    temp_count       INTEGER NOT NULL DEFAULT 0,
+    brightness_sum   REAL    NOT NULL DEFAULT 0,
+    brightness_count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (device_id, day)
+);
+"""
+
+# Spaltenausdruck für den Zeitschlüssel der Rohdaten
+_BUCKETS = {
+    "hour": ("device_event_hourly", "hour", "substr(event_timestamp, 1, 13) || ':00:00'"),
+    "day": ("device_event_daily", "day", "substr(event_timestamp, 1, 10)"),
+}
+
+
+def _rollup_sql(granularity):
+    table, key, bucket = _BUCKETS[granularity]
+    # min/max: SQLite-min(a, NULL) ist NULL, daher COALESCE über beide Seiten
+    return f"""
+        INSERT INTO {table} (
+            device_id, {key}, device_name, device_type, events, on_events,
+            temp_min, temp_max, temp_sum, temp_count, brightness_sum, brightness_count
+        )
+        SELECT device_id, {bucket}, MAX(device_name), MAX(device_type), COUNT(*), SUM(device_status),
+               MIN(temp_value), MAX(temp_value), TOTAL(temp_value), COUNT(temp_value),
+               TOTAL(brightness_value), COUNT(brightness_value)
+        FROM device_event_log
+        WHERE device_id IS NOT NULL AND event_timestamp >= ? AND event_timestamp < ?
+        GROUP BY device_id, {bucket}
+        ON CONFLICT(device_id, {key}) DO UPDATE SET
+            events           = events + excluded.events,
+            on_events        = on_events + excluded.on_events,
+            temp_min         = COALESCE(MIN(temp_min, excluded.temp_min), temp_min, excluded.temp_min),
+            temp_max         = COALESCE(MAX(temp_max, excluded.temp_max), temp_max, excluded.temp_max),
+            temp_sum         = temp_sum + excluded.temp_sum,
+            temp_count       = temp_count + excluded.temp_count,
+            brightness_sum   = brightness_sum + excluded.brightness_sum,
+            brightness_count = brightness_count + excluded.brightness_count
+    """
+
+
+def _archive(conn, day, next_day):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS archive.device_event_log AS
+        SELECT * FROM main.device_event_log WHERE 0
+    """)
+    conn.execute("""
+        INSERT INTO archive.device_event_log
+        SELECT * FROM main.device_event_log WHERE event_timestamp >= ? AND event_timestamp < ?
+    """, (day, next_day))
+
+
+def compact_events(database, raw_days=RAW_RETENTION_DAYS, hourly_days=HOURLY_RETENTION_DAYS,
+                   archive_path=None, today=None):
+    """
+    Verdichtet alle Events vor (today - raw_days) in die Rollup-Tabellen und
+    löscht sie danach aus device_event_log (mit archive_path vorher in diese
+    DB kopiert). Ein Tag = eine Transaktion, der Schreib-Lock wird also nie
+    lange gehalten. Gibt {"days", "events", "hourly_pruned"} zurück.
+    """
+    today = today or date.today()
+    cutoff = (today - timedelta(days=raw_days)).isoformat()
+    hourly_cutoff = (today - timedelta(days=hourly_days)).isoformat()
+
+    conn = database.connect()
+    result = {"days": 0, "events": 0, "hourly_pruned": 0}
+    attached = False
+    try:
+        if archive_path:
+            conn.execute("ATTACH DATABASE ? AS archive", (archive_path,))
+            attached = True
+
+        days = [row[0] for row in conn.execute("""
+            SELECT DISTINCT substr(event_timestamp, 1, 10) FROM device_event_log
+            WHERE event_timestamp < ? ORDER BY 1
+        """, (cutoff,))]
+
+        for day in days:
+            next_day = (date.fromisoformat(day) + timedelta(days=1)).isoformat()
+            with conn:
+                conn.execute(_rollup_sql("hour"), (day, next_day))
+                conn.execute(_rollup_sql("day"), (day, next_day))
+                if archive_path:
+                    _archive(conn, day, next_day)
+                deleted = conn.execute(
+                    "DELETE FROM device_event_log WHERE event_timestamp >= ? AND event_timestamp < ?",
+                    (day, next_day)
+                ).rowcount
+            result["days"] += 1
+            result["events"] += deleted
+
+        with conn:
+            result["hourly_pruned"] = conn.execute(
+                "DELETE FROM device_event_hourly WHERE hour < ?", (hourly_cutoff,)
+            ).rowcount
+    finally:
+        # nur nach erfolgreichem ATTACH, sonst verdeckt der DETACH-Fehler den eigentlichen
+        if attached:
+            conn.execute("DETACH DATABASE archive")
+        conn.close()
+    return result
+
+
+def raw_events_since(curs):
+    """
+    Erster Tag, der noch als rohe Events in device_event_log liegt, oder None,
+    solange nichts verdichtet wurde. Davor gibt es nur noch die Stunden- und
+    Tageswerte (device_summary) – Event-Listen und Export enden dort.
+    """
+    last = curs.execute("SELECT MAX(day) FROM device_event_daily").fetchone()[0]
+    if last is None:
+        return None
+    return (date.fromisoformat(last) + timedelta(days=1)).isoformat()
+
+
+def device_summary(curs, device_id, granularity="day", since=None, until=None, limit=None):
+    """
+    Stunden- oder Tageswerte eines Geräts, neueste zuerst. Kombiniert die
+    Rollup-Tabelle (alte Zeiträume) mit den noch rohen Events (neue
+    Zeiträume), der Aufrufer merkt also nicht, wo die Grenze liegt.
+    Jede Zeile: period, events, on_events, on_ratio, temp_min, temp_max,
+    temp_avg, brightness_avg.
+    """
+    table, key, bucket = _BUCKETS[granularity]
+    since = since or ""
+    until = until or "9999"
+    rows = curs.execute(f"""
+        SELECT period, SUM(events) AS events, SUM(on_events) AS on_events,
+               MIN(temp_min) AS temp_min, MAX(temp_max) AS temp_max,
+               SUM(temp_sum) AS temp_sum, SUM(temp_count) AS temp_count,
+               SUM(brightness_sum) AS brightness_sum, SUM(brightness_count) AS brightness_count
+        FROM (
+            SELECT {key} AS period, events, on_events, temp_min, temp_max,
+                   temp_sum, temp_count, brightness_sum, brightness_count
+            FROM {table}
+            WHERE device_id = ? AND {key} >= ? AND {key} < ?
+            UNION ALL
+            SELECT {bucket}, COUNT(*), SUM(device_status), MIN(temp_value), MAX(temp_value),
+                   TOTAL(temp_value), COUNT(temp_value), TOTAL(brightness_value), COUNT(brightness_value)
+            FROM device_event_log
+            WHERE device_id = ? AND event_timestamp >= ? AND event_timestamp < ?
+            GROUP BY 1
+        )
+        GROUP BY period ORDER BY period DESC
+        {"LIMIT ?" if limit else ""}
+    """, (device_id, since, until, device_id, since, until) + ((limit,) if limit else ())).fetchall()
+
+    return [{
+        "period": row["period"],
+        "events": row["events"],
+        "on_events": row["on_events"],
+        "on_ratio": round(row["on_events"] / row["events"], 3) if row["events"] else None,
+        "temp_min": row["temp_min"],
+        "temp_max": row["temp_max"],
+        "temp_avg": round(row["temp_sum"] / row["temp_count"], 1) if row["temp_count"] else None,
+        "brightness_avg": round(row["brightness_sum"] / row["brightness_count"], 1) if row["brightness_count"] else None,
+    } for row in rows]
+
+
+async def compaction_loop(database, interval=COMPACT_INTERVAL, **kwargs):
+    # Hintergrund-Task für den lifespan: alle interval Sekunden verdichten
+    while True:
+        try:
+            result = await asyncio.to_thread(compact_events, database, **kwargs)
+            if result["days"]:
+                log.info("%s Events aus %s Tagen verdichtet", result["events"], result["days"])
+        except Exception:
+            log.exception("Verdichtung fehlgeschlagen")
+        await asyncio.sleep(interval)
+
+
+if __name__ == "__main__":
+    from database import Database
+    from migrations import run_migrations
+
+    setup_logging()
+    args = sys.argv[1:]
+
+    def option(name, default):
+        if name in args:
+            i = args.index(name)
+            value = args[i + 1]
+            del args[i:i + 2]
+            return value
+        return default
+
+    raw_days = int(option("--raw-days", RAW_RETENTION_DAYS))
+    hourly_days = int(option("--hourly-days", HOURLY_RETENTION_DAYS))
+    archive_path = option("--archive", None)
+    db = Database(args[0] if args else "hub.db")
+    run_migrations(db)
+    print(compact_events(db, raw_days, hourly_days, archive_path))
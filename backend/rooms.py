@@ -3,6 +3,11 @@
 
 
 
+from hub_logging import get_logger
+
+log = get_logger("rooms")
+
+
 class Room:
 
     def __init__(self, room_id, room_name, user_id, database):
@@ -31,14 +36,14 @@ class Room:
 
         conn.close()
 
-        print(f"Room '{self.room_name}' saved with ID {self.room_id}")
+        log.info("Room '%s' saved with ID %s", self.room_name, self.room_id, extra={"room_id": self.room_id})
 
 
     
     def delete_from_db(self):
 
         if self.room_id is None:
-            print("Room has no ID, cannot delete")
+            log.warning("Room has no ID, cannot delete")
             return
 
         conn = self.database.connect()
@@ -52,7 +57,7 @@ class Room:
         conn.commit()
         conn.close()
 
-        print(f"Room '{self.room_name}' deleted")
+        log.info("Room '%s' deleted", self.room_name, extra={"room_id": self.room_id})
 
 
     
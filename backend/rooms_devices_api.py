@@ -8,8 +8,11 @@ from starlette.middleware.sessions import SessionMiddleware
 import sqlite3
 import os
 from users_api import get_db, get_current_user
+from async_database import run_db, fetch_one, fetch_all, fetch_value, execute, execute_devices, write_devices
+from acl import get_identity, invalidate_rooms
 from rooms import Room
-from database import Database
+from database import Database, batch_load
+from event_bus import bus
 
 router = APIRouter()
 
@@ -20,7 +23,7 @@ db_path = os.path.join(BASE_DIR, "hub.db")
 db = Database(db_path)
 
 
-def current_room(request: Request):
+async def current_room(request: Request):
     room_id = request.session.get("room_id")
     user_id = request.session.get("user_id")
     user_role = request.session.get("user_role")
@@ -28,23 +31,19 @@ def current_room(request: Request):
     if room_id is None:
         return None
 
-    conn, curs = get_db()
-
     if user_role == "admin":
-        room = curs.execute("""
+        room = await fetch_one("""
             SELECT room_id, room_name, user_id 
             FROM rooms 
             WHERE room_id = ?
-        """, (room_id,)).fetchone()
+        """, (room_id,))
     else:
-        room = curs.execute("""
+        room = await fetch_one("""
             SELECT room_id, room_name, user_id 
             FROM rooms 
             WHERE room_id = ? 
             AND user_id = ?;
-        """, (room_id, user_id)).fetchone()
-
-    conn.close()
+        """, (room_id, user_id))
 
     if room is None:
         request.session.pop("room_id", None)
@@ -55,17 +54,15 @@ def current_room(request: Request):
 
 @router.get("/", response_class=HTMLResponse)
 async def rooms_page(request: Request):
-    user = get_current_user(request)
+    user = await get_current_user(request)
     if not user:
         return RedirectResponse("/", status_code=303)
 
-    conn, curs = get_db()
-
     if user["user_role"] == "admin":
-        curs.execute("SELECT COUNT(*) FROM rooms")
+        rooms_count = await fetch_value("SELECT COUNT(*) FROM rooms")
     else:
         # Zähle eigene + zugewiesene Räume
-        curs.execute("""
+        rooms_count = await fetch_value("""
             SELECT COUNT(*) FROM (
                 SELECT room_id FROM rooms WHERE user_id = ?
                 UNION
@@ -73,9 +70,6 @@ async def rooms_page(request: Request):
             )
         """, (user["user_id"], user["user_id"]))
 
-    rooms_count = curs.fetchone()[0]
-    conn.close()
-
     if rooms_count == 0:
         return templates.TemplateResponse("rooms/create.html", {"request": request})
     return RedirectResponse("/list", status_code=303)
@@ -83,44 +77,50 @@ async def rooms_page(request: Request):
 
 @router.get("/list", response_class=HTMLResponse)
 async def show_rooms_page(request: Request):
-    user = get_current_user(request)
+    user = await get_current_user(request)
     if not user:
         return RedirectResponse("/", status_code=303)
 
-    conn, curs = get_db()
+    def _load_rooms(conn, curs):
+        if user["user_role"] == "admin":
+            rooms = curs.execute("SELECT * FROM rooms").fetchall()
+        else:
+            rooms = curs.execute("""
+                SELECT * FROM rooms 
+                WHERE user_id = ?
+                UNION
+                SELECT r.* FROM rooms r
+                JOIN room_users ru ON r.room_id = ru.room_id
+                WHERE ru.user_id = ?
+            """, (user["user_id"], user["user_id"])).fetchall()
 
-    if user["user_role"] == "admin":
-        rooms = curs.execute("SELECT * FROM rooms").fetchall()
-    else:
-        rooms = curs.execute("""
-            SELECT * FROM rooms 
-            WHERE user_id = ?
-            UNION
-            SELECT r.* FROM rooms r
-            JOIN room_users ru ON r.room_id = ru.room_id
-            WHERE ru.user_id = ?
-        """, (user["user_id"], user["user_id"])).fetchall()
-
-    all_users = []
-    rooms_with_users = []
+        all_users = []
+        rooms_with_users = []
 
-    if user["user_role"] == "admin":
-        all_users = curs.execute("SELECT * FROM users").fetchall()
+        if user["user_role"] == "admin":
+            all_users = curs.execute("SELECT * FROM users").fetchall()
 
-        for room in rooms:
-            assigned = curs.execute("""
-                SELECT u.user_id, u.user_name
+            # zugewiesene user für alle räume auf einmal (statt einer query pro raum)
+            assigned = batch_load(curs, """
+                SELECT ru.room_id, u.user_id, u.user_name
                 FROM room_users ru
                 JOIN users u ON ru.user_id = u.user_id
-                WHERE ru.room_id = ?
-            """, (room["room_id"],)).fetchall()
-            room_dict = dict(room)
-            room_dict["assigned_users"] = [dict(a) for a in assigned]
-            rooms_with_users.append(room_dict)
-    else:
-        rooms_with_users = [dict(r) | {"assigned_users": []} for r in rooms]
+                WHERE ru.room_id IN ({keys})
+            """, [room["room_id"] for room in rooms], "room_id")
+
+            for room in rooms:
+                room_dict = dict(room)
+                room_dict["assigned_users"] = [
+                    {"user_id": a["user_id"], "user_name": a["user_name"]}
+                    for a in assigned.get(room["room_id"], [])
+                ]
+                rooms_with_users.append(room_dict)
+        else:
+            rooms_with_users = [dict(r) | {"assigned_users": []} for r in rooms]
+
+        return rooms_with_users, all_users
 
-    conn.close()
+    rooms_with_users, all_users = await run_db(_load_rooms)
 
     return templates.TemplateResponse("rooms/list.html", {
         "request": request,
@@ -132,33 +132,28 @@ async def show_rooms_page(request: Request):
 
 @router.post("/create", response_class=HTMLResponse)
 async def create_room(request: Request, room_name: str = Form(...)):
-    user = get_current_user(request)
+    user = await get_current_user(request)
     if not user:
         return RedirectResponse("/", status_code=303)
 
-    conn, curs = get_db()
-
-    existing = curs.execute(
+    existing = await fetch_one(
         "SELECT * FROM rooms WHERE room_name = ?", (room_name,)
-    ).fetchone()
+    )
 
     if existing:
-        conn.close()
         return HTMLResponse("<h2>Room already exists.</h2>")
 
-    curs.execute(
+    await execute(
         "INSERT INTO rooms (room_name, user_id) VALUES (?,?)", (room_name, user["user_id"])
     )
-
-    conn.commit()
-    conn.close()
+    invalidate_rooms(user["user_id"])
 
     return RedirectResponse(url="/list", status_code=303)
 
 
 @router.get("/create", response_class=HTMLResponse)
 async def create_room_page(request: Request):
-    user = get_current_user(request)
+    user = await get_current_user(request)
     if not user:
         return RedirectResponse("/", status_code=303)
     return templates.TemplateResponse("rooms/create.html", {"request": request})
@@ -166,29 +161,29 @@ async def create_room_page(request: Request):
 
 @router.post("/delete", response_class=HTMLResponse)
 async def delete_room(request: Request, room_id: int = Form(...)):
-    room = user_can_access_room(request, room_id)
+    room = await user_can_access_room(request, room_id)
     if not room:
         return HTMLResponse("<h2>Access not granted or room not existant.</h2>")
 
-    conn, curs = get_db()
-    curs.execute("DELETE FROM devices WHERE room_id = ?", (room_id,))
-    curs.execute("DELETE FROM rooms WHERE room_id = ?", (room_id,))
-    conn.commit()
-    conn.close()
+    def _delete_room(conn, curs):
+        curs.execute("DELETE FROM devices WHERE room_id = ?", (room_id,))
+        curs.execute("DELETE FROM rooms WHERE room_id = ?", (room_id,))
+        conn.commit()
+
+    # Geräte des Raums verschwinden → Simulation lädt vor dem nächsten Tick neu
+    await write_devices(_delete_room)
+    invalidate_rooms()
 
     return RedirectResponse(url="/list", status_code=303)
 
 
 @router.post("/rename")
 async def rename_room(request: Request, room_id: int = Form(...), new_name: str = Form(...)):
-    room = user_can_access_room(request, room_id)
+    room = await user_can_access_room(request, room_id)
     if not room:
         return HTMLResponse("No Access.")
 
-    conn, curs = get_db()
-    curs.execute("UPDATE rooms SET room_name = ? WHERE room_id = ?", (new_name, room_id))
-    conn.commit()
-    conn.close()
+    await execute("UPDATE rooms SET room_name = ? WHERE room_id = ?", (new_name, room_id))
 
     return RedirectResponse(url="/list", status_code=303)
 
@@ -196,17 +191,14 @@ async def rename_room(request: Request, room_id: int = Form(...), new_name: str
 # ── GET /devices ──────────────────────────────────────────────────
 @router.get("/devices", response_class=HTMLResponse)
 async def devices_page(request: Request):
-    room = current_room(request)
+    room = await current_room(request)
     if room is None:
         return RedirectResponse(url="/", status_code=302)
 
-    conn, curs = get_db()
     try:
-        curs.execute("SELECT COUNT(*) FROM devices WHERE room_id = ?", (room["room_id"],))
-        devices_count = curs.fetchone()[0]
+        devices_count = await fetch_value("SELECT COUNT(*) FROM devices WHERE room_id = ?", (room["room_id"],))
     except sqlite3.OperationalError:
         devices_count = 0
-    conn.close()
 
     if devices_count == 0:
         return templates.TemplateResponse("devices/add.html", {"request": request, "room": room})
@@ -216,13 +208,11 @@ async def devices_page(request: Request):
 
 @router.get("/devices/list/room")
 async def show_devices(request: Request, room_id: int):
-    room = user_can_access_room(request, room_id)
+    room = await user_can_access_room(request, room_id)
     if not room:
         return RedirectResponse(url="/", status_code=303)
 
-    conn, curs = get_db()
-    devices = curs.execute("SELECT * FROM devices WHERE room_id = ?", (room_id,)).fetchall()
-    conn.close()
+    devices = await fetch_all("SELECT * FROM devices WHERE room_id = ?", (room_id,))
 
     return templates.TemplateResponse("devices/list.html", {
         "request": request,
@@ -233,9 +223,7 @@ async def show_devices(request: Request, room_id: int):
 
 @router.get("/devices/list/all", response_class=HTMLResponse)
 async def show_all_devices(request: Request):
-    conn, curs = get_db()
-    devices = curs.execute("SELECT * FROM devices").fetchall()
-    conn.close()
+    devices = await fetch_all("SELECT * FROM devices")
     return templates.TemplateResponse("devices/list_all.html", {"request": request, "devices": devices})
 
 
@@ -246,31 +234,26 @@ async def create_device(
     device_name: str = Form(...),
     device_type: str = Form(...)
 ):
-    room = user_can_access_room(request, room_id)
+    room = await user_can_access_room(request, room_id)
     if not room:
         return HTMLResponse("<h2>No Access.</h2>")
 
-    conn, curs = get_db()
-    curs.execute("""
+    await execute_devices("""
         INSERT INTO devices (room_id, device_name, device_type, device_status)
         VALUES (?, ?, ?, 0)
     """, (room_id, device_name, device_type))
-    conn.commit()
-    conn.close()
 
     return RedirectResponse(f"/devices/list/room?room_id={room_id}", status_code=303)
 
 
 @router.post("/devices/delete", response_class=HTMLResponse)
 async def delete_device(request: Request, device_id: int = Form(...), room_id: int = Form(...)):
-    room = user_can_access_room(request, room_id)
+    room = await user_can_access_room(request, room_id)
     if not room:
         return HTMLResponse("<h2>No Access.</h2>")
 
-    conn, curs = get_db()
-    curs.execute("DELETE FROM devices WHERE device_id = ? AND room_id = ?", (device_id, room["room_id"]))
-    conn.commit()
-    conn.close()
+    await execute_devices("DELETE FROM devices WHERE device_id = ? AND room_id = ?", (device_id, room["room_id"]),
+                          device_ids=[device_id])
 
     return RedirectResponse(f"/devices/list/room?room_id={room_id}", status_code=303)
 
@@ -282,49 +265,48 @@ async def toggle_device_status(
     device_status: int = Form(...),
     room_id: int = Form(...)
 ):
-    room = user_can_access_room(request, room_id)
+    room = await user_can_access_room(request, room_id)
     if not room:
         return HTMLResponse("<h2>No Access.</h2>")
 
-    conn, curs = get_db()
-    curs.execute("""
-        UPDATE devices SET device_status = ?
-        WHERE device_id = ? AND room_id = ?
-    """, (device_status, device_id, room_id))
-    conn.commit()
-    conn.close()
+    def _set_status(conn, curs):
+        curs.execute("""
+            UPDATE devices SET device_status = ?
+            WHERE device_id = ? AND room_id = ?
+        """, (device_status, device_id, room_id))
+        conn.commit()
+        return curs.rowcount
+
+    # über den DeviceStateStore: die Simulation übernimmt den neuen Status
+    updated = await write_devices(_set_status, device_ids=[device_id])
+    if updated:     # Gerät gehört nicht zu room_id → kein Event
+        bus.publish({
+            "type": "device_status",
+            "device_id": device_id,
+            "room_id": room_id,
+            "device_status": int(bool(device_status)),
+        })
 
     return RedirectResponse(f"/devices/list/room?room_id={room_id}", status_code=303)
 
 
-def user_can_access_room(request: Request, room_id: int):
-    user = get_current_user(request)
-    if not user:
+async def user_can_access_room(request: Request, room_id: int):
+    identity = await get_identity(request)
+    if not identity:
         return False
 
-    conn, curs = get_db()
+    # user hat zugriff wenn er der ersteller ist ODER ihm der raum zugewiesen wurde (gecacht in acl.py)
+    if not identity.can_access(room_id):
+        return None
 
-    if user["user_role"] == "admin":
-        room = curs.execute(
-            "SELECT * FROM rooms WHERE room_id = ?", (room_id,)
-        ).fetchone()
-    else:
-        # user hat zugriff wenn er der ersteller ist ODER ihm der raum zugewiesen wurde
-        room = curs.execute("""
-            SELECT * FROM rooms WHERE room_id = ? AND (
-                user_id = ?
-                OR room_id IN (SELECT room_id FROM room_users WHERE user_id = ?)
-            )""",
-            (room_id, user["user_id"], user["user_id"])
-        ).fetchone()
-
-    conn.close()
-    return room
+    return await fetch_one(
+        "SELECT * FROM rooms WHERE room_id = ?", (room_id,)
+    )
 
 
 @router.get("/devices/add", response_class=HTMLResponse)
 async def add_device_page(request: Request, room_id: int):
-    room = user_can_access_room(request, room_id)
+    room = await user_can_access_room(request, room_id)
     if not room:
         return RedirectResponse("/", status_code=303)
 
@@ -334,23 +316,19 @@ async def add_device_page(request: Request, room_id: int):
 # ── POST /assign_user ── admin weist user einem raum zu ──────────
 @router.post("/assign_user", response_class=HTMLResponse)
 async def assign_user_to_room(request: Request, room_id: int = Form(...), user_id: int = Form(...)):
-    current_user = get_current_user(request)
+    current_user = await get_current_user(request)
     if not current_user or current_user["user_role"] != "admin":
         return HTMLResponse("<h2>Keine Berechtigung.</h2>")
 
-    conn, curs = get_db()
-
-    room = curs.execute("SELECT * FROM rooms WHERE room_id = ?", (room_id,)).fetchone()
+    room = await fetch_one("SELECT * FROM rooms WHERE room_id = ?", (room_id,))
     if not room:
-        conn.close()
         return HTMLResponse("<h2>Raum nicht gefunden.</h2>")
 
-    curs.execute(
+    await execute(
         "INSERT OR IGNORE INTO room_users (room_id, user_id) VALUES (?, ?)",
         (room_id, user_id)
     )
-    conn.commit()
-    conn.close()
+    invalidate_rooms(user_id)
 
     return RedirectResponse("/list", status_code=303)
 
@@ -358,13 +336,11 @@ async def assign_user_to_room(request: Request, room_id: int = Form(...), user_i
 # ── POST /unassign_user ── admin entfernt user aus raum ──────────
 @router.post("/unassign_user", response_class=HTMLResponse)
 async def unassign_user_from_room(request: Request, room_id: int = Form(...), user_id: int = Form(...)):
-    current_user = get_current_user(request)
+    current_user = await get_current_user(request)
     if not current_user or current_user["user_role"] != "admin":
         return HTMLResponse("<h2>Keine Berechtigung.</h2>")
 
-    conn, curs = get_db()
-    curs.execute("DELETE FROM room_users WHERE room_id = ? AND user_id = ?", (room_id, user_id))
-    conn.commit()
-    conn.close()
+    await execute("DELETE FROM room_users WHERE room_id = ? AND user_id = ?", (room_id, user_id))
+    invalidate_rooms(user_id)
 
     return RedirectResponse("/list", status_code=303)
\ No newline at end of file
@@ -0,0 +1,154 @@
+# rule_index.py
+# Kompilierte Regeln für die Simulation.
+# Die rules-Tabelle wird einmal geladen und in zwei Indizes gelegt: pro
+# device_id und pro device_type (Fallback = Regel mit höchster rules_id des
+# Typs). Danach liest kein Tick mehr aus der DB, bis rules_api nach
+# create/edit/delete invalidate_rules() aufruft – dann wird beim nächsten
+# Zugriff neu kompiliert.
+#
+#     python rule_index.py [anzahl]   Benchmark SELECT pro Tick vs. Index
+
+import os
+import threading
+
+# Standardwerte, wenn es weder eine Regel fürs Gerät noch für seinen Typ gibt
+DEFAULT_TEMP_HIGH = 22.0
+DEFAULT_TEMP_LOW = 16.0
+DEFAULT_BRIGHTNESS = 10
+
+RULES_SQL = """
+    SELECT rules_id, device_id, device_type,
+           temp_treshold_high, temp_treshold_low, brightness_treshold_high
+    FROM rules ORDER BY rules_id
+"""
+
+_version = 0        # wird bei jeder Regeländerung hochgezählt
+_indexes = {}       # db-Pfad -> RuleIndex
+_lock = threading.Lock()
+
+
+class RuleIndex:
+    def __init__(self, rows=(), version=0):
+        self.version = version
+        self.by_device = {}     # device_id -> (temp_high, temp_low, brightness_high)
+        self.by_type = {}       # device_type -> (temp_high, temp_low, brightness_high)
+        for row in rows:        # aufsteigend nach rules_id: spätere Regeln gewinnen
+            thresholds = (row["temp_treshold_high"], row["temp_treshold_low"], row["brightness_treshold_high"])
+            self.by_device[row["device_id"]] = thresholds
+            self.by_type[row["device_type"]] = thresholds
+
+    @classmethod
+    def load(cls, database, version=0):
+        conn = database.connect()
+        try:
+            rows = conn.execute(RULES_SQL).fetchall()
+        finally:
+            conn.close()
+        return cls(rows, version)
+
+    def __len__(self):
+        return len(self.by_device)
+
+    def evaluate(self, devices, temperature, brightness):
+        """
+        Ein Durchlauf über Heater und Lampen (devices = DeviceRegistry).
+        Gibt nur die nötigen Änderungen zurück: [(device, status, brightness), ...]
+        brightness ist None, wenn sich an der Helligkeit nichts ändert.
+        """
+        changes = []
+
+        default = self.by_type.get("Heater")
+        for device in devices.by_type("Heater"):
+            rule = self.by_device.get(device.device_id, default)
+            temp_high, temp_low = (rule[0], rule[1]) if rule else (DEFAULT_TEMP_HIGH, DEFAULT_TEMP_LOW)
+            if temperature >= temp_high and device.device_status:
+                changes.append((device, False, None))
+            elif temperature <= temp_low and not device.device_status:
+                changes.append((device, True, None))
+
+        default = self.by_type.get("Lamp")
+        for device in devices.by_type("Lamp"):
+            rule = self.by_device.get(device.device_id, default)
+            threshold = rule[2] if rule else DEFAULT_BRIGHTNESS
+            if brightness >= threshold:
+                # set_brightness(0) schaltet aus, daher Status = brightness > 0
+                if device.device_status != (brightness > 0) or getattr(device, "brightness", brightness) != brightness:
+                    changes.append((device, brightness > 0, brightness))
+            elif device.device_status:
+                changes.append((device, False, None))
+
+        return changes
+
+
+def invalidate_rules():
+    # nach jeder Änderung an der rules-Tabelle aufrufen
+    global _version
+    with _lock:
+        _version += 1
+
+
+def get_rule_index(database) -> RuleIndex:
+    key = os.path.abspath(database.db_path)
+    with _lock:
+        index = _indexes.get(key)
+        version = _version
+    if index is not None and index.version == version:
+        return index
+
+    # mit der Version von VOR dem Laden: kommt währenddessen eine Änderung,
+    # passt die Version beim nächsten Zugriff nicht und es wird neu geladen
+    index = RuleIndex.load(database, version)
+    with _lock:
+        _indexes[key] = index
+    return index
+
+
+if __name__ == "__main__":
+    import sys
+    import tempfile
+    import time
+    from database import Database
+    from device import Device
+    from device_registry import DeviceRegistry
+    from migrations import run_migrations
+
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    ticks = 24
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(os.path.join(tmp, "rules.db"))
+        run_migrations(db)
+        conn = db.connect()
+        with conn:
+            conn.executemany("""
+                INSERT INTO rules (device_id, device_type, room_id,
+                                   temp_treshold_high, temp_treshold_low, brightness_treshold_high)
+                VALUES (?, ?, 1, ?, ?, ?)
+            """, [(i, "Heater" if i % 2 else "Lamp", 18 + i % 6, 14 + i % 3, (i % 5) * 10) for i in range(1, n + 1)])
+        conn.close()
+
+        devices = DeviceRegistry(
+            Device(i, f"dev{i}", "Heater" if i % 2 else "Lamp", 0, 1, db) for i in range(1, n + 1)
+        )
+
+        start = time.perf_counter()
+        for _ in range(ticks):
+            conn = db.connect()
+            rows = conn.execute("SELECT * FROM rules").fetchall()
+            conn.close()
+            {row["device_type"]: row for row in rows}
+        per_tick_select = (time.perf_counter() - start) / ticks
+
+        start = time.perf_counter()
+        index = get_rule_index(db)
+        compile_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for hour in range(ticks):
+            changes = index.evaluate(devices, 10.0 + hour % 12, (hour * 10) % 110)
+        per_tick_eval = (time.perf_counter() - start) / ticks
+
+        print(f"{n} rules, {n} devices")
+        print(f"  old: SELECT * FROM rules per tick : {per_tick_select * 1000:8.1f} ms/tick")
+        print(f"  compile index once                : {compile_time * 1000:8.1f} ms")
+        print(f"  evaluate per tick (no DB read)    : {per_tick_eval * 1000:8.1f} ms/tick, last tick {len(changes)} changes")
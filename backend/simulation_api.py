@@ -0,0 +1,58 @@
+from fastapi import APIRouter, Request
+from fastapi.responses import JSONResponse
+from acl import get_identity
+
+# Steuerung der Dauer-Simulation (SimulationScheduler aus main.py, liegt in app.state)
+router = APIRouter(prefix="/simulation", tags=["simulation"])
+
+
+async def _scheduler_or_error(request: Request):
+    identity = await get_identity(request)
+    if not identity:
+        return None, JSONResponse({"error": "not logged in"}, status_code=401)
+    if not identity.is_admin:
+        return None, JSONResponse({"error": "admin only"}, status_code=403)
+    return request.app.state.simulation, None
+
+
+@router.get("/status")
+async def simulation_status(request: Request):
+    """
+    Zustand + Tick-Lag-Metriken des Schedulers
+    """
+    scheduler, error = await _scheduler_or_error(request)
+    if error:
+        return error
+    return scheduler.stats()
+
+
+@router.post("/start")
+async def simulation_start(request: Request):
+    scheduler, error = await _scheduler_or_error(request)
+    if error:
+        return error
+    return {"changed": scheduler.start(), **scheduler.stats()}
+
+
+@router.post("/stop")
+async def simulation_stop(request: Request):
+    scheduler, error = await _scheduler_or_error(request)
+    if error:
+        return error
+    return {"changed": await scheduler.stop(), **scheduler.stats()}
+
+
+@router.post("/pause")
+async def simulation_pause(request: Request):
+    scheduler, error = await _scheduler_or_error(request)
+    if error:
+        return error
+    return {"changed": scheduler.pause(), **scheduler.stats()}
+
+
+@router.post("/resume")
+async def simulation_resume(request: Request):
+    scheduler, error = await _scheduler_or_error(request)
+    if error:
+        return error
+    return {"changed": scheduler.resume(), **scheduler.stats()}
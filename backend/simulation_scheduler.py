@@ -0,0 +1,197 @@
+# simulation_scheduler.py
+# Asyncio-Scheduler für die Dauer-Simulation, gehört zum lifespan der App.
+# Ein Tick = eine simulierte Stunde. Die eigentliche Arbeit (Regeln, DB-Writes)
+# läuft per asyncio.to_thread im Threadpool, dazwischen gibt der Scheduler den
+# Event-Loop frei – Requests werden also nicht blockiert.
+# Die simulierte Uhr läuft mit speed simulierten Sekunden pro echter Sekunde
+# und startet bei "jetzt" (Standard 1.0 = Echtzeit, es entstehen also keine
+# Zeitstempel in der Zukunft). Stunden, die schon vorbei sind (erster Start,
+# Neustart, Pause), werden ohne Wartezeit nachgeholt; danach läuft jeder Tick,
+# sobald seine Stunde erreicht ist. Verspätet er sich dabei, steht das in den
+# Lag-Metriken (stats()).
+
+import asyncio
+import os
+import time
+from hub_logging import get_logger
+
+log = get_logger("simulation_scheduler")
+
+HOUR = 3600.0
+# simulierte Sekunden pro echter Sekunde, z.B. HUB_SIMULATION_SPEED=3600 für
+# eine simulierte Stunde pro Sekunde (Demo – läuft dann der echten Zeit voraus)
+SPEED = float(os.environ.get("HUB_SIMULATION_SPEED", "1"))
+
+STOPPED = "stopped"
+RUNNING = "running"
+PAUSED = "paused"
+CATCHING_UP = "catching_up"
+
+
+class SimulationScheduler:
+    """
+    simulation_factory : callable() -> Objekt mit next_time() (datetime der
+                         nächsten simulierten Stunde), tick() und close();
+                         wird bei jedem Start im Threadpool erzeugt und macht
+                         dort weiter, wo die vorige Simulation aufgehört hat
+    speed              : simulierte Sekunden pro echter Sekunde
+    clock              : Wanduhr in Sekunden seit der Epoche (Tests)
+    """
+
+    def __init__(self, simulation_factory, speed: float = SPEED, clock=time.time):
+        if speed <= 0:
+            raise ValueError("speed must be > 0")
+        self.simulation_factory = simulation_factory
+        self.speed = speed
+        self.interval = HOUR / speed    # echte Sekunden pro Live-Tick
+        self.clock = clock
+        self._task = None
+        self._resume = asyncio.Event()
+        self._simulation = None
+        self._anchor = None             # (Wanduhr, simulierte Uhr) beim Start
+        self._next = None               # simulierte Uhr des nächsten Ticks
+        self._catch_up_until = 0.0      # bis hierhin ohne Wartezeit nachholen
+        self._reset_metrics()
+
+    def _reset_metrics(self):
+        self.ticks = 0
+        self.caught_up = 0
+        self.catch_up_ticks = 0
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+        self._lag_total = 0.0
+        self._lag_samples = 0
+        self.late_ticks = 0         # Ticks mit Lag > interval (Hub kommt nicht hinterher)
+        self.last_tick_seconds = 0.0
+        self.last_timestamp = None
+        self.error = None
+
+    @property
+    def state(self) -> str:
+        if self._task is None or self._task.done():
+            return STOPPED
+        if not self._resume.is_set():
+            return PAUSED
+        if self._next is not None and self._next <= self._catch_up_until:
+            return CATCHING_UP
+        return RUNNING
+
+    def start(self) -> bool:
+        # False, wenn schon ein Task läuft
+        if self._task is not None and not self._task.done():
+            return False
+        self._reset_metrics()
+        self._next = None
+        self._resume.set()
+        self._task = asyncio.create_task(self._run(), name="simulation-scheduler")
+        return True
+
+    async def stop(self) -> bool:
+        task, self._task = self._task, None
+        if task is None:
+            return False
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+        return True
+
+    def pause(self) -> bool:
+        if self.state in (STOPPED, PAUSED):
+            return False
+        self._resume.clear()
+        return True
+
+    def resume(self) -> bool:
+        if self.state != PAUSED:
+            return False
+        self._resume.set()
+        return True
+
+    def simulated_now(self) -> float:
+        wall, simulated = self._anchor
+        return simulated + (self.clock() - wall) * self.speed
+
+    def _due(self, simulated) -> float:
+        # Wanduhr, zu der die simulierte Uhr simulated erreicht
+        wall, start = self._anchor
+        return wall + (simulated - start) / self.speed
+
+    def _catch_up(self):
+        # alle Stunden bis zur aktuellen simulierten Zeit ohne Wartezeit nachholen
+        self._catch_up_until = self.simulated_now()
+        if self._next <= self._catch_up_until:
+            self.catch_up_ticks += int((self._catch_up_until - self._next) // HOUR) + 1
+
+    def stats(self) -> dict:
+        return {
+            "state": self.state,
+            "speed": self.speed,
+            "interval": self.interval,
+            "ticks": self.ticks,
+            "catch_up": f"{self.caught_up}/{self.catch_up_ticks}",
+            "simulated_time": self.last_timestamp,
+            "last_tick_seconds": round(self.last_tick_seconds, 4),
+            "lag_last": round(self.last_lag, 4),
+            "lag_max": round(self.max_lag, 4),
+            "lag_avg": round(self._lag_total / self._lag_samples, 4) if self._lag_samples else 0.0,
+            "late_ticks": self.late_ticks,
+            "error": self.error,
+        }
+
+    async def _tick(self):
+        start = time.perf_counter()
+        entry = await asyncio.to_thread(self._simulation.tick)
+        self.last_tick_seconds = time.perf_counter() - start
+        self.last_timestamp = entry["timestamp"]
+        self._next = self._simulation.next_time().timestamp()
+        self.ticks += 1
+
+    def _record_lag(self, lag):
+        self.last_lag = lag
+        self.max_lag = max(self.max_lag, lag)
+        self._lag_total += lag
+        self._lag_samples += 1
+        if lag > self.interval:
+            self.late_ticks += 1
+
+    async def _run(self):
+        try:
+            self._simulation = await asyncio.to_thread(self.simulation_factory)
+            self._next = self._simulation.next_time().timestamp()
+            # simulierte Uhr startet bei "jetzt" – oder bei der zuletzt simulierten
+            # Stunde, falls eine schnellere Simulation (speed > 1) schon weiter ist
+            now = self.clock()
+            self._anchor = (now, max(now, self._next - HOUR))
+            self._catch_up()
+
+            while True:
+                if not self._resume.is_set():
+                    await self._resume.wait()
+                    self._catch_up()        # Pause zählt nicht als Verspätung
+                    continue
+
+                if self._next <= self._catch_up_until:
+                    # Nachholen: so schnell wie möglich, aber nach jedem Tick den Loop freigeben
+                    await self._tick()
+                    self.caught_up += 1
+                    await asyncio.sleep(0)
+                    continue
+
+                wait = self._due(self._next) - self.clock()
+                if wait > 0:
+                    await asyncio.sleep(wait)
+                    continue
+
+                self._record_lag(-wait)
+                await self._tick()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.error = f"{type(e).__name__}: {e}"
+            log.exception("Scheduler angehalten: %s", self.error)
+        finally:
+            simulation, self._simulation = self._simulation, None
+            if simulation is not None:
+                await asyncio.to_thread(simulation.close)
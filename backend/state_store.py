@@ -0,0 +1,140 @@
+# state_store.py
+# Write-behind Puffer für devices.device_status.
+# Device.turn_on/turn_off schreiben nicht mehr sofort in die DB, sondern
+# markieren das Gerät als "dirty". Ein Hintergrund-Thread schreibt alle
+# offenen Änderungen alle flush_interval Sekunden in EINER Transaktion;
+# mehrfaches Umschalten dazwischen wird zum letzten Stand zusammengefasst.
+#
+# Schreibt jemand anderes in devices (Formular, WebSocket, API), muss das
+# innerhalb von external_change() passieren: der Schreibzugriff läuft nie
+# parallel zu einem Flush, offene Simulationswerte der Geräte werden verworfen
+# (der neuere Wert gewinnt) und version wird hochgezählt. Die Simulation lädt
+# ihre Geräte vor dem nächsten Tick neu, wenn sich version geändert hat
+# (SmartHomeHub.refresh_devices in main.py).
+
+import os
+import threading
+from contextlib import contextmanager
+from hub_logging import get_logger
+
+FLUSH_INTERVAL = 1.0    # Sekunden zwischen zwei Flushes
+
+log = get_logger("state_store")
+
+UPDATE_STATUS_SQL = "UPDATE devices SET device_status = ? WHERE device_id = ?"
+
+
+class DeviceStateStore:
+    def __init__(self, database, flush_interval: float = FLUSH_INTERVAL):
+        self.database = database
+        self.flush_interval = flush_interval
+        self._pending = {}      # device_id -> status, noch nicht geschrieben
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()     # Flush und external_change nie gleichzeitig
+        self.version = 0        # Änderungen an devices außerhalb der Simulation
+        self._stop = threading.Event()
+        self._thread = None
+        self.writes = 0         # geschriebene Zeilen insgesamt
+        self.flushes = 0        # Transaktionen insgesamt
+
+    def mark(self, device_id, status):
+        if device_id is None:
+            return
+        with self._lock:
+            self._pending[device_id] = int(status)
+            if self._thread is None:
+                self._start()
+
+    def pending(self) -> int:
+        return len(self._pending)
+
+    def flush(self) -> int:
+        if not self._pending:
+            return 0
+
+        # Verbindung vor dem Lock holen (wie bei external_change, die Aufrufer
+        # halten ihre Verbindung schon) – sonst können sich beide gegenseitig blockieren
+        conn = self.database.connect()
+        try:
+            with self._write_lock:
+                with self._lock:
+                    pending, self._pending = self._pending, {}
+                if not pending:
+                    return 0
+                try:
+                    with conn:
+                        conn.executemany(UPDATE_STATUS_SQL, [(status, device_id) for device_id, status in pending.items()])
+                except Exception:
+                    # nichts verlieren: zurück in den Puffer, neuere Werte gewinnen
+                    with self._lock:
+                        self._pending = {**pending, **self._pending}
+                    raise
+        finally:
+            conn.close()
+
+        self.writes += len(pending)
+        self.flushes += 1
+        return len(pending)
+
+    @contextmanager
+    def external_change(self, device_ids=()):
+        """
+        Rahmen für Schreibzugriffe auf devices außerhalb der Simulation:
+
+            with get_state_store(db).external_change([device_id]):
+                conn.execute("UPDATE devices SET device_status = ? ...")
+                conn.commit()
+
+        device_ids: Geräte, deren Status geschrieben wird – offene Werte der
+        Simulation für sie werden verworfen. Anlegen/Löschen/Verschieben
+        braucht keine IDs, nur den Rahmen (version).
+        Der Aufrufer muss seine Verbindung schon vorher geholt haben.
+        """
+        with self._write_lock:
+            yield
+            with self._lock:
+                for device_id in device_ids:
+                    self._pending.pop(device_id, None)
+            self.version += 1
+
+    def _start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="device-state-flusher", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.flush()
+            except Exception:
+                log.exception("Flush fehlgeschlagen")
+
+    def close(self):
+        # Flusher beenden und alles Offene schreiben (z.B. beim Shutdown)
+        self._stop.set()
+        thread, self._thread = self._thread, None
+        if thread is not None:
+            thread.join()
+        self.flush()
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_state_store(database):
+    # ein Store pro Datenbankdatei
+    key = os.path.abspath(database.db_path)
+    with _stores_lock:
+        store = _stores.get(key)
+        if store is None:
+            store = DeviceStateStore(database)
+            _stores[key] = store
+        return store
+
+
+def close_all_state_stores():
+    with _stores_lock:
+        stores = list(_stores.values())
+    for store in stores:
+        store.close()
@@ -1,16 +1,27 @@
 from fastapi import APIRouter, Request, Form, Response
-from fastapi.responses import HTMLResponse, RedirectResponse
+from fastapi.responses import HTMLResponse, RedirectResponse, StreamingResponse
 from fastapi.templating import Jinja2Templates
 from pydantic import BaseModel
 from typing import Optional
 from starlette.middleware.sessions import SessionMiddleware
 import sqlite3
 import os
-from users_api import get_db, get_current_user
+import csv
+import io
+import json
+from users_api import get_db
+from async_database import run_db, fetch_one, fetch_all, fetch_value
+from pagination import cached_count, fetch_event_page, page_links, int_param
+from rollups import device_summary, raw_events_since
+from acl import get_identity
+from hub_logging import get_logger
+from event_bus import bus
 from rooms import Room
 from database import Database
 from rooms_devices_api import current_room
 
+log = get_logger("status_api")
+
 router = APIRouter(prefix="/status", tags=["status"])
 
 templates = Jinja2Templates(directory="templates")
@@ -18,6 +29,15 @@ templates = Jinja2Templates(directory="templates")
 db_path = "hub.db"
 db = Database(db_path)
 
+EXPORT_COLUMNS = [
+    "event_id", "device_id", "device_name", "device_type",
+    "device_status", "event_timestamp", "temp_value", "brightness_value",
+]
+EXPORT_BATCH = 1000     # Zeilen pro fetchmany beim Export
+DAILY_SUMMARY_DAYS = 31 # Tage in der Tagesübersicht der Geräte-Historie
+SSE_KEEPALIVE = 15.0    # Sekunden ohne Event, bis ein Kommentar als Keepalive kommt
+SSE_RETRY_MS = 3000     # Wartezeit des Browsers vor einem Reconnect
+
 
 @router.get("/events", response_class=HTMLResponse)
 async def get_status(request: Request):
@@ -26,24 +46,21 @@ async def get_status(request: Request):
     - Wenn keine Events vorhanden sind: Redirect zur Raumliste.
     - Sonst: rendert die Übersichtsvorlage.
     """
-    print(f"[DEBUG] Route /status/events wurde aufgerufen")
-    
-    conn, curs = get_db()
+    def _count_events(conn, curs):
+        return cached_count(curs, "SELECT COUNT(*) FROM device_event_log")
+
     try:
-        curs.execute("SELECT COUNT(*) FROM device_event_log")
-        event_count = curs.fetchone()[0]
-        print(f"[DEBUG] Event count: {event_count}")
+        event_count = await run_db(_count_events)
+        log.debug("Event count: %s", event_count)
     except sqlite3.OperationalError as e:
-        print(f"[DEBUG] SQL Error: {e}")
+        log.warning("SQL Error: %s", e)
         event_count = 0
-    finally:
-        conn.close()
 
     if event_count == 0:
-        print("[DEBUG] Keine Events, Redirect zu /list")
+        log.debug("Keine Events, Redirect zu /list")
         return RedirectResponse("/list", status_code=303)
     
-    print("[DEBUG] Rendering template: status/events/overview.html")
+    log.debug("Rendering template: status/events/overview.html")
     return templates.TemplateResponse(
         "status/events/overview.html", 
         {"request": request}
@@ -53,27 +70,19 @@ async def get_status(request: Request):
 @router.get("/events/all_devices", response_class=HTMLResponse)
 async def get_all_devices(request: Request):
     """
-    Liefert jeweils das letzte Event für jede vorhandene device_id.
+    Liefert jeweils das letzte Event für jede vorhandene device_id
+    (aus device_latest_state, wird per Trigger bei jedem Event aktualisiert).
     """
-    print(f"[DEBUG] Route /status/events/all_devices wurde aufgerufen")
-    
-    conn, curs = get_db()
     try:
-        curs.execute("""
+        events = await fetch_all("""
             SELECT *
-            FROM device_event_log d
-            WHERE event_id = (
-                SELECT MAX(event_id) FROM device_event_log WHERE device_id = d.device_id
-            )
+            FROM device_latest_state
             ORDER BY device_id
         """)
-        events = curs.fetchall()
-        print(f"[DEBUG] {len(events)} Events gefunden")
+        log.debug("%s Events gefunden", len(events))
     except sqlite3.OperationalError as e:
-        print(f"[DEBUG] SQL Error: {e}")
+        log.warning("SQL Error: %s", e)
         events = []
-    finally:
-        conn.close()
 
     if not events:
         return RedirectResponse("/list", status_code=303)
@@ -87,99 +96,86 @@ async def get_all_devices(request: Request):
 @router.get("/events/room", response_class=HTMLResponse)
 async def get_room_events(request: Request):
     """
-    Liefert Events für Geräte, die einem bestimmten Raum zugeordnet sind.
+    Liefert Events für Geräte, die einem bestimmten Raum zugeordnet sind
+    (100 pro Seite, Keyset-Pagination über ?before= / ?after=).
     """
-    print(f"[DEBUG] Route /status/events/room wurde aufgerufen")
-    
-    conn, curs = get_db()
-    room = current_room(request)
+    room = await current_room(request)
     
     if not room:
-        print("[DEBUG] Kein Raum ausgewählt")
+        log.debug("Kein Raum ausgewählt")
         return RedirectResponse("/list", status_code=303)
     
-    print(f"[DEBUG] Raum ID: {room['room_id']}")
-    
+    log.debug("Raum ID: %s", room["room_id"], extra={"room_id": room["room_id"]})
+
+    before = int_param(request.query_params, "before")
+    after = int_param(request.query_params, "after")
+    where = "device_id IN (SELECT device_id FROM devices WHERE room_id = ?)"
+
+    def _load_room_events(conn, curs):
+        page = fetch_event_page(curs, where, (room["room_id"],), before, after, per_page=100)
+        total = cached_count(curs, f"SELECT COUNT(*) FROM device_event_log WHERE {where}", (room["room_id"],))
+        return page, total, raw_events_since(curs)
+
+    raw_since = None
     try:
-        curs.execute(
-            "SELECT * FROM device_event_log "
-            "WHERE device_id IN (SELECT device_id FROM devices WHERE room_id = ?) "
-            "ORDER BY event_id DESC",
-            (room["room_id"],)
-        )
-        events = curs.fetchall()
-        print(f"[DEBUG] {len(events)} Events für Raum {room['room_id']} gefunden")
+        page, total, raw_since = await run_db(_load_room_events)
+        events = page["events"]
+        log.debug("%s Events für Raum %s gefunden", len(events), room["room_id"], extra={"room_id": room["room_id"]})
     except sqlite3.OperationalError as e:
-        print(f"[DEBUG] SQL Error: {e}")
+        log.warning("SQL Error: %s", e)
         events = []
-    finally:
-        conn.close()
 
     if not events:
         return RedirectResponse("/list", status_code=303)
     
     return templates.TemplateResponse(
         "status/events/room.html", 
-        {"request": request, "events": events}
+        {
+            "request": request,
+            "events": events,
+            "links": page_links(request.query_params, "", page),
+            "total": total,
+            "raw_since": raw_since,
+        }
     )
 
+
 @router.get("/events/history", response_class=HTMLResponse)
 async def get_events_history(request: Request):
     """
     Allgemeine Ereignishistorie mit Pagination (30 Events pro Seite, getrennt nach Typ)
-    Neueste Events zuerst (Page 1 = neueste)
+    Neueste Events zuerst. Geblättert wird per Keyset-Cursor
+    (lamp_before / lamp_after, heater_before / heater_after), die Gesamtzahlen
+    sind gecacht – Seite N kostet damit genauso viel wie Seite 1.
     """
-    print(f"[DEBUG] Route /status/events/history wurde aufgerufen")
-    
     # Pagination Parameter
-    lamp_page = int(request.query_params.get('lamp_page', 1))
-    heater_page = int(request.query_params.get('heater_page', 1))
+    params = request.query_params
+    lamp_before, lamp_after = int_param(params, "lamp_before"), int_param(params, "lamp_after")
+    heater_before, heater_after = int_param(params, "heater_before"), int_param(params, "heater_after")
     per_page = 30
     
-    conn, curs = get_db()
-    
+    def _load_history(conn, curs):
+        # Gesamtzahlen (gecacht, nicht bei jedem Aufruf neu gezählt)
+        lamp_count = cached_count(curs, "SELECT COUNT(*) FROM device_event_log WHERE device_type = 'Lamp'")
+        heater_count = cached_count(curs, "SELECT COUNT(*) FROM device_event_log WHERE device_type = 'Heater'")
+
+        # Seiten per Cursor (neueste zuerst!)
+        lamp = fetch_event_page(curs, "device_type = 'Lamp'", (), lamp_before, lamp_after, per_page)
+        heater = fetch_event_page(curs, "device_type = 'Heater'", (), heater_before, heater_after, per_page)
+        return lamp, heater, lamp_count, heater_count, raw_events_since(curs)
+
+    raw_since = None
     try:
-        # Lampen Events zählen
-        curs.execute("SELECT COUNT(*) as count FROM device_event_log WHERE device_type = 'Lamp'")
-        lamp_count = curs.fetchone()[0]
-        lamp_total_pages = max(1, (lamp_count + per_page - 1) // per_page)
-        
-        # Heater Events zählen
-        curs.execute("SELECT COUNT(*) as count FROM device_event_log WHERE device_type = 'Heater'")
-        heater_count = curs.fetchone()[0]
-        heater_total_pages = max(1, (heater_count + per_page - 1) // per_page)
-        
-        # Lampen Events mit Pagination (neueste zuerst!)
-        lamp_offset = (lamp_page - 1) * per_page
-        curs.execute("""
-            SELECT * FROM device_event_log 
-            WHERE device_type = 'Lamp'
-            ORDER BY event_id DESC
-            LIMIT ? OFFSET ?
-        """, (per_page, lamp_offset))
-        lamp_events = curs.fetchall()
-        
-        # Heater Events mit Pagination (neueste zuerst!)
-        heater_offset = (heater_page - 1) * per_page
-        curs.execute("""
-            SELECT * FROM device_event_log 
-            WHERE device_type = 'Heater'
-            ORDER BY event_id DESC
-            LIMIT ? OFFSET ?
-        """, (per_page, heater_offset))
-        heater_events = curs.fetchall()
+        lamp, heater, lamp_count, heater_count, raw_since = await run_db(_load_history)
+        lamp_events, heater_events = lamp["events"], heater["events"]
         
-        print(f"[DEBUG] Lampen: {len(lamp_events)} Events (Page {lamp_page}/{lamp_total_pages})")
-        print(f"[DEBUG] Heater: {len(heater_events)} Events (Page {heater_page}/{heater_total_pages})")
+        log.debug("Lampen: %s Events (von %s)", len(lamp_events), lamp_count)
+        log.debug("Heater: %s Events (von %s)", len(heater_events), heater_count)
         
     except sqlite3.OperationalError as e:
-        print(f"[DEBUG] SQL Error: {e}")
+        log.warning("SQL Error: %s", e)
         lamp_events = []
         heater_events = []
-        lamp_total_pages = 1
-        heater_total_pages = 1
-    finally:
-        conn.close()
 
     if not lamp_events and not heater_events:
         return RedirectResponse("/list", status_code=303)
@@ -191,26 +187,27 @@ async def get_events_history(request: Request):
             "events": True,
             "lamp_events": lamp_events,
             "heater_events": heater_events,
-            "lamp_page": lamp_page,
-            "heater_page": heater_page,
-            "lamp_total_pages": lamp_total_pages,
-            "heater_total_pages": heater_total_pages
+            "lamp_links": page_links(params, "lamp_", lamp),
+            "heater_links": page_links(params, "heater_", heater),
+            "lamp_count": lamp_count,
+            "heater_count": heater_count,
+            "raw_since": raw_since,
         }
     )
 
 
 @router.get("/events/device/history/{device_id}", response_class=HTMLResponse)
 async def get_device_history(request: Request, device_id: int):
+    """
+    Events eines Geräts, 100 pro Seite (Keyset-Pagination über ?before= / ?after=).
+    """
+    before = int_param(request.query_params, "before")
+    after = int_param(request.query_params, "after")
 
-    conn, curs = get_db()
-
-    try:
+    def _load_device_history(conn, curs):
         # Events holen
-        curs.execute(
-            "SELECT * FROM device_event_log WHERE device_id = ? ORDER BY event_id DESC",
-            (device_id,)
-        )
-        events = curs.fetchall()
+        page = fetch_event_page(curs, "device_id = ?", (device_id,), before, after, per_page=100)
+        total = cached_count(curs, "SELECT COUNT(*) FROM device_event_log WHERE device_id = ?", (device_id,))
 
         # Gerät holen
         curs.execute(
@@ -219,14 +216,21 @@ async def get_device_history(request: Request, device_id: int):
         )
         device = curs.fetchone()
 
+        # Tageswerte (alte Tage aus device_event_daily, neue aus dem Log)
+        days = device_summary(curs, device_id, "day", limit=DAILY_SUMMARY_DAYS)
+        return page, total, device, days
+
+    try:
+        page, total, device, days = await run_db(_load_device_history)
+        events = page["events"]
+
     except sqlite3.OperationalError as e:
-        print(f"[DEBUG] SQL Error: {e}")
+        log.warning("SQL Error: %s", e)
         events = []
         device = None
-    finally:
-        conn.close()
+        days = []
 
-    if not events:
+    if not events and not days:
         return RedirectResponse("/list", status_code=303)
 
     return templates.TemplateResponse(
@@ -236,5 +240,206 @@ async def get_device_history(request: Request, device_id: int):
             "events": events,
             "device_id": device_id,
             "device": device,
+            "links": page_links(request.query_params, "", page),
+            "total": total,
+            "days": days,
         }
-    )
\ No newline at end of file
+    )
+
+
+@router.get("/events/device/{device_id}/summary")
+async def get_device_summary(
+    request: Request,
+    device_id: int,
+    granularity: str = "day",
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+):
+    """
+    Stunden- oder Tageswerte eines Geräts als JSON (on_ratio, Temperatur
+    min/max/avg, Helligkeit avg). Alte Zeiträume kommen aus den Rollups,
+    neue werden aus dem rohen Log berechnet.
+    """
+    identity = await get_identity(request)
+    if not identity:
+        return RedirectResponse("/", status_code=303)
+
+    device = await fetch_one("SELECT room_id FROM devices WHERE device_id = ?", (device_id,))
+    if not device or not identity.can_access(device["room_id"]):
+        return HTMLResponse("<h2>No Access.</h2>", status_code=403)
+
+    if granularity not in ("hour", "day"):
+        return HTMLResponse("<h2>granularity muss hour oder day sein</h2>", status_code=400)
+
+    def _load_summary(conn, curs):
+        return device_summary(curs, device_id, granularity, since, until)
+
+    return {"device_id": device_id, "granularity": granularity, "periods": await run_db(_load_summary)}
+
+
+
+@router.get("/stream")
+async def stream_device_events(
+    request: Request,
+    room_id: Optional[int] = None,
+    device_id: Optional[int] = None,
+):
+    """
+    Live-Feed als Server-Sent Events: Statusänderungen ("device_status") und
+    neu geschriebene Log-Einträge ("event"), optional gefiltert nach Raum oder
+    Gerät. Ohne Filter sehen Admins alles, andere User nur ihre Räume.
+    Kommt ein Client nicht hinterher, werden die ältesten Events verworfen und
+    als "dropped" gemeldet – dann die Seite einmal neu laden.
+    """
+    identity = await get_identity(request)
+    if not identity:
+        return HTMLResponse("<h2>Not logged in.</h2>", status_code=401)
+
+    if device_id is not None:
+        device = await fetch_one("SELECT room_id FROM devices WHERE device_id = ?", (device_id,))
+        if not device or not identity.can_access(device["room_id"]):
+            return HTMLResponse("<h2>No Access.</h2>", status_code=403)
+        device_ids, room_ids = frozenset([device_id]), None
+    elif room_id is not None or not identity.is_admin:
+        room_ids = frozenset([room_id]) if room_id is not None else identity.room_ids
+        if not all(identity.can_access(r) for r in room_ids):
+            return HTMLResponse("<h2>No Access.</h2>", status_code=403)
+        # Log-Events kennen keinen Raum, daher zusätzlich die Geräte der Räume
+        rows = await fetch_all(
+            f"SELECT device_id FROM devices WHERE room_id IN ({','.join('?' * len(room_ids))})",
+            tuple(room_ids)
+        ) if room_ids else []
+        device_ids = frozenset(row["device_id"] for row in rows)
+    else:
+        device_ids = room_ids = None
+
+    subscription = bus.subscribe(device_ids, room_ids)
+
+    async def _events():
+        try:
+            yield f"retry: {SSE_RETRY_MS}\n\n"
+            while not await request.is_disconnected():
+                events = await subscription.get(SSE_KEEPALIVE)
+                if not events:
+                    yield ": keepalive\n\n"
+                    continue
+                dropped = subscription.take_dropped()
+                if dropped:
+                    yield f"event: dropped\ndata: {json.dumps({'dropped': dropped})}\n\n"
+                yield "".join(
+                    f"event: {event['type']}\ndata: {json.dumps(event)}\n\n" for event in events
+                )
+        finally:
+            subscription.close()
+
+    return StreamingResponse(
+        _events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+def _stream_events(where, params, fmt):
+    """
+    Generator für den Export: liest das Log mit fetchmany in Blöcken,
+    es liegen also nie mehr als EXPORT_BATCH Zeilen gleichzeitig im Speicher.
+    Die Verbindung bleibt bis zum Ende des Streams (oder Abbruch) ausgecheckt.
+    """
+    conn, curs = get_db()
+    try:
+        curs.execute(
+            f"SELECT {', '.join(EXPORT_COLUMNS)} FROM device_event_log "
+            f"WHERE {where} ORDER BY event_id",
+            params
+        )
+        if fmt == "csv":
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            writer.writerow(EXPORT_COLUMNS)
+            yield buffer.getvalue()
+
+        while True:
+            rows = curs.fetchmany(EXPORT_BATCH)
+            if not rows:
+                break
+            if fmt == "csv":
+                buffer = io.StringIO()
+                csv.writer(buffer).writerows(tuple(row) for row in rows)
+                yield buffer.getvalue()
+            else:
+                yield "".join(json.dumps(dict(row)) + "\n" for row in rows)
+    finally:
+        conn.close()
+
+
+@router.get("/export")
+async def export_events(
+    request: Request,
+    format: str = "ndjson",
+    device_id: Optional[int] = None,
+    device_type: Optional[str] = None,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    after_id: Optional[int] = None,
+):
+    """
+    Streamt device_event_log als NDJSON oder CSV (älteste Events zuerst).
+    Filter: device_id, device_type, since/until (event_timestamp, z.B.
+    "2026-02-01 00:00:00") und after_id für inkrementelle Exporte
+    (nur Events mit event_id > after_id). Nicht-Admins bekommen nur die
+    Geräte ihrer Räume (wie /api/v1/events).
+    Exportiert werden nur rohe Events: ein Zeitraum, der vor der Grenze zur
+    Verdichtung beginnt (rollups.raw_events_since), gibt 410 – dafür gibt es
+    /status/events/device/{id}/summary.
+    """
+    identity = await get_identity(request)
+    if not identity:
+        return RedirectResponse("/", status_code=303)
+
+    if format not in ("ndjson", "csv"):
+        return HTMLResponse("<h2>format muss ndjson oder csv sein</h2>", status_code=400)
+
+    def _raw_since(conn, curs):
+        return raw_events_since(curs)
+
+    raw_since = await run_db(_raw_since)
+    if raw_since and ((since is not None and since < raw_since) or (until is not None and until <= raw_since)):
+        return HTMLResponse(
+            f"<h2>Events vor {raw_since} sind verdichtet – Stunden-/Tageswerte unter "
+            f"/status/events/device/&lt;id&gt;/summary</h2>",
+            status_code=410
+        )
+
+    conditions, params = ["1 = 1"], []
+    if not identity.is_admin:
+        room_ids = tuple(identity.room_ids)
+        if room_ids:
+            conditions.append(
+                f"device_id IN (SELECT device_id FROM devices WHERE room_id IN ({', '.join('?' * len(room_ids))}))"
+            )
+            params.extend(room_ids)
+        else:
+            conditions.append("0 = 1")
+    if device_id is not None:
+        conditions.append("device_id = ?")
+        params.append(device_id)
+    if device_type:
+        conditions.append("device_type = ?")
+        params.append(device_type)
+    if since:
+        conditions.append("event_timestamp >= ?")
+        params.append(since)
+    if until:
+        conditions.append("event_timestamp < ?")
+        params.append(until)
+    if after_id is not None:
+        conditions.append("event_id > ?")
+        params.append(after_id)
+
+    media_type = "text/csv" if format == "csv" else "application/x-ndjson"
+    filename = f"device_event_log.{'csv' if format == 'csv' else 'ndjson'}"
+    return StreamingResponse(
+        _stream_events(" AND ".join(conditions), tuple(params), format),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
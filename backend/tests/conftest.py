@@ -0,0 +1,117 @@
+# conftest.py
+# Gemeinsame Fixtures: eine migrierte hub.db in einem Temp-Verzeichnis, die
+# App als TestClient (ohne lifespan → keine Dauer-Simulation) und ein
+# Mitschnitt aller SQL-Statements, die ein Request auslöst.
+#
+#     cd backend && python -m pytest tests
+
+import os
+import sys
+
+import pytest
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND)
+
+import acl                      # noqa: E402
+import database                 # noqa: E402
+import metrics                  # noqa: E402
+import pagination               # noqa: E402
+from rule_index import invalidate_rules    # noqa: E402
+
+PASSWORD = "Passwort1!"
+
+
+def seed(conn, rooms=3, devices_per_room=2, events_per_device=40):
+    """
+    admin + user, rooms Räume (der erste gehört user, der zweite ist ihm
+    zugewiesen), je Raum eine Lampe und einen Heater plus Regeln und Events.
+    """
+    curs = conn.cursor()
+    curs.execute("INSERT INTO users (user_name, user_password, user_role) VALUES ('admin', ?, 'admin')", (PASSWORD,))
+    curs.execute("INSERT INTO users (user_name, user_password, user_role) VALUES ('user', ?, 'user')", (PASSWORD,))
+    for r in range(1, rooms + 1):
+        owner = 2 if r == 1 else 1
+        curs.execute("INSERT INTO rooms (room_name, user_id) VALUES (?, ?)", (f"Raum {r}", owner))
+        room_id = curs.lastrowid
+        if r == 2:
+            curs.execute("INSERT INTO room_users (room_id, user_id) VALUES (?, 2)", (room_id,))
+        for d in range(devices_per_room):
+            device_type = "Lamp" if d % 2 == 0 else "Heater"
+            curs.execute(
+                "INSERT INTO devices (room_id, device_name, device_type, device_status) VALUES (?, ?, ?, 0)",
+                (room_id, f"{device_type} {r}.{d}", device_type)
+            )
+            device_id = curs.lastrowid
+            curs.execute(
+                "INSERT INTO rules (device_id, device_name, device_type, room_id, room_name, "
+                "temp_treshold_high, temp_treshold_low, brightness_treshold_high) VALUES (?, ?, ?, ?, ?, 22, 16, 10)",
+                (device_id, f"{device_type} {r}.{d}", device_type, room_id, f"Raum {r}")
+            )
+            curs.executemany(
+                "INSERT INTO device_event_log (device_id, device_name, device_type, device_status, "
+                "event_timestamp, temp_value, brightness_value) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [(device_id, f"{device_type} {r}.{d}", device_type, i % 2,
+                  f"2026-01-{1 + i // 24:02d} {i % 24:02d}:00:00",
+                  20 if device_type == "Heater" else None, 50 if device_type == "Lamp" else None)
+                 for i in range(events_per_device)]
+            )
+    conn.commit()
+
+
+@pytest.fixture
+def hub_dir(tmp_path, monkeypatch):
+    # die Module öffnen "hub.db", "templates" und "static" relativ zum Arbeitsverzeichnis
+    for name in ("templates", "static"):
+        os.symlink(os.path.join(BACKEND, name), tmp_path / name)
+    monkeypatch.chdir(tmp_path)
+
+    from migrations import run_migrations
+    db = database.Database("hub.db")
+    run_migrations(db)
+
+    # prozessweite Caches gehören zur vorherigen Test-DB
+    acl.invalidate_rooms()
+    pagination._count_cache.clear()
+    invalidate_rules()
+    yield db
+    database.close_all_pools()
+
+
+@pytest.fixture
+def db(hub_dir):
+    conn = hub_dir.connect()
+    try:
+        seed(conn)
+    finally:
+        conn.close()
+    return hub_dir
+
+
+@pytest.fixture
+def client(hub_dir):
+    from fastapi.testclient import TestClient
+    import main
+    return TestClient(main.app)     # ohne "with": lifespan (Simulation, Verdichtung) läuft nicht
+
+
+def login(client, user_name):
+    response = client.post("/login", data={"user_name": user_name, "user_password": PASSWORD}, follow_redirects=False)
+    assert response.status_code == 303
+    return client
+
+
+@pytest.fixture
+def statements(monkeypatch):
+    """
+    Liste aller SQL-Statements (Parameter eingesetzt), die Requests ab jetzt
+    ausführen. Hängt sich in denselben Trace-Callback wie /metrics.
+    """
+    seen = []
+
+    def trace(statement):
+        seen.append(statement)
+        metrics.trace_statement(statement)
+
+    monkeypatch.setattr(database, "trace_statement", trace)
+    return seen
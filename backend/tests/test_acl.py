@@ -0,0 +1,24 @@
+# test_acl.py
+# Raum-Cache in acl.py: ein invalidate_rooms() während der Abfrage darf
+# nicht von deren (veraltetem) Ergebnis überschrieben werden.
+
+import asyncio
+
+import acl
+
+
+def test_invalidate_during_fetch_is_not_overwritten(db, monkeypatch):
+    fetch_all = acl.fetch_all
+
+    async def slow_fetch_all(query, params=()):
+        rows = await fetch_all(query, params)
+        acl.invalidate_rooms(2)     # z.B. unassign, während die alte Antwort unterwegs ist
+        return rows
+
+    monkeypatch.setattr(acl, "fetch_all", slow_fetch_all)
+    assert asyncio.run(acl.accessible_room_ids(2)) == {1, 2}
+    assert 2 not in acl._room_cache
+
+    monkeypatch.setattr(acl, "fetch_all", fetch_all)
+    asyncio.run(acl.accessible_room_ids(2))
+    assert 2 in acl._room_cache
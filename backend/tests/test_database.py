@@ -0,0 +1,20 @@
+# test_database.py
+# Ein Pool pro Datei: eine abweichende pool_size für einen schon offenen
+# Pool fällt auf, statt stillschweigend ignoriert zu werden.
+
+import pytest
+
+from database import POOL_SIZE, Database
+
+
+def test_pool_size_mismatch_raises(hub_dir):
+    assert Database("hub.db").pool.pool_size == POOL_SIZE
+    assert Database("hub.db", pool_size=POOL_SIZE).pool is hub_dir.pool
+
+    with pytest.raises(ValueError):
+        Database("hub.db", pool_size=2)
+
+
+def test_pool_size_applies_to_new_pool(hub_dir):
+    assert Database("other.db", pool_size=2).pool.pool_size == 2
+    assert Database("other.db").pool.pool_size == 2
@@ -0,0 +1,31 @@
+# test_device_state.py
+# DeviceStateTable und DeviceRegistry des Hubs müssen dieselben Geräte
+# kennen – auch nach SmartHomeHub.delete_device.
+
+from device_state import DeviceStateTable
+
+
+def test_remove_moves_last_row():
+    table = DeviceStateTable()
+    for device_id, status in ((1, True), (2, False), (3, True)):
+        table.add(device_id, status, brightness=device_id * 10)
+
+    assert table.remove(1)
+    assert not table.remove(1)
+    assert len(table) == 2
+    assert table.row(3) == 0 and table.status[0] == 1 and table.brightness[0] == 30
+    assert table.row(2) == 1 and table.status[1] == 0
+
+
+def test_hub_delete_device_updates_state_table(db):
+    from main import SmartHomeHub
+
+    hub = SmartHomeHub(db)
+    hub.load_devices()
+    hub.delete_device(1)
+
+    assert hub.get_device(1) is None
+    assert hub.state.row(1) is None
+    assert sorted(hub.state.ids) == sorted(device.device_id for device in hub.devices)
+    for device in hub.devices:
+        assert hub.state.ids[hub.state.row(device.device_id)] == device.device_id
@@ -0,0 +1,30 @@
+# test_emulator.py
+# Mehrtägige Simulation: Tagesauswertung und Protokoll pro Tag.
+
+from datetime import date
+
+import emulator
+from emulator import FAST_FORWARD, DayEmulator
+
+
+def test_daily_review_covers_only_that_day(monkeypatch):
+    reviewed = []
+    monkeypatch.setattr(DayEmulator, "_print_summary", lambda self, entries: reviewed.append(len(entries)))
+
+    days = []
+    sim = DayEmulator(None, speed=FAST_FORWARD, start_date=date(2026, 1, 1))
+    sim.simulate_days(3, on_day_end=lambda day, entries: days.append((day, len(entries))))
+
+    assert reviewed == [24, 24, 24]
+    assert [n for _, n in days] == [24, 24, 24]
+    assert sim.get_log() == []          # nach on_day_end verworfen
+
+
+def test_keep_log(monkeypatch):
+    # Tagesauswertung wirklich rechnen (Stunden-Index bezieht sich auf den Tag)
+    monkeypatch.setattr(emulator.log, "isEnabledFor", lambda level: True)
+    sim = DayEmulator(None, speed=FAST_FORWARD, start_date=date(2026, 1, 1))
+    sim.simulate_days(2, keep_log=True)
+
+    assert len(sim.get_log()) == 48
+    assert sim.get_log()[24]["date"] == "2026-01-02"
@@ -0,0 +1,29 @@
+# test_migrations.py
+# hub.sql ist das Referenzschema: eine DB daraus muss dieselben Tabellen,
+# Indizes und Trigger haben wie eine per run_migrations migrierte.
+
+import os
+import sqlite3
+
+from conftest import BACKEND
+
+
+def schema(conn):
+    return {
+        (row[0], row[1]) for row in conn.execute(
+            "SELECT type, name FROM sqlite_master "
+            "WHERE name NOT LIKE 'sqlite_%' AND name != 'schema_migrations'"
+        )
+    }
+
+
+def test_hub_sql_matches_migrations(hub_dir):
+    migrated = sqlite3.connect("hub.db")
+    reference = sqlite3.connect(":memory:")
+    try:
+        with open(os.path.join(BACKEND, "hub.sql"), encoding="utf-8") as f:
+            reference.executescript(f.read())
+        assert schema(reference) == schema(migrated)
+    finally:
+        migrated.close()
+        reference.close()
@@ -0,0 +1,48 @@
+# test_rollups.py
+# Verdichtung alter Events: die Grenze roh/verdichtet ist sichtbar
+# (Hinweis auf den Event-Seiten, 410 beim Export davor), die Geräte-
+# Zusammenfassung liefert beide Teile.
+# seed: Events vom 2026-01-01 00:00 bis 2026-01-02 15:00.
+
+from datetime import date
+
+import pytest
+
+from conftest import login
+from rollups import compact_events
+
+
+def compact_first_day(db, **kwargs):
+    return compact_events(db, raw_days=1, today=date(2026, 1, 3), **kwargs)
+
+
+def test_export_refuses_compacted_ranges(db, client):
+    assert compact_first_day(db)["days"] == 1
+    login(client, "admin")
+
+    assert client.get("/status/export?since=2026-01-01").status_code == 410
+    assert client.get("/status/export?until=2026-01-02").status_code == 410
+    assert client.get("/status/export?since=2026-01-02").status_code == 200
+    assert client.get("/status/export").status_code == 200
+
+
+def test_event_pages_show_compaction_boundary(db, client):
+    login(client, "admin")
+    assert "compacted" not in client.get("/status/events/history").text
+
+    compact_first_day(db)
+    assert "Events before 2026-01-02 are compacted" in client.get("/status/events/history").text
+
+
+def test_summary_combines_rollups_and_raw_events(db, client):
+    compact_first_day(db)
+    login(client, "admin")
+
+    periods = client.get("/status/events/device/1/summary").json()["periods"]
+    assert [(p["period"], p["events"]) for p in periods] == [("2026-01-02", 16), ("2026-01-01", 24)]
+
+
+def test_failed_attach_is_not_hidden_by_detach(db, tmp_path):
+    with pytest.raises(Exception) as error:
+        compact_first_day(db, archive_path=str(tmp_path))    # Verzeichnis, keine DB-Datei
+    assert "archive" not in str(error.value)
@@ -0,0 +1,49 @@
+# test_room_list.py
+# /list lädt die zugewiesenen User aller Räume mit einer Query (batch_load)
+# statt einer pro Raum. Gezählt wird über den Server-Timing-Header von
+# TimingMiddleware: die Zahl der Statements darf nicht mit den Räumen wachsen.
+
+import re
+
+from conftest import login
+
+_STATEMENTS = re.compile(r'desc="(\d+) statements"')
+
+
+def add_rooms(db, count):
+    # Räume mit je einem zugewiesenen User (user_id 2 aus seed)
+    conn = db.connect()
+    try:
+        start = conn.execute("SELECT COALESCE(MAX(room_id), 0) FROM rooms").fetchone()[0]
+        for room_id in range(start + 1, start + count + 1):
+            conn.execute("INSERT INTO rooms (room_id, room_name, user_id) VALUES (?, ?, 1)", (room_id, f"Extra {room_id}"))
+            conn.execute("INSERT INTO room_users (room_id, user_id) VALUES (?, 2)", (room_id,))
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def list_statements(client):
+    response = client.get("/list")
+    assert response.status_code == 200
+    return int(_STATEMENTS.search(response.headers["server-timing"]).group(1))
+
+
+def test_room_list_statement_count_is_constant(db, client):
+    login(client, "admin")
+
+    counts = {}
+    rooms = 3                           # aus seed()
+    for extra in (2, 45, 250):
+        add_rooms(db, extra)
+        rooms += extra
+        counts[rooms] = list_statements(client)
+
+    assert len(set(counts.values())) == 1, counts
+
+
+def test_room_list_for_regular_user(db, client):
+    login(client, "user")
+    few = list_statements(client)
+    add_rooms(db, 100)                  # alle user_id 2 zugewiesen
+    assert list_statements(client) == few
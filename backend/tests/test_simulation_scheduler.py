@@ -0,0 +1,87 @@
+# test_simulation_scheduler.py
+# Dauer-Simulation über den Scheduler: holt verpasste Stunden bis "jetzt"
+# nach, läuft nie in die Zukunft und macht nach stop/start dort weiter, wo
+# sie aufgehört hat, statt den Backfill zu wiederholen.
+
+import asyncio
+import sqlite3
+from datetime import datetime
+
+import pytest
+
+from main import LiveSimulation, last_simulated_hour
+from simulation_scheduler import SimulationScheduler, RUNNING
+
+
+async def run_until_caught_up(scheduler):
+    scheduler.start()
+    while scheduler._next is None or scheduler.state != RUNNING:
+        assert scheduler.error is None
+        await asyncio.sleep(0.01)
+    stats = scheduler.stats()
+    await scheduler.stop()
+    return stats
+
+
+def test_restart_resumes_after_last_simulated_hour(db):
+    scheduler = SimulationScheduler(lambda: LiveSimulation.resume(db, backfill_days=1))
+
+    async def run():
+        return await run_until_caught_up(scheduler), await run_until_caught_up(scheduler)
+
+    first, second = asyncio.run(run())
+    now = datetime.now()
+
+    caught_up, catch_up = map(int, first["catch_up"].split("/"))
+    assert caught_up == catch_up >= 25      # gestern 00:00 bis zur aktuellen Stunde
+    assert second["catch_up"] in ("0/0", "1/1")     # höchstens eine inzwischen angebrochene Stunde
+    assert last_simulated_hour(db) <= now   # Echtzeit: keine Zeitstempel in der Zukunft
+
+    conn = db.connect()
+    try:
+        duplicates = conn.execute("""
+            SELECT device_id, event_timestamp FROM device_event_log
+            GROUP BY device_id, event_timestamp HAVING COUNT(*) > 1
+        """).fetchall()
+    finally:
+        conn.close()
+    assert duplicates == []
+
+
+def test_speed_sets_tick_interval():
+    scheduler = SimulationScheduler(lambda: None, speed=3600)
+    assert scheduler.interval == 1.0
+    assert SimulationScheduler(lambda: None).interval == 3600.0
+
+
+def event_count(db):
+    conn = db.connect()
+    try:
+        return conn.execute("SELECT COUNT(*) FROM device_event_log").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def test_tick_writes_events_and_state_in_one_transaction(db, monkeypatch):
+    import main
+
+    simulation = LiveSimulation(db)
+    before = event_count(db)
+    monkeypatch.setattr(main, "SAVE_STATE_SQL", "INSERT INTO no_such_table VALUES (?)")
+    with pytest.raises(sqlite3.OperationalError):
+        simulation.tick()
+    assert event_count(db) == before        # Stand nicht gespeichert → auch keine Events
+    assert last_simulated_hour(db) is None
+
+    monkeypatch.undo()
+    entry = simulation.tick()               # holt die zurückgelegten Events mit nach
+    simulation.close()
+    assert event_count(db) == before + 2 * 6
+    assert last_simulated_hour(db) == datetime.strptime(entry["timestamp"], "%Y-%m-%d %H:%M:%S")
+
+
+def test_resume_ignores_user_events(db):
+    from device import Device
+
+    Device(None, "Neu", "Lamp", True, 1, db).save_to_db()   # Event mit UTC-Zeitstempel
+    assert last_simulated_hour(db) is None
@@ -0,0 +1,166 @@
+# test_state_store.py
+# Statusänderungen von außen (Formular, WebSocket, API) gegen die
+# write-behind Writes der Simulation.
+
+from state_store import get_state_store
+
+
+def device_status(db, device_id):
+    conn = db.connect()
+    try:
+        return conn.execute("SELECT device_status FROM devices WHERE device_id = ?", (device_id,)).fetchone()[0]
+    finally:
+        conn.close()
+
+
+def set_status(db, device_id, status):
+    # so wie async_database.write_devices: Verbindung holen, dann external_change
+    conn = db.connect()
+    try:
+        with get_state_store(db).external_change([device_id]):
+            conn.execute("UPDATE devices SET device_status = ? WHERE device_id = ?", (status, device_id))
+            conn.commit()
+    finally:
+        conn.close()
+
+
+def test_pending_simulation_write_does_not_overwrite_user_change(db):
+    store = get_state_store(db)
+    store.mark(1, True)             # Simulation schaltet ein, noch nicht geschrieben
+    set_status(db, 1, 0)            # Nutzer schaltet danach aus
+    store.flush()
+
+    assert device_status(db, 1) == 0
+    store.close()
+
+
+def test_hub_picks_up_user_change_before_next_tick(db):
+    from main import LiveSimulation
+
+    simulation = LiveSimulation(db)
+    simulation.tick()
+    lamp = simulation.hub.get_device(1)
+    status = lamp.device_status
+
+    set_status(db, 1, int(not status))
+    simulation.tick()               # 01:00, gleiche Helligkeit wie 00:00 → Regel schaltet wieder zurück
+
+    simulation.close()
+    assert device_status(db, 1) == int(simulation.hub.get_device(1).device_status)
+    assert simulation.hub.get_device(1) is not lamp     # neu geladen
+
+
+def test_version_counts_external_changes(db):
+    store = get_state_store(db)
+    before = store.version
+    set_status(db, 2, 1)
+    assert store.version == before + 1
+
+
+def test_simulation_picks_up_created_and_deleted_devices(db, client):
+    from conftest import login
+    from main import LiveSimulation
+
+    simulation = LiveSimulation(db)
+    simulation.tick()
+    login(client, "admin")
+
+    response = client.post("/api/v1/devices", json=[{"room_id": 1, "device_name": "Neue Lampe", "device_type": "Lamp"}])
+    new_id = response.json()["ids"][0]
+    simulation.tick()
+    assert simulation.hub.get_device(new_id) is not None
+
+    client.request("DELETE", "/api/v1/devices", json={"ids": [new_id, 1]})
+    simulation.tick()
+    simulation.close()
+    assert simulation.hub.get_device(new_id) is None
+    assert simulation.hub.get_device(1) is None
+
+
+def test_status_form_publishes_only_when_a_row_changed(db, client, monkeypatch):
+    from conftest import login
+    from event_bus import bus
+
+    published = []
+    monkeypatch.setattr(bus, "publish", published.append)
+    login(client, "admin")
+
+    client.post("/devices/status", data={"device_id": 1, "device_status": 1, "room_id": 2}, follow_redirects=False)
+    assert published == []          # Gerät 1 liegt in Raum 1
+    assert device_status(db, 1) == 0
+
+    client.post("/devices/status", data={"device_id": 1, "device_status": 1, "room_id": 1}, follow_redirects=False)
+    assert [e["device_id"] for e in published] == [1]
+
+
+def test_websocket_commands_go_through_the_store(db, client):
+    from conftest import login
+
+    store = get_state_store(db)
+    store.mark(1, True)             # Simulation schaltet ein, noch nicht geschrieben
+    before = store.version
+    login(client, "admin")
+
+    with client.websocket_connect("/devices/ws") as ws:
+        ws.send_json({"id": 1, "commands": [{"device_id": 1, "action": "off"}]})
+        assert ws.receive_json()["applied"] == 1
+    store.flush()
+
+    assert device_status(db, 1) == 0
+    assert store.version == before + 1
+    store.close()
+
+
+def test_api_patch_checks_target_room_and_reloads_simulation(db, client):
+    from conftest import login
+    from main import LiveSimulation
+
+    simulation = LiveSimulation(db)
+    simulation.tick()
+
+    login(client, "user")           # Raum 1 und 2, nicht Raum 3
+    assert client.patch("/api/v1/devices", json=[{"device_id": 1, "room_id": 3}]).status_code == 403
+    login(client, "admin")
+    response = client.patch("/api/v1/devices", json=[{"device_id": 1, "room_id": 99}])
+    assert response.status_code == 404
+    assert response.json()["room_ids"] == [99]
+
+    assert client.patch("/api/v1/devices", json=[{"device_id": 1, "room_id": 2}]).status_code == 200
+    simulation.tick()
+    simulation.close()
+    assert simulation.hub.get_device(1).room_id == 2
+
+
+def test_websocket_commands_keep_pending_writes_of_foreign_devices(db, client):
+    from conftest import login
+
+    store = get_state_store(db)
+    store.mark(5, True)             # Raum 3, gehört nicht dem user
+    before = store.version
+    login(client, "user")
+
+    with client.websocket_connect("/devices/ws") as ws:
+        ws.send_json({"id": 1, "commands": [{"device_id": 5, "action": "off"}, {"device_id": 999, "action": "off"}]})
+        assert ws.receive_json()["applied"] == 0
+    store.flush()
+
+    assert device_status(db, 5) == 1    # Wert der Simulation wurde geschrieben
+    assert store.version == before
+    store.close()
+
+
+def test_api_writes_keep_pending_writes_when_refused(db, client):
+    from conftest import login
+
+    store = get_state_store(db)
+    store.mark(5, True)             # Raum 3, gehört nicht dem user
+    before = store.version
+    login(client, "user")
+
+    assert client.patch("/api/v1/devices", json=[{"device_id": 5, "device_status": False}]).status_code == 403
+    assert client.request("DELETE", "/api/v1/devices", json={"ids": [5]}).status_code == 403
+    store.flush()
+
+    assert device_status(db, 5) == 1
+    assert store.version == before
+    store.close()
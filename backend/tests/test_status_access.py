@@ -0,0 +1,32 @@
+# test_status_access.py
+# Export und Geräte-Zusammenfassung unter /status: Nicht-Admins sehen nur
+# die Geräte ihrer Räume (seed: user hat Raum 1 und 2, also Geräte 1-4).
+
+import json
+
+from conftest import login
+
+
+def exported_devices(client, query=""):
+    response = client.get("/status/export" + query)
+    assert response.status_code == 200
+    return {json.loads(line)["device_id"] for line in response.text.splitlines()}
+
+
+def test_export_is_limited_to_own_rooms(db, client):
+    login(client, "user")
+    assert exported_devices(client) == {1, 2, 3, 4}
+    assert exported_devices(client, "?device_id=5") == set()
+
+    login(client, "admin")
+    assert exported_devices(client) == {1, 2, 3, 4, 5, 6}
+
+
+def test_device_summary_checks_room_access(db, client):
+    login(client, "user")
+    assert client.get("/status/events/device/1/summary").status_code == 200
+    assert client.get("/status/events/device/5/summary").status_code == 403
+    assert client.get("/status/events/device/999/summary").status_code == 403
+
+    login(client, "admin")
+    assert client.get("/status/events/device/5/summary").status_code == 200
@@ -7,6 +7,8 @@ from typing import Optional
 from starlette.middleware.sessions import SessionMiddleware     #wir adden middleware sessions für session cookies
 import sqlite3                                                  #db bearbeitung
 import os                                                       #os für dateipfad deklarierung
+from database import get_pool                                   #gemeinsamer connection pool
+from async_database import run_db, fetch_one, fetch_all, fetch_value, execute   #async db zugriff (threadpool)
 
 
 
@@ -15,41 +17,36 @@ router = APIRouter()
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 templates = Jinja2Templates(directory=os.path.join(BASE_DIR, "templates"))
 
-def get_db():
-    conn = sqlite3.connect("hub.db")
-    conn.row_factory = sqlite3.Row
+def get_db():                                       # verbindung aus dem pool, conn.close() gibt sie zurück
+    conn = get_pool("hub.db").acquire()
     curs = conn.cursor()
     return conn, curs
 
-def get_current_user(request: Request):             # funktion um aktuellen nutzer zu deklarieren
+async def get_current_user(request: Request):       # funktion um aktuellen nutzer zu deklarieren
     user_id = request.session.get("user_id")
     if not user_id:
         return None
 
-    conn, curs = get_db()
-    user = curs.execute(
+    user = getattr(request.state, "current_user", None)    #pro request nur einmal aus der db holen
+    if user is not None and user["user_id"] == user_id:
+        return user
+
+    user = await fetch_one(
         "SELECT * FROM users WHERE user_id = ?",
         (user_id,)
-    ).fetchone()
-    conn.close()
+    )
+    request.state.current_user = user
     return user
 
 
 @router.get("/", response_class=HTMLResponse)
 async def login_page(request:Request):
     
-    #verbindung zur db herstellen, cursor erstellen
-    conn, curs = get_db()
-
     #STARTPAGE - wir checken ob es schon user gibt, falls nicht soll der user admin erstellt werden.
     try: 
-        curs.execute("SELECT COUNT(*) FROM users")
-        user_count = curs.fetchone()[0]
+        user_count = await fetch_value("SELECT COUNT(*) FROM users")
     except sqlite3.OperationalError:
         user_count = 0
-    
-    #verbindung zur db wird geschlossen
-    conn.close()
 
     #falls noch keine user existieren, soll als erstes die setup.html aufgerufen werden wenn man die webseite aufruft
     if user_count == 0:
@@ -64,14 +61,10 @@ async def setup_page(request: Request):
 
 @router.post("/login", response_class=HTMLResponse)
 async def login(request: Request, user_name: str = Form(...), user_password: str = Form(...)):
-    conn, curs = get_db()
-
-    user = curs.execute(
+    user = await fetch_one(
         "SELECT * FROM users WHERE user_name = ? AND user_password = ?",
         (user_name, user_password)
-    ).fetchone()
-
-    conn.close()
+    )
     
     
     if not user:
@@ -94,30 +87,32 @@ async def add_user(request:Request, user_name: str = Form(...), user_password: s
     if password_result != user_password:
         return HTMLResponse(content=f"<h2>Fehler: {password_result}</h2>")
 
-    conn, curs = get_db()
-    #Check for Existing first user(admin)
-    
-    curs.execute("SELECT COUNT(*) FROM users")
-    user_count = curs.fetchone()[0]
+    def _insert_user(conn, curs):
+        #Check for Existing first user(admin)
+        
+        curs.execute("SELECT COUNT(*) FROM users")
+        user_count = curs.fetchone()[0]
 
-    if user_count == 0:
-        role = "admin"
-    else:
-        role = "user"
-
-    #Add new user
-    curs.execute(
-        "INSERT INTO users (user_name, user_password, user_role) VALUES (?, ?, ?)",
-        (user_name, user_password, role)
-    )
-    
-    new_user = curs.execute(
-        "SELECT * FROM users WHERE user_name = ?",
-        (user_name,)
-    ).fetchone()    #neu angelegten user selecten für session-token
+        if user_count == 0:
+            role = "admin"
+        else:
+            role = "user"
 
-    conn.commit()
-    conn.close()
+        #Add new user
+        curs.execute(
+            "INSERT INTO users (user_name, user_password, user_role) VALUES (?, ?, ?)",
+            (user_name, user_password, role)
+        )
+        
+        new_user = curs.execute(
+            "SELECT * FROM users WHERE user_name = ?",
+            (user_name,)
+        ).fetchone()    #neu angelegten user selecten für session-token
+
+        conn.commit()
+        return new_user
+
+    new_user = await run_db(_insert_user)
 
     request.session["user_id"] = new_user["user_id"]    #session-token callen 
 
@@ -130,35 +125,27 @@ async def add_user(request:Request, user_name: str = Form(...), user_password: s
 @router.post("/update_role")
 async def update_user_role(request: Request, target_user_id: int = Form(...), user_name: str = Form(...), new_role: str = Form(...)):
 
-    current_user = get_current_user(request)    #update role so umgeschrieben dass nur admin rollen verändern kann
+    current_user = await get_current_user(request)    #update role so umgeschrieben dass nur admin rollen verändern kann
     if not current_user:
         return RedirectResponse("/", status_code=303)   #falls kein user eingeloggt - zurück auf startseite
 
     if current_user["user_role"] != "admin":            #falls nicht admin sondern nur user - error
         return HTMLResponse("<h2>Keine Berechtigung.</h2>")
     
-    #db connnection
-    conn, curs = get_db()
-
     if current_user["user_id"] == target_user_id and new_role == "user": #falls admin sich selber auf user downgraden will
 
-            admin_count = curs.execute(         
+            admin_count = await fetch_value(
                 "SELECT COUNT(*) FROM users WHERE user_role = 'admin'"
-            ).fetchone()[0]
+            )
                                                                         #nur möglich wenn es mind. einen anderen admin gibt
             if admin_count <= 1:
-                conn.close()
                 return HTMLResponse("<h2>Es muss mindestens ein Admin existieren.</h2>")
 
-    curs.execute(
+    await execute(
         "UPDATE users SET user_role = ? WHERE user_id = ?",
         (new_role, target_user_id)
     )
 
-    #connection close and update
-    conn.commit()
-    conn.close()
-
     return RedirectResponse("/dashboard", status_code=303) #redirect auf dashboard
 
 
@@ -167,7 +154,7 @@ async def update_user_role(request: Request, target_user_id: int = Form(...), us
 @router.post("/update_password")   #für html angepasst, if user exists check rausgenommen weil update password nur passieren kann wenn user eingeloggt ist und somit existiert
 async def update_user_password(request: Request, target_user_id: int = Form(...), new_user_password: str = Form(...)):
     
-    current_user = get_current_user(request)
+    current_user = await get_current_user(request)
     if not current_user:
         return RedirectResponse("/", status_code=303)       #falls user nicht existiert/eingeloggt - zurück zur startseite
 
@@ -177,18 +164,11 @@ async def update_user_password(request: Request, target_user_id: int = Form(...)
         if current_user["user_role"] != "admin":            #nur admin kann rollen von anderen usern ändern
             return HTMLResponse("<h2>Keine Berechtigung.</h2>")
     
-    #db connection
-    conn, curs = get_db()
-
-    curs.execute(                                           #neues user passwort wird in db geschrieben für target user id - admin option
+    await execute(                                          #neues user passwort wird in db geschrieben für target user id - admin option
         "UPDATE users SET user_password = ? WHERE user_id = ?",
         (new_user_password, target_user_id)
     )
 
-    #connection close and update
-    conn.commit()
-    conn.close()
-
     return RedirectResponse("/dashboard", status_code=303) #zurück zum dashboard
 
 @router.get("/dashboard", response_class=HTMLResponse)
@@ -198,20 +178,14 @@ async def dashboard(request: Request):
     if not user_id:
         return RedirectResponse("/", status_code=303)
 
-    conn, curs = get_db()
-
     # eingeloggten User holen
-    curs.execute("SELECT * FROM users WHERE user_id = ?", (user_id,))
-    user = curs.fetchone()
+    user = await fetch_one("SELECT * FROM users WHERE user_id = ?", (user_id,))
 
     all_users = []
 
     # wenn admin → alle user holen
     if user["user_role"] == "admin":
-        curs.execute("SELECT * FROM users")
-        all_users = curs.fetchall()
-
-    conn.close()
+        all_users = await fetch_all("SELECT * FROM users")
 
     return templates.TemplateResponse("dashboard.html", {
         "request": request,